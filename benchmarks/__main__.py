@@ -0,0 +1,73 @@
+"""
+Run the benchmark suite.
+
+    python -m benchmarks [--output results.json] [--baseline previous.json]
+                         [--threshold 0.1] [--suite endpoints --suite micro]
+
+Exits with status 1 when any benchmark's throughput dropped by more than
+``--threshold`` compared to ``--baseline``.
+"""
+
+import argparse
+import sys
+
+from benchmarks.base import (
+    find_regressions,
+    load_results,
+    print_results,
+    test_database,
+    write_results,
+)
+
+SUITES = ("endpoints", "micro")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--suite", action="append", choices=SUITES)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument(
+        "--login-iterations",
+        type=int,
+        default=20,
+        help="login runs a full password hash, so it gets far fewer iterations",
+    )
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of a previous run")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="allowed throughput drop against the baseline, as a fraction",
+    )
+    args = parser.parse_args()
+
+    results = []
+    with test_database():
+        for suite in args.suite or SUITES:
+            if suite == "endpoints":
+                from benchmarks import endpoints
+
+                results += endpoints.run(args.iterations, args.login_iterations)
+            elif suite == "micro":
+                from benchmarks import micro
+
+                results += micro.run(args.iterations)
+
+    baseline = load_results(args.baseline) if args.baseline else None
+    print_results(results, baseline)
+    if args.output:
+        write_results(args.output, results)
+
+    if baseline is not None:
+        regressions = find_regressions(results, baseline, args.threshold)
+        if regressions:
+            print("\nRegressions over the threshold:", file=sys.stderr)
+            for regression in regressions:
+                print("  " + regression, file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "src.settings")
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+Result = Dict[str, Any]
+
+
+def measure(
+    name: str,
+    func: Callable[[], Any],
+    iterations: int,
+    warmup: int = 0,
+) -> Result:
+    """Call ``func`` ``iterations`` times and summarise per-call latency."""
+    for __ in range(warmup):
+        func()
+
+    samples: List[float] = []
+    started = time.perf_counter()
+    for __ in range(iterations):
+        call_started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+
+    percentiles = (
+        statistics.quantiles(samples, n=100, method="inclusive")
+        if len(samples) > 1
+        else samples * 99
+    )
+    return {
+        "name": name,
+        "iterations": iterations,
+        "ops_per_sec": iterations / elapsed,
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": percentiles[49] * 1000,
+        "p90_ms": percentiles[89] * 1000,
+        "p99_ms": percentiles[98] * 1000,
+        "max_ms": max(samples) * 1000,
+    }
+
+
+@contextmanager
+def test_database() -> Iterator[None]:
+    """Run the benchmarks against a throwaway test database."""
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def write_results(path: str, results: List[Result]) -> None:
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "django": django.get_version(),
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+
+
+def load_results(path: str) -> Dict[str, Result]:
+    with open(path) as f:
+        return {result["name"]: result for result in json.load(f)["results"]}
+
+
+def find_regressions(
+    results: List[Result], baseline: Dict[str, Result], threshold: float
+) -> List[str]:
+    """
+    Compare throughput against ``baseline`` and describe every benchmark that
+    got slower by more than ``threshold`` (a fraction, ``0.1`` is 10%).
+    """
+    regressions = []
+    for result in results:
+        previous = baseline.get(result["name"])
+        if not previous:
+            continue
+        change = result["ops_per_sec"] / previous["ops_per_sec"] - 1
+        if change < -threshold:
+            regressions.append(
+                f"{result['name']}: {previous['ops_per_sec']:,.0f} -> "
+                f"{result['ops_per_sec']:,.0f} ops/s ({change:+.1%})"
+            )
+    return regressions
+
+
+def print_results(results: List[Result], baseline: Optional[Dict[str, Result]]) -> None:
+    header = (
+        f"{'benchmark':<36} {'ops/s':>10} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9}"
+    )
+    if baseline is not None:
+        header += f" {'change':>8}"
+    print(header)
+    for result in results:
+        line = (
+            f"{result['name']:<36} {result['ops_per_sec']:>10,.0f} "
+            f"{result['p50_ms']:>9.3f} {result['p90_ms']:>9.3f} "
+            f"{result['p99_ms']:>9.3f}"
+        )
+        if baseline is not None and result["name"] in baseline:
+            previous = baseline[result["name"]]["ops_per_sec"]
+            line += f" {result['ops_per_sec'] / previous - 1:>+8.1%}"
+        print(line)
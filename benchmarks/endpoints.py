@@ -0,0 +1,143 @@
+"""
+Throughput and latency of the public endpoints, both through the Django test
+client and by calling the WSGI application in-process.
+"""
+
+import io
+import json
+import sys
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List
+
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from benchmarks.base import Result, measure
+from benchmarks.fixtures import PASSWORD, USERNAME, get_benchmark_user
+from src.core.jwt import create_access_token
+from src.core.throttling import SlidingWindowRateThrottle
+from src.wsgi import application
+
+
+def call_wsgi(
+    method: str,
+    path: str,
+    body: Dict[str, Any] = None,
+    expected_status: int = 200,
+    **headers: str,
+) -> bytes:
+    data = json.dumps(body).encode() if body is not None else b""
+    environ = {
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path,
+        "QUERY_STRING": "",
+        "SERVER_NAME": "testserver",
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(data)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(data),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": False,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+        **headers,
+    }
+    statuses = []
+    response = application(
+        environ, lambda status, headers, exc_info=None: statuses.append(status)
+    )
+    try:
+        content = b"".join(response)
+    finally:
+        response.close()
+    assert statuses[0].startswith(str(expected_status)), statuses[0]
+    return content
+
+
+@contextmanager
+def login_throttles_disabled() -> Iterator[None]:
+    """
+    Every benchmark login uses the same username and address, so the login
+    throttles would answer 429 long before the runs are done.
+    """
+    rates = SlidingWindowRateThrottle.THROTTLE_RATES
+    SlidingWindowRateThrottle.THROTTLE_RATES = {
+        "login_username": None,
+        "login_ip": None,
+    }
+    try:
+        yield
+    finally:
+        SlidingWindowRateThrottle.THROTTLE_RATES = rates
+
+
+def expect(status_code: int, func: Callable[[], Any]) -> Callable[[], Any]:
+    def wrapper() -> Any:
+        resp = func()
+        assert resp.status_code == status_code, resp.status_code
+        return resp
+
+    return wrapper
+
+
+def run(iterations: int, login_iterations: int) -> List[Result]:
+    user = get_benchmark_user()
+    credentials = {"username": USERNAME, "password": PASSWORD}
+    login_url = reverse("login")
+    verify_url = reverse("verify-token")
+    me_url = reverse("me")
+    client = APIClient()
+
+    with login_throttles_disabled():
+        results = [
+            measure(
+                "client:login",
+                expect(200, lambda: client.post(login_url, credentials, format="json")),
+                login_iterations,
+                warmup=1,
+            ),
+            measure(
+                "wsgi:login",
+                lambda: call_wsgi("POST", login_url, credentials),
+                login_iterations,
+                warmup=1,
+            ),
+        ]
+
+    # Logging in revokes older tokens, so only issue one after the logins.
+    user.refresh_from_db()
+    token = create_access_token(user)
+    authorization = "JWT " + token
+    results += [
+        measure(
+            "client:verify-token",
+            expect(
+                200,
+                lambda: client.post(verify_url, {"token": token}, format="json"),
+            ),
+            iterations,
+            warmup=10,
+        ),
+        measure(
+            "wsgi:verify-token",
+            lambda: call_wsgi("POST", verify_url, {"token": token}),
+            iterations,
+            warmup=10,
+        ),
+        measure(
+            "client:me",
+            expect(200, lambda: client.get(me_url, HTTP_AUTHORIZATION=authorization)),
+            iterations,
+            warmup=10,
+        ),
+        measure(
+            "wsgi:me",
+            lambda: call_wsgi("GET", me_url, HTTP_AUTHORIZATION=authorization),
+            iterations,
+            warmup=10,
+        ),
+    ]
+    return results
@@ -0,0 +1,21 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+User = get_user_model()
+
+USERNAME = "benchmark"
+PASSWORD = "benchmark-password"
+
+
+def get_benchmark_user() -> User:
+    cache.clear()
+    user = User.objects.filter(username=USERNAME).first()
+    if user:
+        return user
+    return User.objects.create_user(
+        username=USERNAME,
+        password=PASSWORD,
+        email="benchmark@example.com",
+        first_name="Benchmark",
+        last_name="User",
+    )
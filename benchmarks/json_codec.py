@@ -0,0 +1,89 @@
+"""
+Render and parse throughput of DRF's JSON renderer and parser against the
+ones in src.core, with each JSON_BACKEND, on the bodies of our endpoints.
+
+    python -m benchmarks.json_codec [--number N] [--repeat R]
+"""
+
+import argparse
+import io
+import timeit
+from typing import Any, Callable, Dict
+
+import benchmarks.base  # noqa: F401 configures Django
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework import parsers, renderers
+
+from src.api.serializers.login import LoginViewSerializer, MeViewSerializer
+from src.core.jwt import TOKEN_VALID, create_access_token
+from src.core.parsers import JSONParser
+from src.core.renderers import JSONRenderer
+
+User = get_user_model()
+
+
+def get_bodies() -> Dict[str, Any]:
+    # Unsaved, so no database is needed.
+    user = User(
+        id=1,
+        username="benchmark",
+        email="benchmark@example.com",
+        first_name="Người",
+        last_name="Dùng",
+        is_active=True,
+    )
+    token = create_access_token(user)
+    return {
+        "login": LoginViewSerializer(user).data,
+        "me": MeViewSerializer(user).data,
+        "error": {"message": _("xác minh thất bại")},
+        "batch": {
+            "tokens": [token] * 100,
+            "results": [{"verdict": TOKEN_VALID, "user_id": 1}] * 100,
+        },
+    }
+
+
+def ops_per_sec(func: Callable[[], Any], number: int, repeat: int) -> float:
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    return number / best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    codecs = (
+        ("drf", "json", renderers.JSONRenderer, parsers.JSONParser),
+        ("core/json", "json", JSONRenderer, JSONParser),
+        ("core/orjson", "orjson", JSONRenderer, JSONParser),
+    )
+    bodies = get_bodies()
+
+    print(f"{'body':<8} {'codec':<12} {'render/s':>12} {'parse/s':>12} {'speedup':>16}")
+    for name, data in bodies.items():
+        encoded = renderers.JSONRenderer().render(data)
+        baseline = None
+        for codec, backend, renderer_class, parser_class in codecs:
+            with override_settings(JSON_BACKEND=backend):
+                render = ops_per_sec(
+                    lambda: renderer_class().render(data), args.number, args.repeat
+                )
+                parse = ops_per_sec(
+                    lambda: parser_class().parse(io.BytesIO(encoded)),
+                    args.number,
+                    args.repeat,
+                )
+            baseline = baseline or (render, parse)
+            speedup = f"{render / baseline[0]:.2f}x / {parse / baseline[1]:.2f}x"
+            print(
+                f"{name:<8} {codec:<12} {render:>12,.0f} {parse:>12,.0f} {speedup:>16}"
+            )
+
+
+if __name__ == "__main__":
+    main()
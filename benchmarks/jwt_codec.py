@@ -0,0 +1,51 @@
+"""
+Encode/decode throughput of the JWT codecs.
+
+    python -m benchmarks.jwt_codec [--number N] [--repeat R]
+"""
+
+import argparse
+import timeit
+from datetime import timedelta
+
+import benchmarks.base  # noqa: F401 configures Django
+from django.conf import settings
+
+from src.core.jwt import jwt_base_payload
+from src.core.jwt_codecs import HS256Codec, PyJWTCodec
+
+CODECS = (PyJWTCodec, HS256Codec)
+
+
+def ops_per_sec(func, number: int, repeat: int) -> float:
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    return number / best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payload = jwt_base_payload(timedelta(hours=1))
+    payload.update({"user_id": 1, "type": "access", "token_generation": 1})
+
+    results = {}
+    for codec_class in CODECS:
+        codec = codec_class(settings.SECRET_KEY)
+        token = codec.encode(payload)
+        results[codec_class.__name__] = (
+            ops_per_sec(lambda: codec.encode(payload), args.number, args.repeat),
+            ops_per_sec(lambda: codec.decode(token), args.number, args.repeat),
+        )
+
+    baseline = results[CODECS[0].__name__]
+    print(f"{'codec':<12} {'encode/s':>12} {'decode/s':>12} {'speedup':>16}")
+    for name, (encode, decode) in results.items():
+        speedup = f"{encode / baseline[0]:.2f}x / {decode / baseline[1]:.2f}x"
+        print(f"{name:<12} {encode:>12,.0f} {decode:>12,.0f} {speedup:>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Microbenchmarks for the building blocks of the auth path."""
+
+from typing import List
+
+from django.test import RequestFactory
+
+from benchmarks.base import Result, measure
+from benchmarks.fixtures import get_benchmark_user
+from src.api.serializers.login import (
+    LoginActionSerializer,
+    LoginViewSerializer,
+    MeViewSerializer,
+    VerifyTokenSerializer,
+)
+from src.core.jwt import (
+    create_access_token,
+    get_token_from_request,
+    jwt_codec,
+    jwt_decode,
+    verified_token_cache,
+)
+
+
+def run(iterations: int) -> List[Result]:
+    user = get_benchmark_user()
+    token = create_access_token(user)
+    request = RequestFactory().get("/api/me/", HTTP_AUTHORIZATION="JWT " + token)
+    login_request = RequestFactory().post("/api/login/")
+
+    def verify_token() -> None:
+        assert VerifyTokenSerializer(data={"token": token}).is_valid()
+
+    return [
+        measure("create_access_token", lambda: create_access_token(user), iterations),
+        measure("jwt_decode", lambda: jwt_decode(token), iterations, warmup=1),
+        measure(
+            "jwt_decode:uncached",
+            lambda: (verified_token_cache.clear(), jwt_decode(token)),
+            iterations,
+        ),
+        measure("jwt_codec.decode", lambda: jwt_codec.decode(token), iterations),
+        measure(
+            "get_token_from_request",
+            lambda: get_token_from_request(request),
+            iterations,
+        ),
+        measure(
+            "LoginViewSerializer.data",
+            lambda: LoginViewSerializer(user).data,
+            iterations,
+        ),
+        measure(
+            "LoginActionSerializer.data",
+            lambda: LoginActionSerializer(
+                user, context={"request": login_request}
+            ).data,
+            iterations,
+        ),
+        measure("VerifyTokenSerializer", verify_token, iterations, warmup=1),
+        measure(
+            "MeViewSerializer.data", lambda: MeViewSerializer(user).data, iterations
+        ),
+    ]
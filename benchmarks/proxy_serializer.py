@@ -0,0 +1,99 @@
+"""
+Per-request time and allocations of the login response serializer, with the
+precompiled representation plan against the former eager proxy, which built
+a second full serializer tree per instance.
+
+    python -m benchmarks.proxy_serializer [--iterations N]
+
+The login endpoint is measured with an MD5 password hasher and without
+throttling, so that hashing does not drown out the serializer.
+"""
+
+import argparse
+import tracemalloc
+from typing import Any, Callable, Dict
+from unittest import mock
+
+from benchmarks.base import measure, test_database
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from rest_framework.request import Request
+
+from benchmarks.endpoints import call_wsgi
+from benchmarks.fixtures import PASSWORD, USERNAME, get_benchmark_user
+from src.api.serializers.login import LoginActionSerializer
+from src.api.views.login import LoginView
+
+
+class EagerLoginActionSerializer(LoginActionSerializer):
+    """The proxy as it was before representation plans."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._view_serializer_instance = self.view_serializer(
+            *self._view_serializer_args, **self._view_serializer_kwargs
+        )
+
+    def to_representation(self, instance: Any) -> Dict[str, Any]:
+        return self.view_serializer_instance.to_representation(instance)
+
+
+def allocated_kib(func: Callable[[], Any], iterations: int) -> float:
+    """Mean peak of memory allocated while ``func`` runs, in KiB."""
+    func()
+    total = 0
+    tracemalloc.start()
+    try:
+        for __ in range(iterations):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            func()
+            total += tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+    return total / iterations / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    with test_database(), override_settings(
+        PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"]
+    ), mock.patch.object(LoginView, "throttle_classes", []):
+        user = get_benchmark_user()
+        request = Request(RequestFactory().post("/"))
+        credentials = {"username": USERNAME, "password": PASSWORD}
+        login_url = reverse("login")
+
+        print(f"{'benchmark':<28} {'ops/s':>10} {'p50 ms':>9} {'alloc KiB':>10}")
+        for name, serializer_class in (
+            ("eager", EagerLoginActionSerializer),
+            ("compiled", LoginActionSerializer),
+        ):
+
+            def serialize() -> Dict[str, Any]:
+                serializer = serializer_class(
+                    data=credentials, context={"request": request}
+                )
+                return serializer.to_representation(user)
+
+            def login() -> bytes:
+                return call_wsgi("POST", login_url, credentials)
+
+            with mock.patch.object(LoginView, "serializer_class", serializer_class):
+                for label, func, iterations in (
+                    ("serializer", serialize, args.iterations),
+                    ("api/login/", login, max(args.iterations // 10, 1)),
+                ):
+                    result = measure(label, func, iterations, warmup=10)
+                    kib = allocated_kib(func, max(iterations // 10, 1))
+                    print(
+                        f"{name + ' ' + label:<28} {result['ops_per_sec']:>10,.0f} "
+                        f"{result['p50_ms']:>9.3f} {kib:>10.1f}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
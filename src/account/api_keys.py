@@ -0,0 +1,126 @@
+import hashlib
+import secrets
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Tuple, Union
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+from django.utils import timezone
+
+from src.account.models import APIKey
+from src.core.metrics import record_cache_lookups
+from src.core.tiered_cache import auth_cache
+
+API_KEY_CACHE_KEY = "api-key:%s"
+API_KEY_USED_CACHE_KEY = "api-key-used:%s"
+API_KEY_AUTH_HEADER = "HTTP_AUTHORIZATION"
+API_KEY_AUTH_HEADER_PREFIX = "Api-Key"
+API_KEY_PREFIX_LENGTH = 8
+# Cached for unknown digests, so that floods of bogus keys stay off the
+# database. New keys are random and cannot have been cached as unknown.
+UNKNOWN_API_KEY = False
+# Written on invalidation in place of the key. Readers load the row as on a
+# miss but fill the cache with ``add``, which cannot replace it, so a load
+# that raced the write cannot cache what it read before.
+API_KEY_TOMBSTONE = "invalidated"
+
+
+class CachedAPIKey(NamedTuple):
+    id: int
+    user_id: int
+    scopes: List[str]
+    is_active: bool
+    expires_at: Optional[datetime]
+
+    @property
+    def is_valid(self) -> bool:
+        return self.is_active and (
+            self.expires_at is None or self.expires_at > timezone.now()
+        )
+
+
+def get_digest(key: str) -> str:
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def get_cache_key(digest: str) -> str:
+    return API_KEY_CACHE_KEY % (digest,)
+
+
+def generate_api_key() -> Tuple[str, str, str]:
+    """Return a new ``(key, prefix, digest)``."""
+    key = secrets.token_urlsafe(32)
+    return key, key[:API_KEY_PREFIX_LENGTH], get_digest(key)
+
+
+def get_api_key_from_request(request: Any) -> Optional[str]:
+    auth = request.META.get(API_KEY_AUTH_HEADER, "").split()
+    if len(auth) != 2 or auth[0] != API_KEY_AUTH_HEADER_PREFIX:
+        return None
+    return auth[1]
+
+
+def load_api_key(digest: str) -> Union[CachedAPIKey, bool]:
+    row = (
+        APIKey.objects.filter(digest=digest).values_list(*CachedAPIKey._fields).first()
+    )
+    return CachedAPIKey(*row) if row else UNKNOWN_API_KEY
+
+
+def is_cached(api_key: Any) -> bool:
+    return api_key is not None and api_key != API_KEY_TOMBSTONE
+
+
+def get_api_key(key: str) -> Optional[CachedAPIKey]:
+    cache_key = get_cache_key(get_digest(key))
+    api_key = auth_cache.get(cache_key)
+    hit = is_cached(api_key)
+    record_cache_lookups("api_key", hit, not hit)
+    if not hit:
+        api_key = load_api_key(get_digest(key))
+        auth_cache.add(cache_key, api_key, settings.API_KEY_CACHE_TTL.total_seconds())
+    return api_key or None
+
+
+async def aget_api_key(key: str) -> Optional[CachedAPIKey]:
+    cache_key = get_cache_key(get_digest(key))
+    api_key = await auth_cache.aget(cache_key)
+    hit = is_cached(api_key)
+    record_cache_lookups("api_key", hit, not hit)
+    if not hit:
+        api_key = await sync_to_async(load_api_key)(get_digest(key))
+        await auth_cache.aadd(
+            cache_key, api_key, settings.API_KEY_CACHE_TTL.total_seconds()
+        )
+    return api_key or None
+
+
+def touch_api_key(api_key: CachedAPIKey) -> None:
+    """
+    Record that ``api_key`` was used, writing at most once per
+    API_KEY_LAST_USED_INTERVAL instead of on every request.
+    """
+    interval = settings.API_KEY_LAST_USED_INTERVAL.total_seconds()
+    if cache.add(API_KEY_USED_CACHE_KEY % (api_key.id,), 1, interval):
+        APIKey.objects.filter(pk=api_key.id).update(last_used_at=timezone.now())
+
+
+def invalidate_api_key(digest: str) -> None:
+    """
+    Replace the cached key with a tombstone, again once the surrounding
+    transaction commits, so it outlives loads that read the old row.
+    """
+
+    def write_tombstone() -> None:
+        auth_cache.set(
+            get_cache_key(digest),
+            API_KEY_TOMBSTONE,
+            settings.API_KEY_TOMBSTONE_TTL.total_seconds(),
+        )
+
+    write_tombstone()
+    using = router.db_for_write(APIKey)
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(write_tombstone, using=using)
@@ -6,3 +6,6 @@ class AccountConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "src.account"
     label = "account"
+
+    def ready(self) -> None:
+        from src.account import signals  # noqa: F401
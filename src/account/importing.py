@@ -0,0 +1,210 @@
+import csv
+import json
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import (
+    get_hasher,
+    identify_hasher,
+    is_password_usable,
+    make_password,
+)
+from django.db import transaction
+
+from src.core.hashing import _encode_many, _hasher_path
+
+User = get_user_model()
+
+Record = Dict[str, Any]
+
+FORMATS = ("csv", "jsonl")
+TRUE_VALUES = {"1", "true", "t", "yes", "y"}
+
+
+def detect_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    return "csv"
+
+
+def read_records(path: str, format: str) -> Iterator[Record]:
+    """Yield the records of a CSV (with a header row) or JSON Lines file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if format == "csv":
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def batched(records: Iterable[Record], size: int) -> Iterator[List[Record]]:
+    iterator = iter(records)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def parse_bool(value: Any, default: bool = True) -> bool:
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+@dataclass
+class ImportStats:
+    resumed_from: int = 0
+    processed: int = 0
+    created: int = 0
+    existing: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self) -> float:
+        """Records per second processed by this run."""
+        elapsed = self.elapsed
+        return (self.processed - self.resumed_from) / elapsed if elapsed else 0.0
+
+
+@dataclass
+class PendingBatch:
+    size: int
+    records: List[Record]
+    hashes: List[Future]
+
+
+class UserImporter:
+    """
+    Create users from records with ``username`` and either ``password`` or an
+    already encoded ``password_hash``, plus optional ``email``,
+    ``first_name``, ``last_name`` and ``is_active``.
+
+    Passwords of one batch are hashed on ``executor`` while the previous
+    batch is written, so with enough workers the import runs at the speed of
+    the hashing pool. Usernames that already exist are skipped, which makes
+    re-running an import safe.
+    """
+
+    def __init__(
+        self, batch_size: int, executor: Optional[Executor], workers: int
+    ) -> None:
+        self.batch_size = batch_size
+        self.executor = executor
+        self.workers = max(workers, 1)
+        self.hasher = get_hasher("default")
+        self.hasher_path = _hasher_path(self.hasher)
+
+    def prepare(self, records: List[Record]) -> List[Record]:
+        usernames = {}
+        for record in records:
+            username = User.normalize_username((record.get("username") or "").strip())
+            if not username:
+                raise ValueError("Record without a username: %r" % (record,))
+            usernames.setdefault(username, {**record, "username": username})
+        existing = set(
+            User.objects.filter(username__in=usernames).values_list(
+                "username", flat=True
+            )
+        )
+        return [record for name, record in usernames.items() if name not in existing]
+
+    def submit(self, records: List[Record]) -> List[Future]:
+        items = [
+            (record["password"], self.hasher.salt())
+            for record in records
+            if record.get("password") and not record.get("password_hash")
+        ]
+        if not items:
+            return []
+        if self.executor is None:
+            future: Future = Future()
+            future.set_result(_encode_many(self.hasher_path, items))
+            return [future]
+        chunk_size = math.ceil(len(items) / self.workers)
+        return [
+            self.executor.submit(
+                _encode_many, self.hasher_path, items[start : start + chunk_size]
+            )
+            for start in range(0, len(items), chunk_size)
+        ]
+
+    def build_user(self, record: Record, hashes: Iterator[str]) -> User:
+        if record.get("password_hash"):
+            password = record["password_hash"]
+            if is_password_usable(password):
+                # Raises ValueError for hashes no configured hasher can check.
+                identify_hasher(password)
+        elif record.get("password"):
+            password = next(hashes)
+        else:
+            password = make_password(None)
+        return User(
+            username=record["username"],
+            password=password,
+            email=User.objects.normalize_email(record.get("email") or ""),
+            first_name=record.get("first_name") or "",
+            last_name=record.get("last_name") or "",
+            is_active=parse_bool(record.get("is_active")),
+        )
+
+    def write(self, batch: PendingBatch, stats: ImportStats) -> None:
+        hashes = (encoded for future in batch.hashes for encoded in future.result())
+        users = [self.build_user(record, hashes) for record in batch.records]
+        usernames = [user.username for user in users]
+        with transaction.atomic():
+            # The previous batch was written after this one was prepared.
+            existing = set(
+                User.objects.filter(username__in=usernames).values_list(
+                    "username", flat=True
+                )
+            )
+            User.objects.bulk_create(
+                [user for user in users if user.username not in existing],
+                ignore_conflicts=True,
+            )
+            # Rows skipped as conflicts aren't reported by bulk_create.
+            created = User.objects.filter(username__in=usernames).count()
+            created -= len(existing)
+        stats.processed += batch.size
+        stats.created += created
+        stats.existing += batch.size - created
+
+    def run(
+        self,
+        records: Iterable[Record],
+        skip: int = 0,
+        progress: Optional[Callable[[ImportStats], None]] = None,
+    ) -> ImportStats:
+        stats = ImportStats(resumed_from=skip, processed=skip)
+        in_flight: Deque[PendingBatch] = deque()
+        for records_batch in batched(islice(records, skip, None), self.batch_size):
+            prepared = self.prepare(records_batch)
+            in_flight.append(
+                PendingBatch(len(records_batch), prepared, self.submit(prepared))
+            )
+            if len(in_flight) > 1:
+                self.write(in_flight.popleft(), stats)
+                if progress:
+                    progress(stats)
+        while in_flight:
+            self.write(in_flight.popleft(), stats)
+            if progress:
+                progress(stats)
+        return stats
@@ -0,0 +1,115 @@
+import atexit
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Union
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections
+from django.db.models import Case, DateTimeField, Value, When
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+
+class LastLoginBuffer:
+    """
+    Write-behind buffer for ``User.last_login``. Only the latest login per
+    user is kept, and pending values are written with a single UPDATE.
+
+    Writes happen on a background thread, which a full buffer wakes early.
+    Without one (``flush_interval <= 0``) a full buffer is flushed inline.
+    """
+
+    def __init__(self, flush_interval: float, flush_size: int) -> None:
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._reset()
+
+    def _reset(self) -> None:
+        # Also run in forked children, which inherit neither the flush
+        # thread nor a usable lock, and whose parent still owns the pending
+        # logins. The thread is started again by the next ``add``.
+        self._pending: Dict[Union[int, str], datetime] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._wake = threading.Event()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, user_id: Union[int, str], last_login: datetime) -> None:
+        with self._lock:
+            previous = self._pending.get(user_id)
+            if previous is None or previous < last_login:
+                self._pending[user_id] = last_login
+            full = len(self._pending) >= self.flush_size
+        if self._ensure_thread():
+            if full:
+                self._wake.set()
+        elif full:
+            self.flush()
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            try:
+                User.objects.filter(pk__in=pending).update(
+                    last_login=Case(
+                        *(
+                            When(pk=user_id, then=Value(last_login))
+                            for user_id, last_login in pending.items()
+                        ),
+                        output_field=DateTimeField(),
+                    )
+                )
+            except Exception:
+                logger.exception("Failed to flush %d last_login updates", len(pending))
+                with self._lock:
+                    for user_id, last_login in pending.items():
+                        self._pending.setdefault(user_id, last_login)
+                return 0
+            return len(pending)
+
+    def _ensure_thread(self) -> bool:
+        if self._thread is not None:
+            return True
+        if self.flush_interval <= 0:
+            return False
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="last-login-flush", daemon=True
+                )
+                self._thread.start()
+        return True
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                return
+            self.flush()
+            close_old_connections()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+        self.flush()
+
+
+last_login_buffer = LastLoginBuffer(
+    settings.LAST_LOGIN_FLUSH_INTERVAL.total_seconds(),
+    settings.LAST_LOGIN_FLUSH_SIZE,
+)
+atexit.register(last_login_buffer.stop)
+os.register_at_fork(after_in_child=last_login_buffer._reset)
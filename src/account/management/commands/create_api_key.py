@@ -0,0 +1,41 @@
+from datetime import timedelta
+from typing import Any
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.utils import timezone
+
+from src.account.services import create_api_key
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Create an API key for a user. The key is printed once and not stored."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("username")
+        parser.add_argument("--name", required=True)
+        parser.add_argument(
+            "--scope",
+            action="append",
+            default=[],
+            dest="scopes",
+            help="granted scope, may be repeated (e.g. profile:read)",
+        )
+        parser.add_argument("--expires-in-days", type=int)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']} does not exist.")
+        expires_at = None
+        if options["expires_in_days"] is not None:
+            expires_at = timezone.now() + timedelta(days=options["expires_in_days"])
+
+        api_key, key = create_api_key(
+            user, options["name"], options["scopes"], expires_at
+        )
+        self.stderr.write(f"Created API key {api_key}. Store it now:")
+        self.stdout.write(key)
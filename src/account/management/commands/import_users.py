@@ -0,0 +1,102 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Optional
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from src.account.importing import (
+    FORMATS,
+    ImportStats,
+    UserImporter,
+    detect_format,
+    read_records,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Import users from a CSV or JSON Lines file. Columns: username and "
+        "password or password_hash, plus optional email, first_name, "
+        "last_name and is_active."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("path")
+        parser.add_argument(
+            "--format", choices=FORMATS, help="default: from the file extension"
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="password hashing processes, 0 hashes in this process "
+            "(default: one per CPU)",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="progress file (default: <path>.progress)",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="skip the records a previous run recorded in the checkpoint",
+        )
+
+    def read_checkpoint(self, checkpoint: str, path: str) -> int:
+        try:
+            with open(checkpoint) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return 0
+        if state.get("path") != os.path.abspath(path):
+            raise CommandError(f"{checkpoint} belongs to {state.get('path')}.")
+        return state["processed"]
+
+    def write_checkpoint(self, checkpoint: str, path: str, processed: int) -> None:
+        # Replaced atomically so a crash never leaves a torn checkpoint.
+        temporary = checkpoint + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump({"path": os.path.abspath(path), "processed": processed}, f)
+        os.replace(temporary, checkpoint)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        path = options["path"]
+        if not os.path.exists(path):
+            raise CommandError(f"{path} does not exist.")
+        format = options["format"] or detect_format(path)
+        checkpoint = options["checkpoint"] or path + ".progress"
+        skip = self.read_checkpoint(checkpoint, path) if options["resume"] else 0
+        if skip:
+            self.stdout.write(f"Resuming after {skip} records.")
+
+        def progress(stats: ImportStats) -> None:
+            self.write_checkpoint(checkpoint, path, stats.processed)
+            self.stdout.write(
+                f"{stats.processed} records, {stats.created} created, "
+                f"{stats.existing} existing, {stats.rate:,.0f} records/s"
+            )
+
+        workers = options["workers"]
+        executor: Optional[ProcessPoolExecutor] = None
+        if workers > 0:
+            executor = ProcessPoolExecutor(
+                workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        try:
+            importer = UserImporter(options["batch_size"], executor, workers)
+            stats = importer.run(read_records(path, format), skip, progress)
+        except (ValueError, KeyError) as e:
+            raise CommandError(f"Import stopped: {e}") from e
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {stats.created} users ({stats.existing} already "
+                f"existed) in {stats.elapsed:.1f}s, {stats.rate:,.0f} records/s."
+            )
+        )
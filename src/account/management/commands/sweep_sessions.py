@@ -0,0 +1,25 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from src.account.sessions import sweep_expired_sessions
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired sessions in small batches, so the sweep never holds "
+        "long locks on the session table."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="seconds to sleep between batches",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        deleted = sweep_expired_sessions(options["batch_size"], options["pause"])
+        self.stdout.write(f"Deleted {deleted} expired sessions.")
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.2 on 2026-10-18 17:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='token_generation',
+            field=models.PositiveIntegerField(default=0, help_text='Tokens issued with an older generation are rejected.', verbose_name='token generation'),
+        ),
+    ]
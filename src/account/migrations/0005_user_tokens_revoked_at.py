@@ -0,0 +1,24 @@
+# Generated by Django 4.0.2 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0004_usersession"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="tokens_revoked_at",
+            field=models.DateTimeField(
+                blank=True,
+                db_index=True,
+                help_text="When token_generation was last bumped.",
+                null=True,
+                verbose_name="tokens revoked at",
+            ),
+        ),
+    ]
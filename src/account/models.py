@@ -1,3 +1,5 @@
+from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import models as auth_models
 from typing import Any, Optional
@@ -33,9 +35,96 @@ class UserManager(auth_models.BaseUserManager):
 
 
 class User(auth_models.AbstractUser):
-    # TODO: something
+    token_generation = models.PositiveIntegerField(
+        _("token generation"),
+        default=0,
+        help_text=_("Tokens issued with an older generation are rejected."),
+    )
+    tokens_revoked_at = models.DateTimeField(
+        _("tokens revoked at"),
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text=_("When token_generation was last bumped."),
+    )
 
     class Meta:
         verbose_name = _("Tài khoản")
         verbose_name_plural = _("Tài khoản")
         app_label = "account"
+
+
+class APIKey(models.Model):
+    """
+    Credential of a machine client acting as ``user``.
+
+    Only the SHA-256 digest of the key is stored. Keys are long random
+    strings, so unlike passwords they need no slow hash to resist guessing,
+    and checking one is a single lookup on the unique ``digest`` index.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="api_keys",
+        verbose_name=_("Tài khoản"),
+    )
+    name = models.CharField(_("name"), max_length=255)
+    prefix = models.CharField(
+        _("prefix"),
+        max_length=16,
+        help_text=_("Public start of the key, to tell keys apart."),
+    )
+    digest = models.CharField(_("digest"), max_length=64, unique=True, editable=False)
+    scopes = models.JSONField(_("scopes"), default=list, blank=True)
+    is_active = models.BooleanField(_("active"), default=True)
+    expires_at = models.DateTimeField(_("expires at"), null=True, blank=True)
+    last_used_at = models.DateTimeField(_("last used at"), null=True, blank=True)
+    created_at = models.DateTimeField(_("created at"), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("API key")
+        verbose_name_plural = _("API keys")
+        app_label = "account"
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.prefix}…)"
+
+
+class UserSession(models.Model):
+    """
+    A device signed in as ``user``.
+
+    ``jti`` is carried by the session's access and refresh tokens. Revoking
+    a session deletes its row, and expired rows are removed by
+    ``manage.py sweep_sessions``, so the table only holds live sessions.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="sessions",
+        verbose_name=_("Tài khoản"),
+    )
+    jti = models.CharField(_("token id"), max_length=32, unique=True, editable=False)
+    user_agent = models.CharField(_("user agent"), max_length=255, blank=True)
+    ip_address = models.GenericIPAddressField(_("IP address"), null=True, blank=True)
+    created_at = models.DateTimeField(_("created at"), auto_now_add=True)
+    last_seen_at = models.DateTimeField(_("last seen at"), default=timezone.now)
+    expires_at = models.DateTimeField(_("expires at"))
+
+    class Meta:
+        verbose_name = _("session")
+        verbose_name_plural = _("sessions")
+        app_label = "account"
+        indexes = [
+            models.Index(
+                fields=["user", "expires_at"], name="account_session_user_idx"
+            ),
+            models.Index(
+                fields=["expires_at", "id"], name="account_session_expiry_idx"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.user_id} ({self.jti})"
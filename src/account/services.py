@@ -1,13 +1,59 @@
-from typing import Any
+from datetime import datetime
+from typing import Any, Iterable, Optional, Tuple
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
+from src.account.api_keys import generate_api_key
+from src.account.last_login import last_login_buffer
+from src.account.models import APIKey
+from src.account.sessions import delete_user_sessions
+
+from src.core.db.routers import stick_to_primary
+from src.core.jwt import verified_token_cache
+from src.core.token_generation import bump_token_generation
+from src.core.user_snapshots import invalidate_user_snapshot
+
 User = get_user_model()
 
 
+def revoke_tokens(instance: User) -> User:
+    bump_token_generation(instance)
+    stick_to_primary(instance.pk)
+    invalidate_user_snapshot(instance.pk)
+    verified_token_cache.invalidate_user(instance.pk)
+    delete_user_sessions(instance)
+    return instance
+
+
 def login(instance: User, request: Any = None) -> User:
-    # TODO: something
     instance.last_login = timezone.now()
-    instance.save(update_fields=["last_login"])
-    return instance
+    if settings.LAST_LOGIN_WRITE_BEHIND:
+        last_login_buffer.add(instance.pk, instance.last_login)
+    else:
+        instance.save(update_fields=["last_login"])
+    if not settings.JWT_SINGLE_SESSION:
+        return instance
+    # The token generation bump stays synchronous: revoking the previous
+    # tokens must be durable before the new ones are handed out.
+    return revoke_tokens(instance)
+
+
+def create_api_key(
+    user: User,
+    name: str,
+    scopes: Iterable[str] = (),
+    expires_at: Optional[datetime] = None,
+) -> Tuple[APIKey, str]:
+    """Create an API key and return it with the raw key, which is not stored."""
+    key, prefix, digest = generate_api_key()
+    api_key = APIKey.objects.create(
+        user=user,
+        name=name,
+        prefix=prefix,
+        digest=digest,
+        scopes=list(scopes),
+        expires_at=expires_at,
+    )
+    return api_key, key
@@ -0,0 +1,175 @@
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Union
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from src.account.models import UserSession
+from src.core.metrics import record_cache_lookups
+from src.core.tiered_cache import auth_cache
+
+SESSION_CACHE_KEY = "session:%s"
+# Cached for unknown and revoked sessions, so their tokens are rejected
+# without a query.
+NO_SESSION = False
+
+
+class CachedSession(NamedTuple):
+    user_id: int
+    expires_at: datetime
+
+    @property
+    def is_expired(self) -> bool:
+        return self.expires_at <= timezone.now()
+
+
+def get_cache_key(jti: str) -> str:
+    return SESSION_CACHE_KEY % (jti,)
+
+
+def get_cache_timeout(session: Union[CachedSession, bool]) -> float:
+    timeout = settings.SESSION_CACHE_TTL.total_seconds()
+    if session:
+        timeout = min(timeout, (session.expires_at - timezone.now()).total_seconds())
+    return max(timeout, 1)
+
+
+def load_session(jti: str) -> Union[CachedSession, bool]:
+    row = (
+        UserSession.objects.filter(jti=jti).values_list(*CachedSession._fields).first()
+    )
+    return CachedSession(*row) if row else NO_SESSION
+
+
+def get_session(jti: str) -> Optional[CachedSession]:
+    key = get_cache_key(jti)
+    session = auth_cache.get(key)
+    record_cache_lookups("session", session is not None, session is None)
+    if session is None:
+        session = load_session(jti)
+        # ``add`` never overwrites the tombstone of a concurrent revocation.
+        auth_cache.add(key, session, get_cache_timeout(session))
+    return session or None
+
+
+async def aget_session(jti: str) -> Optional[CachedSession]:
+    key = get_cache_key(jti)
+    session = await auth_cache.aget(key)
+    record_cache_lookups("session", session is not None, session is None)
+    if session is None:
+        session = await sync_to_async(load_session)(jti)
+        await auth_cache.aadd(key, session, get_cache_timeout(session))
+    return session or None
+
+
+def get_sessions(jtis: Iterable[str]) -> Dict[str, CachedSession]:
+    """Return the live sessions of ``jtis`` with one cache multi-get."""
+    keys = {get_cache_key(jti): jti for jti in jtis}
+    sessions = {
+        keys[key]: session for key, session in auth_cache.get_many(keys).items()
+    }
+    missing = [jti for jti in keys.values() if jti not in sessions]
+    record_cache_lookups("session", len(sessions), len(missing))
+    if missing:
+        loaded = {
+            jti: CachedSession(user_id, expires_at)
+            for jti, user_id, expires_at in UserSession.objects.filter(
+                jti__in=missing
+            ).values_list("jti", *CachedSession._fields)
+        }
+        for jti in missing:
+            session = loaded.get(jti, NO_SESSION)
+            auth_cache.add(get_cache_key(jti), session, get_cache_timeout(session))
+            sessions[jti] = session
+    return {jti: session for jti, session in sessions.items() if session}
+
+
+def start_session(user: Any, request: Any = None) -> UserSession:
+    meta = getattr(request, "META", {})
+    now = timezone.now()
+    session = UserSession.objects.create(
+        user=user,
+        jti=uuid.uuid4().hex,
+        user_agent=meta.get("HTTP_USER_AGENT", "")[:255],
+        ip_address=meta.get("REMOTE_ADDR") or None,
+        last_seen_at=now,
+        expires_at=now + settings.JWT_TTL_REFRESH,
+    )
+    limit = settings.SESSION_MAX_PER_USER
+    if limit > 0:
+        # Keep the table bounded per user: the oldest sessions are ended.
+        stale = list(
+            UserSession.objects.filter(user=user)
+            .order_by("-created_at", "-pk")
+            .values_list("jti", flat=True)[limit:]
+        )
+        if stale:
+            end_sessions(stale)
+    return session
+
+
+def extend_session(jti: str) -> None:
+    """Push the expiry of a session whose refresh token was just rotated."""
+    now = timezone.now()
+    UserSession.objects.filter(jti=jti).update(
+        last_seen_at=now, expires_at=now + settings.JWT_TTL_REFRESH
+    )
+    auth_cache.delete(get_cache_key(jti))
+
+
+def end_sessions(jtis: Iterable[str]) -> int:
+    jtis = list(jtis)
+    deleted, __ = UserSession.objects.filter(jti__in=jtis).delete()
+    auth_cache.set_many(
+        {get_cache_key(jti): NO_SESSION for jti in jtis},
+        get_cache_timeout(NO_SESSION),
+    )
+    return deleted
+
+
+def revoke_session(user: Any, jti: str) -> bool:
+    deleted, __ = UserSession.objects.filter(user=user, jti=jti).delete()
+    if deleted:
+        auth_cache.set(get_cache_key(jti), NO_SESSION, get_cache_timeout(NO_SESSION))
+    return bool(deleted)
+
+
+def delete_user_sessions(user: Any) -> None:
+    """
+    Drop every session row of ``user``. Only called together with a token
+    generation bump, which already rejects the sessions' cached entries.
+    """
+    UserSession.objects.filter(user=user).delete()
+
+
+def sweep_expired_sessions(
+    batch_size: int, pause: float = 0.0, now: Optional[datetime] = None
+) -> int:
+    """
+    Delete sessions that expired before ``now`` in batches of
+    ``batch_size``, walking the ``(expires_at, id)`` index with a keyset
+    cursor. Each batch is its own short transaction.
+    """
+    now = now or timezone.now()
+    deleted = 0
+    cursor = Q()
+    while True:
+        batch = list(
+            UserSession.objects.filter(cursor, expires_at__lt=now)
+            .order_by("expires_at", "pk")
+            .values_list("expires_at", "pk")[:batch_size]
+        )
+        if not batch:
+            return deleted
+        count, __ = UserSession.objects.filter(pk__in=[pk for __, pk in batch]).delete()
+        deleted += count
+        last_expires_at, last_pk = batch[-1]
+        cursor = Q(expires_at__gt=last_expires_at) | Q(
+            expires_at=last_expires_at, pk__gt=last_pk
+        )
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,53 @@
+from typing import Any
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from src.account.api_keys import invalidate_api_key
+from src.account.models import APIKey
+from src.account.services import revoke_tokens
+from src.core.db.routers import stick_to_primary
+from src.core.user_snapshots import invalidate_user_snapshot
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_snapshot_on_change(
+    sender: Any, instance: User, **kwargs: Any
+) -> None:
+    stick_to_primary(instance.pk)
+    invalidate_user_snapshot(instance.pk)
+
+
+@receiver(pre_save, sender=User)
+def check_deactivation(
+    sender: Any, instance: User, update_fields: Any = None, **kwargs: Any
+) -> None:
+    instance._deactivated = (
+        instance.pk is not None
+        and not instance.is_active
+        and (update_fields is None or "is_active" in update_fields)
+        and User.objects.filter(pk=instance.pk, is_active=True).exists()
+    )
+
+
+@receiver(post_save, sender=User)
+def revoke_tokens_on_deactivation(sender: Any, instance: User, **kwargs: Any) -> None:
+    # Access tokens may carry is_active in their profile claims, which stay
+    # valid until they expire unless the token generation moves on.
+    if getattr(instance, "_deactivated", False):
+        instance._deactivated = False
+        revoke_tokens(instance)
+
+
+@receiver(post_save, sender=APIKey)
+@receiver(post_delete, sender=APIKey)
+def invalidate_api_key_on_change(
+    sender: Any, instance: APIKey, created: bool = False, **kwargs: Any
+) -> None:
+    if not created:
+        # New keys are random and cannot have been cached.
+        invalidate_api_key(instance.digest)
@@ -1,11 +1,13 @@
-from typing import Any, Union
+from typing import Any, Mapping, Union
 
+from django.conf import settings
 from django.contrib.auth import authenticate, get_user_model
 from django.http import QueryDict
 from django.middleware.csrf import (
     _get_new_csrf_string,
     _mask_cipher_secret,
 )
+from django.utils.crypto import constant_time_compare
 from django.utils.functional import cached_property
 from django.utils.translation import gettext as _
 from rest_framework import exceptions
@@ -13,13 +15,23 @@ from rest_framework import exceptions
 from jwt.exceptions import PyJWTError
 from rest_framework import serializers
 
-from src.account.services import login
+from src.account.services import login, revoke_tokens
+from src.account.sessions import extend_session, start_session
 from src.core.jwt import (
+    RefreshTokenReuseError,
     create_access_token,
     create_refresh_token,
+    get_refresh_token_payload,
     get_user_from_access_token,
+    get_user_from_payload,
+    is_session_token,
+    rotate_refresh_token,
+    verify_access_tokens,
+)
+from src.core.mixins.serializers import (
+    ServerTimingSerializerMixin,
+    ViewProxySerializerMixin,
 )
-from src.core.mixins.serializers import ViewProxySerializerMixin
 
 User = get_user_model()
 
@@ -38,10 +50,17 @@ class LoginViewSerializer(serializers.ModelSerializer):
         return self.__csrf_token
 
     def get_refresh_token(self, obj: User) -> str:
-        return create_refresh_token(obj, {"csrf_token": self.__csrf_token})
+        return create_refresh_token(
+            obj,
+            {
+                "csrf_token": self.__csrf_token,
+                **self.context.get("refresh_token_payload", {}),
+            },
+            self.context.get("jti"),
+        )
 
     def get_token(self, obj: User) -> str:
-        return create_access_token(obj)
+        return create_access_token(obj, jti=self.context.get("jti"))
 
     class Meta:
         model = User
@@ -76,11 +95,42 @@ class LoginActionSerializer(ViewProxySerializerMixin, serializers.Serializer):
     def save(self, **kwargs: Any) -> User:
         request = self.request
         self.instance = login(self.instance, request)
+        self.context["jti"] = start_session(self.instance, request).jti
         if hasattr(request, "_request"):
             request._request._cached_user = self.instance
         return self.instance
 
 
+class RefreshTokenSerializer(ViewProxySerializerMixin, serializers.Serializer):
+    view_serializer = LoginViewSerializer
+
+    refresh_token = serializers.CharField(required=True, allow_null=False)
+    csrf_token = serializers.CharField(required=True, allow_null=False)
+
+    def validate(self, attrs: Union[dict, QueryDict]) -> Union[dict, QueryDict]:
+        assert not self.instance
+        attrs = super().validate(attrs)
+        error = _("%s không hợp lệ") % (_("Mã"),)
+        try:
+            payload = get_refresh_token_payload(attrs["refresh_token"])
+            if not constant_time_compare(
+                payload.get("csrf_token", ""), attrs["csrf_token"]
+            ):
+                raise exceptions.ValidationError(error)
+            user = get_user_from_payload(payload)
+            self.context["refresh_token_payload"] = rotate_refresh_token(payload)
+        except RefreshTokenReuseError:
+            revoke_tokens(user)
+            raise exceptions.ValidationError(error)
+        except PyJWTError:
+            raise exceptions.ValidationError(error)
+        if is_session_token(payload):
+            extend_session(payload["jti"])
+            self.context["jti"] = payload["jti"]
+        self.instance = user
+        return attrs
+
+
 class VerifyTokenSerializer(serializers.Serializer):
     token = serializers.CharField(required=True, allow_null=False)
 
@@ -93,6 +143,27 @@ class VerifyTokenSerializer(serializers.Serializer):
         return attrs
 
 
-class MeViewSerializer(serializers.Serializer):
-    # TODO: something
-    pass
+class BatchVerifyTokenSerializer(serializers.Serializer):
+    tokens = serializers.ListField(
+        child=serializers.CharField(allow_blank=True),
+        allow_empty=False,
+        max_length=settings.JWT_VERIFY_BATCH_MAX_SIZE,
+        write_only=True,
+    )
+    results = serializers.ListField(child=serializers.DictField(), read_only=True)
+
+    def validate(self, attrs: Union[dict, QueryDict]) -> Union[dict, QueryDict]:
+        attrs = super().validate(attrs)
+        attrs["results"] = verify_access_tokens(attrs["tokens"])
+        return attrs
+
+
+class MeViewSerializer(ServerTimingSerializerMixin, serializers.Serializer):
+    name = serializers.SerializerMethodField()
+    email = serializers.EmailField(read_only=True)
+    is_active = serializers.BooleanField(read_only=True)
+
+    def get_name(self, obj: Union[User, Mapping[str, Any]]) -> str:
+        if isinstance(obj, Mapping):
+            return obj["name"]
+        return f"{obj.last_name} {obj.first_name}"
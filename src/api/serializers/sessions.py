@@ -0,0 +1,24 @@
+from rest_framework import serializers
+
+from src.account.models import UserSession
+
+
+class SessionSerializer(serializers.ModelSerializer):
+    is_current = serializers.SerializerMethodField()
+
+    def get_is_current(self, obj: UserSession) -> bool:
+        payload = getattr(self.context.get("request"), "jwt_payload", None) or {}
+        return payload.get("jti") == obj.jti
+
+    class Meta:
+        model = UserSession
+        fields = (
+            "jti",
+            "user_agent",
+            "ip_address",
+            "created_at",
+            "last_seen_at",
+            "expires_at",
+            "is_current",
+        )
+        read_only_fields = fields
@@ -1,11 +1,34 @@
 from django.urls import path
 
-from src.api.views.login import LoginView, MeViewSet, VerifyTokenView
+from src.api.views.login import (
+    BatchVerifyTokenView,
+    LoginView,
+    MeViewSet,
+    RefreshTokenView,
+    VerifyTokenView,
+)
+from src.api.views.sessions import SessionViewSet
 
 urlpatterns = [
     path("login/", LoginView.as_view({"post": "post"}), name="login"),
     path(
         "verify-token/", VerifyTokenView.as_view({"post": "post"}), name="verify-token"
     ),
+    path(
+        "verify-token/batch/",
+        BatchVerifyTokenView.as_view({"post": "post"}),
+        name="verify-token-batch",
+    ),
+    path(
+        "token/refresh/",
+        RefreshTokenView.as_view({"post": "post"}),
+        name="token-refresh",
+    ),
     path("me/", MeViewSet.as_view({"get": "retrieve"}), name="me"),
+    path("sessions/", SessionViewSet.as_view({"get": "list"}), name="sessions"),
+    path(
+        "sessions/<str:jti>/",
+        SessionViewSet.as_view({"delete": "destroy"}),
+        name="session-detail",
+    ),
 ]
@@ -1,26 +1,37 @@
-from typing import Any
+import hashlib
+import json
+from typing import Any, Dict
 
 from django.contrib.auth import get_user_model
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
 from django.utils.translation import gettext as _
 from rest_framework import status
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.settings import api_settings
 
 from src.api.serializers.login import (
+    BatchVerifyTokenSerializer,
     LoginActionSerializer,
     MeViewSerializer,
+    RefreshTokenSerializer,
     VerifyTokenSerializer,
 )
 from rest_framework.viewsets import GenericViewSet
 from rest_framework.mixins import RetrieveModelMixin
 
+from src.core.jwt import PROFILE_FIELD, has_profile_claims
+from src.core.throttling import LoginIPRateThrottle, LoginUsernameRateThrottle
+
 User = get_user_model()
 
 
 class LoginView(GenericViewSet):
 
     serializer_class = LoginActionSerializer
-    permission_classes = [AllowAny]
+    # Checked before the serializer runs, so rejected attempts never hash.
+    throttle_classes = [LoginIPRateThrottle, LoginUsernameRateThrottle]
 
     def post(self, request: Any, *args: Any, **kwargs: Any) -> Response:
         ser = self.get_serializer(data=request.data)
@@ -35,10 +46,22 @@ class LoginView(GenericViewSet):
         )
 
 
+class RefreshTokenView(GenericViewSet):
+
+    serializer_class = RefreshTokenSerializer
+
+    def post(self, request: Any, *args: Any, **kwargs: Any) -> Response:
+        ser = self.get_serializer(data=request.data)
+        if ser.is_valid():
+            return Response(ser.data, status=status.HTTP_200_OK)
+        return Response(
+            {"message": _("xác minh thất bại")}, status=status.HTTP_401_UNAUTHORIZED
+        )
+
+
 class VerifyTokenView(GenericViewSet):
 
     serializer_class = VerifyTokenSerializer
-    permission_classes = [AllowAny]
 
     def post(self, request: Any, *args: Any, **kwargs: Any) -> Response:
         ser = self.get_serializer(data=request.data)
@@ -49,9 +72,46 @@ class VerifyTokenView(GenericViewSet):
         return Response(status=status.HTTP_200_OK)
 
 
+class BatchVerifyTokenView(GenericViewSet):
+
+    serializer_class = BatchVerifyTokenSerializer
+
+    def post(self, request: Any, *args: Any, **kwargs: Any) -> Response:
+        ser = self.get_serializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        return Response(ser.data, status=status.HTTP_200_OK)
+
+
 class MeViewSet(RetrieveModelMixin, GenericViewSet):
     serializer_class = MeViewSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, *api_settings.DEFAULT_PERMISSION_CLASSES]
+    required_scopes = ("profile:read",)
+    # Only reads the profile claims, so tokens carrying them need no lookup.
+    use_profile_claims = True
 
     def get_object(self) -> User:
         return self.request.user
+
+    def get_profile_etag(self, payload: Dict[str, Any]) -> str:
+        digest = hashlib.md5(
+            json.dumps(payload[PROFILE_FIELD], sort_keys=True).encode()
+        ).hexdigest()
+        return quote_etag(
+            f"{payload['user_id']}-{payload['token_generation']}-{digest[:16]}"
+        )
+
+    def retrieve(self, request: Any, *args: Any, **kwargs: Any) -> Response:
+        payload = getattr(request, "jwt_payload", None)
+        if not payload or not has_profile_claims(payload):
+            return super().retrieve(request, *args, **kwargs)
+
+        # Rendered from the verified token, so nothing but the revocation
+        # check is looked up.
+        etag = self.get_profile_etag(payload)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            serializer = self.get_serializer(payload[PROFILE_FIELD])
+            response = Response(serializer.data)
+        response["ETag"] = etag
+        patch_vary_headers(response, ["Authorization"])
+        return response
@@ -0,0 +1,33 @@
+from typing import Any
+
+from django.db.models import QuerySet
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.mixins import ListModelMixin
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.viewsets import GenericViewSet
+
+from src.account.models import UserSession
+from src.account.sessions import revoke_session
+from src.api.serializers.sessions import SessionSerializer
+
+
+class SessionViewSet(ListModelMixin, GenericViewSet):
+    serializer_class = SessionSerializer
+    permission_classes = [IsAuthenticated, *api_settings.DEFAULT_PERMISSION_CLASSES]
+    required_scopes = ("sessions",)
+    lookup_field = "jti"
+
+    def get_queryset(self) -> QuerySet:
+        return UserSession.objects.filter(
+            user=self.request.user, expires_at__gt=timezone.now()
+        ).order_by("-last_seen_at")
+
+    def destroy(self, request: Any, *args: Any, **kwargs: Any) -> Response:
+        # One DELETE; the session's tokens are rejected from the next request.
+        if not revoke_session(request.user, kwargs[self.lookup_field]):
+            raise NotFound()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class CoreConfig(AppConfig):
+    name = "src.core"
+    label = "core"
+
+    def ready(self) -> None:
+        from src.core import checks  # noqa: F401
+
+        # Started without waiting, so that requests rarely have to.
+        resolver = getattr(settings, "HOST_ADDRESS_RESOLVER", None)
+        if resolver is not None:
+            resolver.start()
@@ -1,10 +1,35 @@
-from typing import Any, Optional, Union
+from typing import Any, Callable, Optional, Union
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
 from django.contrib.auth.backends import ModelBackend as DjangoModelBackend
 from jwt import PyJWTError
 
-from src.core.jwt import get_token_from_request, get_user_from_access_token
+from src.account.api_keys import (
+    aget_api_key,
+    get_api_key,
+    get_api_key_from_request,
+    touch_api_key,
+)
+from src.core.hashing import (
+    acheck_password,
+    ahash_password,
+    check_password,
+    get_password_hash_pool,
+    hash_password,
+)
+from src.core.jwt import (
+    aget_user_from_payload,
+    get_access_token_payload,
+    get_token_from_request,
+    get_user_from_payload,
+    uses_profile_claims,
+    validate_active_user,
+)
+from src.core.metrics import auth_backend_seconds
+from src.core.throttling import apassword_hash_slot, password_hash_slot
+from src.core.timing import timed
+from src.core.user_snapshots import aget_user_snapshot, get_user_snapshot
 
 User = get_user_model()
 
@@ -16,7 +41,25 @@ def get_user(user_id: Union[int, str]) -> User:
     return User.objects.get(username=user_id, is_active=True)
 
 
+def get_password_setter(user: User) -> Callable[[str], None]:
+    # Same rehash-on-login behaviour as AbstractBaseUser.check_password.
+    def setter(raw_password: str) -> None:
+        user.set_password(raw_password)
+        user._password = None
+        user.save(update_fields=["password"])
+
+    return setter
+
+
 class ModelBackend(DjangoModelBackend):
+    def get_username(self, username: Optional[str], **kwargs: Any) -> Optional[str]:
+        if username is None:
+            username = kwargs.get("email")
+
+        if username is None:
+            username = kwargs.get("main_phone_number")
+        return username
+
     def authenticate(
         self,
         request: Any,
@@ -24,23 +67,59 @@ class ModelBackend(DjangoModelBackend):
         password: Optional[str] = None,
         **kwargs: Any
     ) -> Optional[User]:
-        if username is None:
-            username = kwargs.get("email")
+        username = self.get_username(username, **kwargs)
+        if username is None or password is None or not request:
+            return None
+        with auth_backend_seconds.time(("model",)):
+            try:
+                user = self.get_user(username)
+            except User.DoesNotExist:
+                # Run the default password hasher once to reduce the timing
+                # difference between an existing and a nonexistent user (#20760).
+                with password_hash_slot():
+                    hash_password(password)
+                return None
 
-        if username is None:
-            username = kwargs.get("main_phone_number")
+            with password_hash_slot():
+                is_valid = check_password(
+                    password, user.password, get_password_setter(user)
+                )
+        if is_valid:
+            return user
+        return None
 
-        if username is None or password is None or not request:
+    async def aauthenticate(
+        self,
+        request: Any,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        **kwargs: Any
+    ) -> Optional[User]:
+        if password is None:
             return None
-        try:
-            user = self.get_user(username)
-        except User.DoesNotExist:
-            # Run the default password hasher once to reduce the timing
-            # difference between an existing and a nonexistent user (#20760).
-            User().set_password(password)
+        if get_password_hash_pool() is None:
+            return await sync_to_async(self.authenticate)(
+                request, username=username, password=password, **kwargs
+            )
+
+        # With a hashing pool the event loop only awaits the worker process,
+        # so no executor thread is tied up for the length of the hash.
+        username = self.get_username(username, **kwargs)
+        if username is None or not request:
             return None
+        with auth_backend_seconds.time(("model",)):
+            try:
+                user = await sync_to_async(self.get_user)(username)
+            except User.DoesNotExist:
+                async with apassword_hash_slot():
+                    await ahash_password(password)
+                return None
 
-        if user.check_password(password):
+            async with apassword_hash_slot():
+                is_valid = await acheck_password(
+                    password, user.password, get_password_setter(user)
+                )
+        if is_valid:
             return user
         return None
 
@@ -57,9 +136,78 @@ class JSONWebTokenBackend(DjangoModelBackend):
         if not token:
             return None
         try:
-            user = get_user_from_access_token(token)
+            with timed("authenticate"), auth_backend_seconds.time(("jwt",)):
+                payload = get_access_token_payload(token)
+                user = get_user_from_payload(payload, uses_profile_claims(request))
         except PyJWTError:
             return None
+        request.jwt_payload = payload
+        return user
+
+    async def aauthenticate(self, request: Any, **kwargs: Any) -> Optional[User]:
+        if not request:
+            return None
+
+        token = get_token_from_request(request)
+        if not token:
+            return None
+        try:
+            with timed("authenticate"), auth_backend_seconds.time(("jwt",)):
+                payload = get_access_token_payload(token)
+                user = await aget_user_from_payload(
+                    payload, uses_profile_claims(request)
+                )
+        except PyJWTError:
+            return None
+        request.jwt_payload = payload
+        return user
+
+    def get_user(self, user_id: Union[str, int]) -> User:
+        return get_user(user_id)
+
+
+class APIKeyBackend(DjangoModelBackend):
+    """
+    Authenticate machine clients sending ``Authorization: Api-Key <key>``.
+    The key is cached by digest, so a request usually needs no query at all.
+    """
+
+    def authenticate(self, request: Any, **kwargs: Any) -> Optional[User]:
+        if not request:
+            return None
+
+        key = get_api_key_from_request(request)
+        if not key:
+            return None
+        with timed("authenticate"), auth_backend_seconds.time(("api_key",)):
+            api_key = get_api_key(key)
+            if not api_key or not api_key.is_valid:
+                return None
+            try:
+                user = validate_active_user(get_user_snapshot(api_key.user_id))
+            except PyJWTError:
+                return None
+            touch_api_key(api_key)
+        request.api_key = api_key
+        return user
+
+    async def aauthenticate(self, request: Any, **kwargs: Any) -> Optional[User]:
+        if not request:
+            return None
+
+        key = get_api_key_from_request(request)
+        if not key:
+            return None
+        with timed("authenticate"), auth_backend_seconds.time(("api_key",)):
+            api_key = await aget_api_key(key)
+            if not api_key or not api_key.is_valid:
+                return None
+            try:
+                user = validate_active_user(await aget_user_snapshot(api_key.user_id))
+            except PyJWTError:
+                return None
+            await sync_to_async(touch_api_key)(api_key)
+        request.api_key = api_key
         return user
 
     def get_user(self, user_id: Union[str, int]) -> User:
@@ -0,0 +1,30 @@
+from typing import Any, List
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+
+# Backends that each worker keeps to itself.
+PROCESS_LOCAL_CACHES = (LocMemCache, DummyCache)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs: Any, **kwargs: Any) -> List[Error]:
+    """
+    Token generations, refresh token rotation and login throttling keep
+    their state in the default cache, which every worker must share.
+    """
+    if settings.DEBUG or not isinstance(caches["default"], PROCESS_LOCAL_CACHES):
+        return []
+    return [
+        Error(
+            "The default cache is local to each worker process.",
+            hint=(
+                "Set CACHE_URL or REDIS_URL to a cache shared by all workers, "
+                "or silence core.E001 when running a single worker."
+            ),
+            id="core.E001",
+        )
+    ]
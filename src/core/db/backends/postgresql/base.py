@@ -0,0 +1,21 @@
+from typing import Any, Dict
+
+from django.db.backends.postgresql.base import (
+    DatabaseWrapper as PostgreSQLDatabaseWrapper,
+)
+
+from src.core.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, PostgreSQLDatabaseWrapper):
+    def get_connection_params(self) -> Dict[str, Any]:
+        conn_params = super().get_connection_params()
+        statement_timeout = self.get_statement_timeout()
+        if statement_timeout:
+            # Sent in the startup packet, so it costs no extra round trip and
+            # holds for every statement of the pooled connection.
+            options = conn_params.get("options", "")
+            conn_params["options"] = (
+                f"{options} -c statement_timeout={statement_timeout}".strip()
+            )
+        return conn_params
@@ -0,0 +1,63 @@
+import time
+from typing import Any, Dict, Optional
+
+from django.db.backends.sqlite3.base import (
+    Database,
+    DatabaseWrapper as SQLiteDatabaseWrapper,
+    SQLiteCursorWrapper,
+)
+
+from src.core.db.pool import PooledDatabaseWrapperMixin
+
+# SQLite virtual machine instructions between two statement timeout checks.
+PROGRESS_HANDLER_INTERVAL = 10000
+
+
+class StatementTimeoutConnection(Database.Connection):
+    """
+    SQLite has no statement timeout, so one is emulated with a progress
+    handler that interrupts statements running past ``statement_timeout``
+    milliseconds.
+    """
+
+    statement_timeout = 0
+    deadline: Optional[float] = None
+
+    def enable_statement_timeout(self, statement_timeout: int) -> None:
+        self.statement_timeout = statement_timeout
+        self.set_progress_handler(
+            self.check_statement_timeout if statement_timeout else None,
+            PROGRESS_HANDLER_INTERVAL,
+        )
+
+    def start_statement(self) -> None:
+        if self.statement_timeout:
+            self.deadline = time.monotonic() + self.statement_timeout / 1000
+
+    def check_statement_timeout(self) -> int:
+        return int(self.deadline is not None and time.monotonic() > self.deadline)
+
+
+class StatementTimeoutCursorWrapper(SQLiteCursorWrapper):
+    def execute(self, query: str, params: Any = None) -> Any:
+        self.connection.start_statement()
+        return super().execute(query, params)
+
+    def executemany(self, query: str, param_list: Any) -> Any:
+        self.connection.start_statement()
+        return super().executemany(query, param_list)
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, SQLiteDatabaseWrapper):
+    def get_connection_params(self) -> Dict[str, Any]:
+        conn_params = super().get_connection_params()
+        conn_params["factory"] = StatementTimeoutConnection
+        return conn_params
+
+    def create_connection(self, conn_params: Dict[str, Any]) -> Any:
+        connection = super().create_connection(conn_params)
+        connection.enable_statement_timeout(self.get_statement_timeout())
+        return connection
+
+    def create_cursor(self, name: Optional[str] = None) -> Any:
+        return self.connection.cursor(factory=StatementTimeoutCursorWrapper)
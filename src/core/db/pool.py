@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, Tuple
+
+from django.db import OperationalError
+
+
+class ConnectionPool:
+    """
+    Bounded pool of DB-API connections shared by the threads of a process.
+
+    Connections idle for longer than ``health_check_interval`` seconds are
+    pinged before being handed out again, and dropped if the ping fails.
+    When ``max_size`` connections are checked out, ``get`` waits up to
+    ``timeout`` seconds for one to be returned.
+    """
+
+    def __init__(
+        self, max_size: int, timeout: float, health_check_interval: float
+    ) -> None:
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._idle: Deque[Tuple[Any, float]] = deque()
+        self._size = 0
+        self._condition = threading.Condition()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    def get(self, connect: Callable[[], Any], check: Callable[[Any], bool]) -> Any:
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._condition.wait(remaining):
+                        raise OperationalError(
+                            "No database connection available within %.2fs "
+                            "(pool size %d)" % (self.timeout, self.max_size)
+                        )
+                if not self._idle:
+                    self._size += 1
+                    break
+                # Most recently returned first: it is the least likely to have
+                # been dropped by the server.
+                connection, returned_at = self._idle.pop()
+
+            if time.monotonic() - returned_at < self.health_check_interval or check(
+                connection
+            ):
+                return connection
+            self.discard(connection)
+
+        try:
+            return connect()
+        except BaseException:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+    def put(self, connection: Any) -> None:
+        with self._condition:
+            self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def discard(self, connection: Any) -> None:
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    def close(self) -> None:
+        with self._condition:
+            idle, self._idle = self._idle, deque()
+        for connection, __ in idle:
+            self.discard(connection)
+
+
+_pools: Dict[Hashable, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key: Hashable, settings_dict: Dict[str, Any]) -> ConnectionPool:
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                options = settings_dict.get("POOL", {})
+                pool = _pools[key] = ConnectionPool(
+                    options.get("MAX_SIZE", 10),
+                    options.get("TIMEOUT", 10),
+                    options.get("HEALTH_CHECK_INTERVAL", 30),
+                )
+    return pool
+
+
+def close_pools() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def _forget_pools() -> None:
+    # Sockets inherited from the parent process must not be reused, nor
+    # closed, in a forked child; leave them to the parent.
+    _pools.clear()
+
+
+os.register_at_fork(after_in_child=_forget_pools)
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Make ``close()`` return the connection to a process-wide pool and
+    ``connect()`` take one from it, so requests skip the connect handshake.
+    Pool limits come from the ``POOL`` entry of the database settings.
+    """
+
+    def get_pool(self) -> ConnectionPool:
+        settings_dict = self.settings_dict
+        key = (
+            self.vendor,
+            settings_dict["NAME"],
+            settings_dict["HOST"],
+            settings_dict["PORT"],
+            settings_dict["USER"],
+        )
+        return get_pool(key, settings_dict)
+
+    def get_statement_timeout(self) -> int:
+        """STATEMENT_TIMEOUT of the database settings, in milliseconds."""
+        return int(self.settings_dict.get("STATEMENT_TIMEOUT") or 0)
+
+    def get_new_connection(self, conn_params: Dict[str, Any]) -> Any:
+        return self.get_pool().get(
+            lambda: self.create_connection(conn_params), self.check_connection
+        )
+
+    def create_connection(self, conn_params: Dict[str, Any]) -> Any:
+        return super().get_new_connection(conn_params)
+
+    def check_connection(self, connection: Any) -> bool:
+        try:
+            connection.cursor().execute("SELECT 1")
+            connection.rollback()
+        except self.Database.Error:
+            return False
+        return True
+
+    def _close(self) -> None:
+        if self.connection is None:
+            return
+        pool = self.get_pool()
+        # A connection closed inside atomic() stays referenced by this wrapper
+        # so that further queries fail; it must not be handed to anyone else.
+        if self.in_atomic_block or (self.errors_occurred and not self.is_usable()):
+            pool.discard(self.connection)
+            return
+        try:
+            with self.wrap_database_errors:
+                self.connection.rollback()
+        except Exception:
+            pool.discard(self.connection)
+        else:
+            pool.put(self.connection)
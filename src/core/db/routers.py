@@ -0,0 +1,69 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterable, Iterator, Optional, Union
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_STICKY_CACHE_KEY = "replica-sticky:%s"
+
+_replica: ContextVar[Optional[str]] = ContextVar("replica", default=None)
+
+
+def get_sticky_cache_key(user_id: Union[int, str]) -> str:
+    return REPLICA_STICKY_CACHE_KEY % (user_id,)
+
+
+def stick_to_primary(user_id: Union[int, str]) -> None:
+    """
+    Serve reads about ``user_id`` from the primary for REPLICA_STICKINESS,
+    so a write is not undone by a lagging replica being cached on top of it.
+    """
+    if settings.DATABASE_REPLICAS:
+        cache.set(
+            get_sticky_cache_key(user_id),
+            1,
+            settings.REPLICA_STICKINESS.total_seconds(),
+        )
+
+
+def is_sticky(user_ids: Iterable[Union[int, str]]) -> bool:
+    return bool(cache.get_many([get_sticky_cache_key(pk) for pk in user_ids]))
+
+
+@contextmanager
+def replica_reads(user_ids: Iterable[Union[int, str]]) -> Iterator[None]:
+    """
+    Route the reads of the block to a replica, unless one of ``user_ids``
+    was written to within REPLICA_STICKINESS.
+    """
+    replicas = settings.DATABASE_REPLICAS
+    if not replicas or _replica.get() is not None or is_sticky(user_ids):
+        yield
+        return
+    token = _replica.set(random.choice(replicas))
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Send writes, and reads outside ``replica_reads``, to the primary.
+    Replicas are kept in sync by the database, so nothing migrates them.
+    """
+
+    def db_for_read(self, model: Any, **hints: Any) -> str:
+        return _replica.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model: Any, **hints: Any) -> str:
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1: Any, obj2: Any, **hints: Any) -> bool:
+        return True
+
+    def allow_migrate(self, db: str, app_label: str, **hints: Any) -> bool:
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,259 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    check_password as django_check_password,
+    get_hasher,
+    identify_hasher,
+    is_password_usable,
+    make_password,
+)
+from django.utils.module_loading import import_string
+
+from src.core.throttling import PasswordHashCapacityExceeded
+
+
+def _hasher_path(hasher: Any) -> str:
+    return f"{type(hasher).__module__}.{type(hasher).__qualname__}"
+
+
+def _verify(hasher_path: str, password: str, encoded: str) -> bool:
+    return import_string(hasher_path)().verify(password, encoded)
+
+
+def _encode(hasher_path: str, password: str, salt: str) -> str:
+    return import_string(hasher_path)().encode(password, salt)
+
+
+def _encode_many(hasher_path: str, items: List[Tuple[str, str]]) -> List[str]:
+    hasher = import_string(hasher_path)()
+    return [hasher.encode(password, salt) for password, salt in items]
+
+
+def _harden_runtime(hasher_path: str, password: str, encoded: str) -> None:
+    import_string(hasher_path)().harden_runtime(password, encoded)
+
+
+class PasswordHashPool:
+    """
+    Bounded process pool for password hashing, so PBKDF2 neither holds the
+    GIL of the serving process nor queues without limit.
+
+    At most ``max_workers + max_queue`` hashes are accepted at once. Callers
+    that cannot get in within ``queue_timeout``, or whose hash does not
+    finish within ``queue_timeout + hash_timeout``, get
+    PasswordHashCapacityExceeded.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_queue: int,
+        queue_timeout: float,
+        hash_timeout: float,
+    ) -> None:
+        self.max_workers = max_workers
+        self.queue_timeout = queue_timeout
+        self.hash_timeout = hash_timeout
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.in_flight = 0
+        self.busy_seconds = 0.0
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # Forking a threaded server process is unsafe, so workers
+                    # are spawned fresh.
+                    self._executor = ProcessPoolExecutor(
+                        self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+        return self._executor
+
+    def _reject(self) -> None:
+        with self._lock:
+            self.rejected += 1
+        raise PasswordHashCapacityExceeded()
+
+    def _acquire(self) -> None:
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self._reject()
+
+    async def _aacquire(self) -> None:
+        deadline = time.monotonic() + self.queue_timeout
+        while not self._slots.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                self._reject()
+            await asyncio.sleep(0.005)
+
+    def _submit(self, func: Callable[..., Any], *args: Any) -> Future:
+        started = time.perf_counter()
+        try:
+            future = self.executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.submitted += 1
+            self.in_flight += 1
+
+        def done(__: Future) -> None:
+            self._slots.release()
+            with self._lock:
+                self.completed += 1
+                self.in_flight -= 1
+                self.busy_seconds += time.perf_counter() - started
+
+        future.add_done_callback(done)
+        return future
+
+    def _timeout(self) -> None:
+        with self._lock:
+            self.timed_out += 1
+        raise PasswordHashCapacityExceeded()
+
+    def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        self._acquire()
+        future = self._submit(func, *args)
+        try:
+            return future.result(timeout=self.queue_timeout + self.hash_timeout)
+        except FutureTimeoutError:
+            self._timeout()
+
+    async def arun(self, func: Callable[..., Any], *args: Any) -> Any:
+        await self._aacquire()
+        future = self._submit(func, *args)
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future), self.queue_timeout + self.hash_timeout
+            )
+        except asyncio.TimeoutError:
+            self._timeout()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "in_flight": self.in_flight,
+            "busy_seconds": self.busy_seconds,
+        }
+
+
+_pool: Optional[PasswordHashPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_password_hash_pool() -> Optional[PasswordHashPool]:
+    """Return the process-wide pool, or None when PASSWORD_HASH_POOL_SIZE is 0."""
+    global _pool
+    if settings.PASSWORD_HASH_POOL_SIZE <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PasswordHashPool(
+                    settings.PASSWORD_HASH_POOL_SIZE,
+                    settings.PASSWORD_HASH_POOL_QUEUE,
+                    settings.PASSWORD_HASH_QUEUE_TIMEOUT.total_seconds(),
+                    settings.PASSWORD_HASH_TIMEOUT.total_seconds(),
+                )
+    return _pool
+
+
+def _prepare_check(
+    password: Optional[str], encoded: str
+) -> Optional[Tuple[Any, Any, bool, bool]]:
+    # Mirrors django.contrib.auth.hashers.check_password up to the hash.
+    if password is None or not is_password_usable(encoded):
+        return None
+    preferred = get_hasher("default")
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return None
+    hasher_changed = hasher.algorithm != preferred.algorithm
+    must_update = hasher_changed or preferred.must_update(encoded)
+    return hasher, preferred, hasher_changed, must_update
+
+
+def check_password(
+    password: Optional[str],
+    encoded: str,
+    setter: Optional[Callable[[str], None]] = None,
+) -> bool:
+    pool = get_password_hash_pool()
+    if pool is None:
+        return django_check_password(password, encoded, setter)
+    prepared = _prepare_check(password, encoded)
+    if prepared is None:
+        return False
+    hasher, preferred, hasher_changed, must_update = prepared
+
+    is_correct = pool.run(_verify, _hasher_path(hasher), password, encoded)
+    if not is_correct and not hasher_changed and must_update:
+        pool.run(_harden_runtime, _hasher_path(preferred), password, encoded)
+    if setter and is_correct and must_update:
+        setter(password)
+    return is_correct
+
+
+async def acheck_password(
+    password: Optional[str],
+    encoded: str,
+    setter: Optional[Callable[[str], None]] = None,
+) -> bool:
+    pool = get_password_hash_pool()
+    if pool is None:
+        return await sync_to_async(django_check_password)(password, encoded, setter)
+    prepared = _prepare_check(password, encoded)
+    if prepared is None:
+        return False
+    hasher, preferred, hasher_changed, must_update = prepared
+
+    is_correct = await pool.arun(_verify, _hasher_path(hasher), password, encoded)
+    if not is_correct and not hasher_changed and must_update:
+        await pool.arun(_harden_runtime, _hasher_path(preferred), password, encoded)
+    if setter and is_correct and must_update:
+        await sync_to_async(setter)(password)
+    return is_correct
+
+
+def hash_password(password: str) -> str:
+    pool = get_password_hash_pool()
+    if pool is None:
+        return make_password(password)
+    hasher = get_hasher("default")
+    return pool.run(_encode, _hasher_path(hasher), password, hasher.salt())
+
+
+async def ahash_password(password: str) -> str:
+    pool = get_password_hash_pool()
+    if pool is None:
+        return await sync_to_async(make_password)(password)
+    hasher = get_hasher("default")
+    return await pool.arun(_encode, _hasher_path(hasher), password, hasher.salt())
@@ -0,0 +1,132 @@
+"""
+Host lists for the settings that include this machine's addresses.
+
+Resolving them needs a DNS lookup, which can be slow or hang. Instead of
+blocking on it while the settings are imported, the lookup is started in a
+background thread by ``CoreConfig.ready()``, or on first use of a list.
+
+Importing this module must stay cheap: it runs on every worker boot and
+every ``manage.py`` call.
+"""
+
+import socket
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+
+class HostAddressResolver:
+    """
+    Look up the addresses of this host once, in a daemon thread. Callers
+    only wait through ``wait()``, and never past ``timeout`` seconds after
+    the lookup started.
+    """
+
+    def __init__(self, timeout: float) -> None:
+        self.timeout = timeout
+        self.addresses: Optional[List[str]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._deadline = 0.0
+        self._lock = threading.Lock()
+
+    def _resolve(self) -> None:
+        try:
+            __, __, addresses = socket.gethostbyname_ex(socket.gethostname())
+        except OSError:
+            addresses = []
+        self.addresses = addresses
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._deadline = time.monotonic() + self.timeout
+                self._thread = threading.Thread(
+                    target=self._resolve, name="host-address-resolver", daemon=True
+                )
+                self._thread.start()
+
+    def get(self) -> Optional[List[str]]:
+        """Return the addresses, or None while the lookup is still running."""
+        if self.addresses is None:
+            self.start()
+        return self.addresses
+
+    def wait(self) -> Optional[List[str]]:
+        """Like ``get()``, but wait for the lookup until its deadline."""
+        if self.addresses is None:
+            self.start()
+            self._thread.join(max(self._deadline - time.monotonic(), 0))
+        return self.addresses
+
+
+class HostList(list):
+    """
+    ``hosts`` preceded by ``derive(addresses)`` of this host, once known.
+    Until the lookup completes, only ``hosts`` are listed, except that
+    iterating past them and ``in`` checks that miss them wait for the lookup
+    (see ``HostAddressResolver.wait``). Django checks ALLOWED_HOSTS by
+    iterating, so a host named by a static entry is never held up.
+
+    A list subclass, as Django requires for the settings it is used for; the
+    derived addresses are filled in on first read.
+    """
+
+    def __init__(
+        self,
+        hosts: Iterable[str],
+        resolver: HostAddressResolver,
+        derive: Callable[[List[str]], Iterable[str]] = list,
+    ) -> None:
+        self.hosts = list(hosts)
+        self.resolver = resolver
+        self.derive = derive
+        self.resolved = False
+        super().__init__(self.hosts)
+
+    def resolve(self) -> None:
+        if self.resolved:
+            return
+        addresses = self.resolver.get()
+        if addresses is not None:
+            super().__init__([*self.derive(addresses), *self.hosts])
+            self.resolved = True
+
+    def __getitem__(self, index: Any) -> Any:
+        self.resolve()
+        return super().__getitem__(index)
+
+    def __len__(self) -> int:
+        self.resolve()
+        return super().__len__()
+
+    def __iter__(self) -> Iterator[str]:
+        self.resolve()
+        if self.resolved:
+            return super().__iter__()
+        return self._iter_pending()
+
+    def _iter_pending(self) -> Iterator[str]:
+        yield from self.hosts
+        addresses = self.resolver.wait()
+        if addresses is not None:
+            self.resolve()
+            yield from self.derive(addresses)
+
+    def __contains__(self, host: object) -> bool:
+        return any(item == host for item in self)
+
+    def __add__(self, other: Iterable[str]) -> List[str]:
+        self.resolve()
+        return [*super().__iter__(), *other]
+
+    def __eq__(self, other: object) -> bool:
+        self.resolve()
+        return super().__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        self.resolve()
+        return super().__repr__()
@@ -1,12 +1,42 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 import jwt
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.handlers.wsgi import WSGIRequest
+from django.db import router
+from django.utils.module_loading import import_string
 from django.utils.translation import gettext as _
 
+from src.account.sessions import (
+    CachedSession,
+    aget_session,
+    get_session,
+    get_sessions,
+)
+from src.core.metrics import (
+    auth_token_verdicts_total,
+    jwt_decode_seconds,
+    record_cache_lookups,
+)
+from src.core.timing import timed
+from src.core.token_generation import (
+    aget_token_generation,
+    get_token_generation,
+    get_token_generations,
+)
+from src.core.user_snapshots import (
+    aget_user_snapshot,
+    get_user_snapshot,
+    get_user_snapshots,
+)
+
 User = get_user_model()
 
 JWT_ALGORITHM = "HS256"
@@ -17,7 +47,116 @@ JWT_REFRESH_TYPE = "refresh"
 JWT_THIRDPARTY_ACCESS_TYPE = "thirdparty"
 JWT_REFRESH_TOKEN_COOKIE_NAME = "refreshToken"
 
+# The latest seq of each family, and a marker per consumed token. Both live in
+# the default cache, which all workers share (see src.core.checks).
+REFRESH_TOKEN_FAMILY_CACHE_KEY = "refresh-token-family:%s"
+REFRESH_TOKEN_USED_CACHE_KEY = "refresh-token-used:%s:%s"
+
 PERMISSIONS_FIELD = "permissions"
+PROFILE_FIELD = "profile"
+# Model field order, as Model.from_db expects for partial rows.
+PROFILE_USER_FIELDS = ("id", "email", "is_active", "token_generation")
+
+TOKEN_VALID = "valid"
+TOKEN_EXPIRED = "expired"
+TOKEN_REVOKED = "revoked"
+TOKEN_MALFORMED = "malformed"
+# Only used as labels of rejected tokens in the metrics.
+TOKEN_INVALID_SIGNATURE = "invalid_signature"
+TOKEN_WRONG_TYPE = "wrong_type"
+
+
+class RefreshTokenReuseError(jwt.InvalidTokenError):
+    pass
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of already verified token payloads.
+
+    Entries are keyed on the signature segment and never outlive the token's
+    own ``exp`` claim, so a hit skips the HMAC check and JSON parsing without
+    extending the lifetime of a token.
+    """
+
+    def __init__(self, maxsize: int, ttl: timedelta) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl.total_seconds()
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[str, Dict[str, Any], float]]" = (
+            OrderedDict()
+        )
+        self._user_keys: Dict[Any, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_key(token: str) -> str:
+        return token.rpartition(".")[2]
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self._get_key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != token:
+                self.misses += 1
+                return None
+            if entry[2] <= time.time():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return {**entry[1]}
+
+    def set(self, token: str, payload: Dict[str, Any]) -> None:
+        if self.maxsize <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, exp)
+        key = self._get_key(token)
+        user_id = payload.get("user_id")
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (token, {**payload}, expires_at)
+            self._user_keys.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: Any) -> None:
+        with self._lock:
+            for key in self._user_keys.pop(user_id, set()):
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_id = entry[1].get("user_id")
+        keys = self._user_keys.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[user_id]
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+verified_token_cache = VerifiedTokenCache(
+    settings.JWT_VERIFIED_TOKEN_CACHE_SIZE, settings.JWT_VERIFIED_TOKEN_CACHE_TTL
+)
+jwt_codec = import_string(settings.JWT_CODEC)(settings.SECRET_KEY)
 
 
 def jwt_base_payload(exp_delta: timedelta) -> Dict[str, Any]:
@@ -31,30 +170,98 @@ def jwt_user_payload(
     token_type: str,
     exp_delta: timedelta,
     additional_payload: Optional[Dict[str, Any]] = None,
+    jti: Optional[str] = None,
 ) -> Dict[str, Any]:
 
-    # TODO: adding something to payload
     payload = jwt_base_payload(exp_delta)
+    payload.update(
+        {
+            "user_id": user.pk,
+            "type": token_type,
+            "token_generation": user.token_generation,
+        }
+    )
+    if jti:
+        # Ties the token to a UserSession, which can be revoked on its own.
+        payload["jti"] = jti
+    if token_type == JWT_ACCESS_TYPE and settings.JWT_EMBED_PROFILE_CLAIMS:
+        payload[PROFILE_FIELD] = jwt_profile_claims(user)
     if additional_payload:
         payload.update(additional_payload)
     return payload
 
 
-def jwt_encode(payload: Dict[str, Any]) -> str:
-    tk = jwt.encode(
-        payload,
-        settings.SECRET_KEY,
-        JWT_ALGORITHM,  # type: ignore
+def jwt_profile_claims(user: User) -> Dict[str, Any]:
+    return {
+        "name": f"{user.last_name} {user.first_name}",
+        "email": user.email,
+        "is_active": user.is_active,
+    }
+
+
+def get_user_from_profile_claims(payload: Dict[str, Any]) -> User:
+    """
+    Build a user from the embedded profile claims, without a cache or
+    database round trip. Fields outside the claims are deferred.
+    """
+    profile = payload[PROFILE_FIELD]
+    return User.from_db(
+        router.db_for_read(User),
+        PROFILE_USER_FIELDS,
+        (
+            payload["user_id"],
+            profile["email"],
+            profile["is_active"],
+            payload["token_generation"],
+        ),
     )
-    return tk.decode("utf-8") if not isinstance(tk, str) else tk
+
+
+def has_profile_claims(payload: Dict[str, Any]) -> bool:
+    return settings.JWT_EMBED_PROFILE_CLAIMS and PROFILE_FIELD in payload
+
+
+def uses_profile_claims(request: Any) -> bool:
+    """
+    Whether the view resolved for ``request`` sets ``use_profile_claims``,
+    i.e. only reads the fields embedded in the token. Other views get the
+    full user.
+    """
+    match = getattr(request, "resolver_match", None)
+    view_class = getattr(match.func, "cls", None) if match else None
+    return getattr(view_class, "use_profile_claims", False)
+
+
+def is_session_token(payload: Dict[str, Any]) -> bool:
+    return "jti" in payload
+
+
+def jwt_encode(payload: Dict[str, Any]) -> str:
+    return jwt_codec.encode(payload)
+
+
+def get_rejection_verdict(error: jwt.PyJWTError) -> str:
+    if isinstance(error, jwt.ExpiredSignatureError):
+        return TOKEN_EXPIRED
+    if isinstance(error, jwt.InvalidSignatureError):
+        return TOKEN_INVALID_SIGNATURE
+    return TOKEN_MALFORMED
 
 
 def jwt_decode(token: str) -> Dict[str, Any]:
-    return jwt.decode(
-        token,
-        settings.SECRET_KEY,  # type: ignore
-        algorithms=JWT_ALGORITHM,
-    )
+    with timed("jwt-verify"), jwt_decode_seconds.time():
+        payload = verified_token_cache.get(token)
+        if payload is None:
+            record_cache_lookups("verified_token", 0, 1)
+            try:
+                payload = jwt_codec.decode(token)
+            except jwt.PyJWTError as e:
+                auth_token_verdicts_total.inc((get_rejection_verdict(e),))
+                raise
+            verified_token_cache.set(token, payload)
+        else:
+            record_cache_lookups("verified_token", 1, 0)
+    return payload
 
 
 def create_token(payload: Dict[str, Any], exp_delta: timedelta) -> str:
@@ -63,61 +270,252 @@ def create_token(payload: Dict[str, Any], exp_delta: timedelta) -> str:
 
 
 def create_access_token(
-    user: User, additional_payload: Optional[Dict[str, Any]] = None
+    user: User,
+    additional_payload: Optional[Dict[str, Any]] = None,
+    jti: Optional[str] = None,
 ) -> str:
     if not additional_payload:
         additional_payload = {}
     additional_payload = {**additional_payload}
     payload = jwt_user_payload(
-        user, JWT_ACCESS_TYPE, settings.JWT_TTL_ACCESS, additional_payload
+        user, JWT_ACCESS_TYPE, settings.JWT_TTL_ACCESS, additional_payload, jti
     )
     return jwt_encode(payload)
 
 
 def create_refresh_token(
-    user: User, additional_payload: Optional[Dict[str, Any]] = None
+    user: User,
+    additional_payload: Optional[Dict[str, Any]] = None,
+    jti: Optional[str] = None,
 ) -> str:
     if not additional_payload:
         additional_payload = {}
     additional_payload = {**additional_payload}
+    if "fam" not in additional_payload:
+        # A new rotation family; refreshing keeps "fam" and increments "seq".
+        # It is separate from the jti, which only session tokens carry.
+        additional_payload.update({"fam": uuid.uuid4().hex, "seq": 0})
+        cache.set(
+            REFRESH_TOKEN_FAMILY_CACHE_KEY % (additional_payload["fam"],),
+            0,
+            settings.JWT_TTL_REFRESH.total_seconds(),
+        )
     payload = jwt_user_payload(
         user,
         JWT_REFRESH_TYPE,
         settings.JWT_TTL_REFRESH,
         additional_payload,
+        jti,
     )
     return jwt_encode(payload)
 
 
 def get_token_from_request(request: WSGIRequest) -> Optional[str]:
-    auth = request.META.get(JWT_AUTH_HEADER, "").split(maxsplit=1)
-    prefix = JWT_AUTH_HEADER_PREFIX
+    with timed("token-parse"):
+        auth = request.META.get(JWT_AUTH_HEADER, "").split(maxsplit=1)
+        prefix = JWT_AUTH_HEADER_PREFIX
 
-    if len(auth) != 2 or auth[0].upper() != prefix:
-        if request.method == "GET" and settings.ACCEPT_JWT_ON_URL_QUERY_PARAM:
-            return request.GET.get(prefix, None)
-        return None
-    return auth[1]
+        if len(auth) != 2 or auth[0].upper() != prefix:
+            if request.method == "GET" and settings.ACCEPT_JWT_ON_URL_QUERY_PARAM:
+                return request.GET.get(prefix, None)
+            return None
+        return auth[1]
 
 
-def get_user_from_payload(payload: Dict[str, Any]) -> Optional[User]:
-    # TODO: getting user from payload
-    return None
+def validate_token_generation(
+    payload: Dict[str, Any], generation: Optional[int]
+) -> None:
+    if generation is None or generation != payload.get("token_generation"):
+        auth_token_verdicts_total.inc((TOKEN_REVOKED,))
+        raise jwt.InvalidTokenError(_("%s không hợp lệ") % (_("Mã"),))
 
 
-def get_user_from_access_token(token: str) -> Optional[User]:
+def validate_session(payload: Dict[str, Any], session: Optional[CachedSession]) -> None:
+    if session is None or session.user_id != payload.get("user_id"):
+        auth_token_verdicts_total.inc((TOKEN_REVOKED,))
+        raise jwt.InvalidTokenError(_("%s không hợp lệ") % (_("Mã"),))
+    if session.is_expired:
+        auth_token_verdicts_total.inc((TOKEN_REVOKED,))
+        raise jwt.InvalidTokenError(_("%s không hợp lệ") % (_("Mã"),))
+
+
+def has_live_session(
+    payload: Dict[str, Any], sessions: Dict[str, CachedSession]
+) -> bool:
+    if not is_session_token(payload):
+        return True
+    try:
+        validate_session(payload, sessions.get(payload["jti"]))
+    except jwt.InvalidTokenError:
+        return False
+    return True
+
+
+def validate_active_user(user: Optional[User]) -> User:
+    if not user or not user.is_active:
+        raise jwt.InvalidTokenError(_("%s không hợp lệ") % (_("Mã"),))
+    return user
+
+
+def get_user_id_from_payload(payload: Dict[str, Any]) -> Any:
+    user_id = payload.get("user_id")
+    if user_id is None:
+        raise jwt.InvalidTokenError(_("%s không hợp lệ") % (_("Mã"),))
+    return user_id
+
+
+def get_user_from_payload(
+    payload: Dict[str, Any], use_profile_claims: bool = False
+) -> Optional[User]:
+    user_id = get_user_id_from_payload(payload)
+    with timed("revocation"):
+        validate_token_generation(
+            payload, get_token_generation(user_id, payload.get("token_generation"))
+        )
+        if is_session_token(payload):
+            validate_session(payload, get_session(payload["jti"]))
+    with timed("user-fetch"):
+        if use_profile_claims and has_profile_claims(payload):
+            return validate_active_user(get_user_from_profile_claims(payload))
+        return validate_active_user(get_user_snapshot(user_id))
+
+
+async def aget_user_from_payload(
+    payload: Dict[str, Any], use_profile_claims: bool = False
+) -> Optional[User]:
+    user_id = get_user_id_from_payload(payload)
+    with timed("revocation"):
+        validate_token_generation(
+            payload,
+            await aget_token_generation(user_id, payload.get("token_generation")),
+        )
+        if is_session_token(payload):
+            validate_session(payload, await aget_session(payload["jti"]))
+    with timed("user-fetch"):
+        if use_profile_claims and has_profile_claims(payload):
+            return validate_active_user(get_user_from_profile_claims(payload))
+        return validate_active_user(await aget_user_snapshot(user_id))
+
+
+def get_access_token_payload(token: str) -> Dict[str, Any]:
     payload = jwt_decode(token)
     jwt_type = payload.get("type")
     if jwt_type not in [JWT_ACCESS_TYPE, JWT_THIRDPARTY_ACCESS_TYPE]:
+        auth_token_verdicts_total.inc((TOKEN_WRONG_TYPE,))
         raise jwt.InvalidTokenError(_("%s không hợp lệ") % (_("Mã"),))
+    return payload
+
+
+def get_user_from_access_token(token: str) -> Optional[User]:
+    payload = get_access_token_payload(token)
     user = get_user_from_payload(payload)
     return user
 
 
-def get_user_from_refresh_token(token: str) -> Optional[User]:
+async def aget_user_from_access_token(token: str) -> Optional[User]:
+    payload = get_access_token_payload(token)
+    user = await aget_user_from_payload(payload)
+    return user
+
+
+def verify_access_tokens(tokens: Iterable[str]) -> List[Dict[str, Any]]:
+    """
+    Return a ``{"verdict", "user_id"}`` result per token, in order.
+
+    Revocation and the active flag are resolved for all distinct users with
+    one cache multi-get each, instead of a lookup per token.
+    """
+    results = []
+    payloads = {}
+    for index, token in enumerate(tokens):
+        result = {"verdict": TOKEN_MALFORMED, "user_id": None}
+        try:
+            payload = get_access_token_payload(token)
+            result["user_id"] = get_user_id_from_payload(payload)
+        except jwt.ExpiredSignatureError:
+            result["verdict"] = TOKEN_EXPIRED
+        except jwt.PyJWTError:
+            pass
+        else:
+            payloads[index] = payload
+        results.append(result)
+
+    newest = {}
+    for payload in payloads.values():
+        generation = payload.get("token_generation")
+        if isinstance(generation, int):
+            newest[payload["user_id"]] = max(
+                generation, newest.get(payload["user_id"], generation)
+            )
+    generations = get_token_generations(
+        {payload["user_id"] for payload in payloads.values()}, newest
+    )
+    current = {
+        index: payload
+        for index, payload in payloads.items()
+        if generations.get(payload["user_id"]) == payload.get("token_generation")
+    }
+    users = get_user_snapshots({payload["user_id"] for payload in current.values()})
+    sessions = get_sessions(
+        {payload["jti"] for payload in current.values() if is_session_token(payload)}
+    )
+    for index, payload in payloads.items():
+        user = users.get(payload["user_id"])
+        if (
+            index in current
+            and user
+            and user.is_active
+            and has_live_session(payload, sessions)
+        ):
+            results[index]["verdict"] = TOKEN_VALID
+        else:
+            results[index]["verdict"] = TOKEN_REVOKED
+            if index not in current or not user or not user.is_active:
+                # A dead session was already counted by validate_session.
+                auth_token_verdicts_total.inc((TOKEN_REVOKED,))
+    return results
+
+
+def get_refresh_token_payload(token: str) -> Dict[str, Any]:
     payload = jwt_decode(token)
     jwt_type = payload.get("type")
     if jwt_type != JWT_REFRESH_TYPE:
+        auth_token_verdicts_total.inc((TOKEN_WRONG_TYPE,))
         raise jwt.InvalidTokenError(_("%s không hợp lệ") % (_("Mã"),))
+    return payload
+
+
+def get_user_from_refresh_token(token: str) -> Optional[User]:
+    payload = get_refresh_token_payload(token)
     user = get_user_from_payload(payload)
     return user
+
+
+def rotate_refresh_token(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Consume a refresh token and return the claims of its successor.
+
+    Only the latest token of a family can be used. Presenting an older one
+    means the family leaked, so it is dropped and RefreshTokenReuseError is
+    raised for the caller to revoke the user's tokens.
+    """
+    family = payload.get("fam")
+    seq = payload.get("seq")
+    if not family or not isinstance(seq, int):
+        raise jwt.InvalidTokenError(_("%s không hợp lệ") % (_("Mã"),))
+    key = REFRESH_TOKEN_FAMILY_CACHE_KEY % (family,)
+    ttl = settings.JWT_TTL_REFRESH.total_seconds()
+    current = cache.get(key)
+    if current is None:
+        # Expired, evicted or dropped after a reuse: the token can't be
+        # checked against its successors, so it is refused.
+        raise jwt.InvalidTokenError(_("%s không hợp lệ") % (_("Mã"),))
+    # ``add`` lets a single caller consume each token, even when the same
+    # token is presented concurrently.
+    if current != seq or not cache.add(
+        REFRESH_TOKEN_USED_CACHE_KEY % (family, seq), 1, ttl
+    ):
+        cache.delete(key)
+        raise RefreshTokenReuseError(_("%s không hợp lệ") % (_("Mã"),))
+    cache.set(key, seq + 1, ttl)
+    return {"fam": family, "seq": seq + 1}
@@ -0,0 +1,123 @@
+import binascii
+import hashlib
+import hmac
+import json
+from calendar import timegm
+from datetime import datetime
+from typing import Any, Dict
+
+import jwt
+from jwt.utils import base64url_decode, base64url_encode
+
+TIME_CLAIMS = ("exp", "iat", "nbf")
+
+
+class PyJWTCodec:
+    """Generic codec delegating every call to PyJWT."""
+
+    algorithm = "HS256"
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+
+    def encode(self, payload: Dict[str, Any]) -> str:
+        tk = jwt.encode(payload, self.key, self.algorithm)  # type: ignore
+        return tk.decode("utf-8") if not isinstance(tk, str) else tk
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        return jwt.decode(
+            token,
+            self.key,  # type: ignore
+            algorithms=self.algorithm,
+        )
+
+
+class HS256Codec:
+    """
+    HS256-only codec with the header segment and keyed HMAC state prepared
+    once.
+
+    Tokens are byte-for-byte identical to PyJWT's and either side can decode
+    the other's output. Only the claims the auth path relies on are checked:
+    ``exp`` and ``iat``; ``type`` is checked by the callers.
+    """
+
+    algorithm = "HS256"
+
+    def __init__(self, key: str) -> None:
+        self._mac = hmac.new(key.encode("utf-8"), digestmod=hashlib.sha256)
+        self._header = base64url_encode(
+            json.dumps(
+                {"typ": "JWT", "alg": self.algorithm}, separators=(",", ":")
+            ).encode("utf-8")
+        )
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def encode(self, payload: Dict[str, Any]) -> str:
+        payload = {**payload}
+        for claim in TIME_CLAIMS:
+            if isinstance(payload.get(claim), datetime):
+                payload[claim] = timegm(payload[claim].utctimetuple())
+        signing_input = (
+            self._header
+            + b"."
+            + base64url_encode(
+                json.dumps(payload, separators=(",", ":")).encode("utf-8")
+            )
+        )
+        return (
+            signing_input + b"." + base64url_encode(self._sign(signing_input))
+        ).decode("utf-8")
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        try:
+            signing_input, __, crypto_segment = token.encode("utf-8").rpartition(b".")
+            header_segment, __, payload_segment = signing_input.partition(b".")
+            signature = base64url_decode(crypto_segment)
+        except (AttributeError, UnicodeError, binascii.Error):
+            raise jwt.DecodeError("Invalid crypto padding")
+        if not header_segment or not payload_segment:
+            raise jwt.DecodeError("Not enough segments")
+        if header_segment != self._header:
+            self._validate_header(header_segment)
+
+        if not hmac.compare_digest(signature, self._sign(signing_input)):
+            raise jwt.InvalidSignatureError("Signature verification failed")
+
+        try:
+            payload = json.loads(base64url_decode(payload_segment))
+        except (ValueError, binascii.Error):
+            raise jwt.DecodeError("Invalid payload padding")
+        if not isinstance(payload, dict):
+            raise jwt.DecodeError("Invalid payload string: must be a json object")
+        self._validate_claims(payload)
+        return payload
+
+    def _validate_header(self, header_segment: bytes) -> None:
+        try:
+            header = json.loads(base64url_decode(header_segment))
+        except (ValueError, binascii.Error):
+            raise jwt.DecodeError("Invalid header padding")
+        if not isinstance(header, dict) or header.get("alg") != self.algorithm:
+            raise jwt.InvalidAlgorithmError("The specified alg value is not allowed")
+
+    def _validate_claims(self, payload: Dict[str, Any]) -> None:
+        now = timegm(datetime.utcnow().utctimetuple())
+        if "iat" in payload:
+            try:
+                int(payload["iat"])
+            except (TypeError, ValueError):
+                raise jwt.InvalidIssuedAtError(
+                    "Issued At claim (iat) must be an integer."
+                )
+        if "exp" in payload:
+            try:
+                exp = int(payload["exp"])
+            except (TypeError, ValueError):
+                raise jwt.DecodeError("Expiration Time claim (exp) must be an integer.")
+            if exp < now:
+                raise jwt.ExpiredSignatureError("Signature has expired")
@@ -0,0 +1,51 @@
+import time
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import DatabaseError, close_old_connections
+
+from src.core.revocation_snapshot import SnapshotWriter, sync_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Keep this host's revocation snapshot in sync with the database. Run "
+        "one per host, next to the web workers."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--path",
+            default=settings.REVOCATION_SNAPSHOT_PATH,
+            help="default: REVOCATION_SNAPSHOT_PATH",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="build the snapshot and exit"
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if not options["path"]:
+            raise CommandError("REVOCATION_SNAPSHOT_PATH is not set.")
+        writer = SnapshotWriter(options["path"])
+        synced_at = sync_snapshot(writer)
+        self.stdout.write(f"Built {writer.path} ({writer.table.count} users).")
+        if options["once"]:
+            return
+
+        interval = settings.REVOCATION_SNAPSHOT_INTERVAL.total_seconds()
+        rebuild_interval = settings.REVOCATION_SNAPSHOT_REBUILD_INTERVAL
+        rebuilt_at = synced_at
+        while True:
+            time.sleep(interval)
+            close_old_connections()
+            try:
+                # Rebuilds drop deleted users and resize the table as it fills.
+                if synced_at - rebuilt_at >= rebuild_interval:
+                    synced_at = rebuilt_at = sync_snapshot(writer)
+                else:
+                    synced_at = sync_snapshot(writer, synced_at)
+            except DatabaseError as e:
+                # Workers stop trusting the file once it is too old, so a
+                # failed sync only costs them the cache round trip.
+                self.stderr.write(f"Sync failed: {e}")
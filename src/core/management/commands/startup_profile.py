@@ -0,0 +1,119 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+# Runs in a fresh interpreter: import the application and load the URLconf,
+# which is everything a worker does before serving its first request.
+BOOT_SCRIPT = """
+import importlib, json, sys, time
+started = time.perf_counter()
+importlib.import_module(sys.argv[1]).application
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({"seconds": time.perf_counter() - started}))
+"""
+
+IMPORT_TIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+class Command(BaseCommand):
+    help = (
+        "Boot the application in a fresh interpreter, report the slowest "
+        "imports and fail when the cold start exceeds STARTUP_TIME_BUDGET."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--target",
+            default="src.wsgi",
+            help="module exposing ``application`` (default: src.wsgi)",
+        )
+        parser.add_argument(
+            "--budget",
+            type=float,
+            help="budget in milliseconds, overriding STARTUP_TIME_BUDGET",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="boot this many times and keep the fastest (default: 3)",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=20,
+            help="number of modules to list (default: 20)",
+        )
+        parser.add_argument(
+            "--sort", choices=("cumulative", "self"), default="cumulative"
+        )
+
+    def boot(self, target: str) -> Dict[str, Any]:
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE}
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", BOOT_SCRIPT, target],
+            cwd=settings.PROJECT_ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode:
+            raise CommandError(
+                "Booting %s failed:\n%s" % (target, process.stderr[-2000:])
+            )
+
+        modules: List[Dict[str, Any]] = []
+        for line in process.stderr.splitlines():
+            match = IMPORT_TIME_RE.match(line)
+            if match:
+                own, cumulative, indent, name = match.groups()
+                modules.append(
+                    {
+                        "name": name,
+                        "self_ms": int(own) / 1000,
+                        "cumulative_ms": int(cumulative) / 1000,
+                        "top_level": len(indent) == 0,
+                    }
+                )
+        boot_ms = json.loads(process.stdout.splitlines()[-1])["seconds"] * 1000
+        return {"boot_ms": boot_ms, "modules": modules}
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        budget_ms = options["budget"]
+        if budget_ms is None:
+            budget_ms = settings.STARTUP_TIME_BUDGET.total_seconds() * 1000
+
+        profile = min(
+            (self.boot(options["target"]) for __ in range(max(options["repeat"], 1))),
+            key=lambda profile: profile["boot_ms"],
+        )
+        modules = profile["modules"]
+        import_ms = sum(module["self_ms"] for module in modules)
+
+        key = "cumulative_ms" if options["sort"] == "cumulative" else "self_ms"
+        self.stdout.write(f"{'cumulative ms':>13} {'self ms':>9}  module")
+        for module in sorted(modules, key=lambda module: -module[key])[
+            : options["limit"]
+        ]:
+            self.stdout.write(
+                f"{module['cumulative_ms']:>13.1f} {module['self_ms']:>9.1f}  "
+                f"{module['name']}"
+            )
+        self.stdout.write(
+            f"\n{len(modules)} modules imported in {import_ms:.1f} ms; "
+            f"{options['target']} ready in {profile['boot_ms']:.1f} ms "
+            f"(budget {budget_ms:.0f} ms)"
+        )
+
+        if profile["boot_ms"] > budget_ms:
+            raise CommandError(
+                "Cold start took %.1f ms, over the %.0f ms budget."
+                % (profile["boot_ms"], budget_ms)
+            )
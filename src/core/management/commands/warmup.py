@@ -0,0 +1,33 @@
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+
+from src.core.warmup import warmup
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the worker warmup steps: load the URLconf, serializers and JWT "
+        "codec, open database connections and fill the auth caches."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--connections",
+            type=int,
+            default=settings.WARMUP_DB_CONNECTIONS,
+            help="database connections to open per database",
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=settings.WARMUP_PRELOAD_USERS,
+            help="recently logged in users to load into the auth caches",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        timings = warmup(options["connections"], options["users"])
+        for step, duration in timings.items():
+            self.stdout.write(f"{step:<16} {duration:>9.1f} ms")
+        self.stdout.write(f"{'total':<16} {sum(timings.values()):>9.1f} ms")
@@ -0,0 +1,361 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Every thread records into its own shard, so counting a sample takes no
+lock; shards are only merged when the metrics are collected. With
+METRICS_MULTIPROCESS_DIR set, each process also writes its totals to a file
+in that directory every METRICS_FLUSH_INTERVAL and at exit, and ``/metrics``
+served by any worker adds up the files of all of them. Clear the directory
+whenever the server is restarted.
+"""
+
+import atexit
+import bisect
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+SeriesKey = Tuple[str, LabelValues]
+# A counter's value, or a histogram's bucket counts followed by sum and count.
+Value = Any
+Totals = Dict[SeriesKey, Value]
+
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+FAST_LATENCY_BUCKETS = (
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+)
+
+
+def merge(totals: Totals, values: Totals) -> None:
+    for key, value in values.items():
+        if isinstance(value, list):
+            current = totals.get(key)
+            if current is None:
+                totals[key] = list(value)
+            else:
+                for index, count in enumerate(value):
+                    current[index] += count
+        else:
+            totals[key] = totals.get(key, 0.0) + value
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self.metrics: Dict[str, "Metric"] = {}
+        self._reset()
+
+    def _reset(self) -> None:
+        self.process_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, Totals]] = []
+        self._retired: Totals = {}
+        self._lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def register(self, metric: "Metric") -> None:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered.")
+        self.metrics[metric.name] = metric
+
+    def shard(self) -> Totals:
+        """The calling thread's shard, which only that thread writes to."""
+        try:
+            return self._local.shard
+        except AttributeError:
+            return self._add_shard()
+
+    def _add_shard(self) -> Totals:
+        shard = self._local.shard = {}
+        with self._lock:
+            self._shards.append((threading.current_thread(), shard))
+        self._ensure_flusher()
+        return shard
+
+    def collect(self) -> Totals:
+        """Totals of this process."""
+        totals: Totals = {}
+        with self._lock:
+            shards = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    shards.append((thread, shard))
+                else:
+                    merge(self._retired, shard.copy())
+            self._shards = shards
+            merge(totals, self._retired)
+            for __, shard in shards:
+                merge(totals, shard.copy())
+        return totals
+
+    def dump(self, directory: str) -> None:
+        path = os.path.join(directory, f"{self.process_id}.json")
+        temporary = path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(
+                [
+                    [name, list(labels), value]
+                    for (name, labels), value in self.collect().items()
+                ],
+                f,
+            )
+        os.replace(temporary, path)
+
+    def collect_all(self, directory: str) -> Totals:
+        """Totals of every process writing to ``directory``."""
+        self.dump(directory)
+        totals: Totals = {}
+        for entry in os.scandir(directory):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                with open(entry.path) as f:
+                    rows = json.load(f)
+            except (OSError, ValueError):
+                continue
+            merge(
+                totals, {(name, tuple(labels)): value for name, labels, value in rows}
+            )
+        return totals
+
+    def flush(self) -> None:
+        directory = settings.METRICS_MULTIPROCESS_DIR
+        if not directory:
+            return
+        try:
+            self.dump(directory)
+        except OSError:
+            logger.warning("Failed to write metrics to %s", directory, exc_info=True)
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None or not settings.METRICS_MULTIPROCESS_DIR:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._run, name="metrics-flush", daemon=True
+                )
+                self._flusher.start()
+
+    def _run(self) -> None:
+        interval = settings.METRICS_FLUSH_INTERVAL.total_seconds()
+        while not self._stopped.wait(interval):
+            self.flush()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.flush()
+
+    def expose(self, totals: Totals) -> str:
+        series: Dict[str, List[Tuple[LabelValues, Value]]] = defaultdict(list)
+        for (name, labels), value in sorted(totals.items()):
+            series[name].append((labels, value))
+        lines: List[str] = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            lines.extend(metric.expose(series))
+        return "\n".join(lines) + "\n"
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(
+    names: Sequence[str], values: Iterable[str], extra: Sequence[Tuple[str, str]] = ()
+) -> str:
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: Optional[MetricsRegistry] = None,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry or metrics_registry
+        self.registry.register(self)
+
+    def expose(self, series: Dict[str, List[Tuple[LabelValues, Value]]]) -> List[str]:
+        return [
+            f"{self.name}{format_labels(self.labelnames, labels)} {value!r}"
+            for labels, value in series.get(self.name, ())
+        ]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, labels: LabelValues = (), amount: float = 1.0) -> None:
+        shard = self.registry.shard()
+        key = (self.name, labels)
+        shard[key] = shard.get(key, 0.0) + amount
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        registry: Optional[MetricsRegistry] = None,
+    ) -> None:
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, labels: LabelValues = ()) -> None:
+        shard = self.registry.shard()
+        key = (self.name, labels)
+        series = shard.get(key)
+        if series is None:
+            # One slot per bucket and +Inf, then the sum and the count.
+            series = shard[key] = [0.0] * (len(self.buckets) + 3)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    @contextmanager
+    def time(self, labels: LabelValues = ()) -> Iterator[None]:
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - started, labels)
+
+    def expose(self, series: Dict[str, List[Tuple[LabelValues, Value]]]) -> List[str]:
+        lines = []
+        bounds = [repr(bound) for bound in self.buckets] + ["+Inf"]
+        for labels, value in series.get(self.name, ()):
+            cumulative = 0.0
+            for bound, count in zip(bounds, value):
+                cumulative += count
+                bucket_labels = format_labels(self.labelnames, labels, [("le", bound)])
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative!r}")
+            formatted = format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{formatted} {value[-2]!r}")
+            lines.append(f"{self.name}_count{formatted} {value[-1]!r}")
+        return lines
+
+
+class HitRatio(Metric):
+    """Gauge of hits / (hits + misses) computed from a counter at exposition."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, counter: Counter) -> None:
+        super().__init__(name, documentation, counter.labelnames[:-1], counter.registry)
+        self.counter = counter
+
+    def expose(self, series: Dict[str, List[Tuple[LabelValues, Value]]]) -> List[str]:
+        lookups: Dict[LabelValues, Dict[str, float]] = defaultdict(dict)
+        for labels, value in series.get(self.counter.name, ()):
+            lookups[labels[:-1]][labels[-1]] = value
+        lines = []
+        for labels, results in sorted(lookups.items()):
+            hits = results.get("hit", 0.0)
+            total = hits + results.get("miss", 0.0)
+            ratio = hits / total if total else 0.0
+            lines.append(
+                f"{self.name}{format_labels(self.labelnames, labels)} {ratio!r}"
+            )
+        return lines
+
+
+metrics_registry = MetricsRegistry()
+os.register_at_fork(after_in_child=metrics_registry._reset)
+atexit.register(metrics_registry.stop)
+
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds",
+    "Latency of routed requests by URL name.",
+    ("view", "method", "status"),
+)
+jwt_decode_seconds = Histogram(
+    "jwt_decode_seconds",
+    "Latency of jwt_decode, verified-token cache hits included.",
+    buckets=FAST_LATENCY_BUCKETS,
+)
+auth_backend_seconds = Histogram(
+    "auth_backend_seconds",
+    "Latency of authentication backends that had credentials to check.",
+    ("backend",),
+)
+auth_token_verdicts_total = Counter(
+    "auth_token_verdicts_total",
+    "Rejected tokens by reason.",
+    ("verdict",),
+)
+auth_cache_requests_total = Counter(
+    "auth_cache_requests_total",
+    "Lookups of the authentication caches by result.",
+    ("cache", "result"),
+)
+auth_cache_hit_ratio = HitRatio(
+    "auth_cache_hit_ratio",
+    "Share of authentication cache lookups that were hits.",
+    auth_cache_requests_total,
+)
+
+
+def record_cache_lookups(cache: str, hits: int, misses: int) -> None:
+    if hits:
+        auth_cache_requests_total.inc((cache, "hit"), hits)
+    if misses:
+        auth_cache_requests_total.inc((cache, "miss"), misses)
+
+
+def collect_metrics() -> str:
+    directory = settings.METRICS_MULTIPROCESS_DIR
+    if directory:
+        totals = metrics_registry.collect_all(directory)
+    else:
+        totals = metrics_registry.collect()
+    return metrics_registry.expose(totals)
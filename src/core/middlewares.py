@@ -1,13 +1,61 @@
+import inspect
+import logging
+import random
+from functools import partial
+from time import perf_counter
 from typing import Any
 
-from django.contrib.auth import authenticate, get_user_model
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import (
+    _clean_credentials,
+    _get_backends,
+    authenticate,
+    get_user_model,
+)
 from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.signals import user_login_failed
+from django.core.exceptions import PermissionDenied
+from django.urls import Resolver404, resolve
 from django.utils.deprecation import MiddlewareMixin
 from django.utils.functional import SimpleLazyObject
 
+from src.core.metrics import http_request_duration_seconds
+from src.core.timing import format_server_timing, start_timing, stop_timing
 
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
+
+async def aauthenticate(request: Any, **credentials: Any) -> Any:
+    """
+    Same contract as django.contrib.auth.authenticate, awaiting the backends
+    that provide ``aauthenticate``.
+    """
+    for backend, backend_path in _get_backends(return_tuples=True):
+        method = getattr(backend, "aauthenticate", backend.authenticate)
+        try:
+            inspect.signature(method).bind(request, **credentials)
+        except TypeError:
+            # This backend doesn't accept these credentials as arguments.
+            continue
+        if not inspect.iscoroutinefunction(method):
+            method = sync_to_async(method)
+        try:
+            user = await method(request, **credentials)
+        except PermissionDenied:
+            break
+        if user is None:
+            continue
+        user.backend = backend_path
+        return user
+
+    await sync_to_async(user_login_failed.send)(
+        sender=__name__, credentials=_clean_credentials(credentials), request=request
+    )
+    return None
+
 
 def get_user(request: Any) -> Any:
     if not hasattr(request, "_cached_user"):
@@ -15,6 +63,12 @@ def get_user(request: Any) -> Any:
     return request._cached_user
 
 
+async def aget_user(request: Any) -> Any:
+    if not hasattr(request, "_cached_user"):
+        request._cached_user = await aauthenticate(request)
+    return request._cached_user or AnonymousUser()
+
+
 class AuthenticationMiddleware(MiddlewareMixin):
     def process_request(self, request: Any) -> None:
         def user():
@@ -22,3 +76,87 @@ class AuthenticationMiddleware(MiddlewareMixin):
             return get_user(request) or anonymous_user
 
         request.user = SimpleLazyObject(func=lambda: user())
+        request.auser = partial(aget_user, request)
+
+    async def __acall__(self, request: Any) -> Any:
+        # Views run synchronously and would resolve request.user through
+        # authenticate() in their thread, so the user is awaited here and
+        # the lazy object only returns the cached result. The URL is resolved
+        # first for the backends to see the view, as they do under WSGI.
+        self.process_request(request)
+        try:
+            request.resolver_match = resolve(
+                request.path_info, getattr(request, "urlconf", None)
+            )
+        except Resolver404:
+            pass
+        await request.auser()
+        return await self.get_response(request)
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """
+    Observe the latency of every request, labelled by URL name so that the
+    number of series stays bounded. Unrouted requests share one label.
+    """
+
+    def process_request(self, request: Any) -> None:
+        request._metrics_started = perf_counter()
+
+    def process_response(self, request: Any, response: Any) -> Any:
+        started = getattr(request, "_metrics_started", None)
+        if started is None:
+            return response
+        match = getattr(request, "resolver_match", None)
+        view = match.url_name if match and match.url_name else "unmatched"
+        http_request_duration_seconds.observe(
+            perf_counter() - started,
+            (view, request.method, str(response.status_code)),
+        )
+        return response
+
+    async def __acall__(self, request: Any) -> Any:
+        self.process_request(request)
+        response = await self.get_response(request)
+        return self.process_response(request, response)
+
+
+class ServerTimingMiddleware(MiddlewareMixin):
+    """
+    Report per-phase durations of a sampled share of requests in a
+    ``Server-Timing`` header and a log record.
+    """
+
+    def process_request(self, request: Any) -> None:
+        sample_rate = settings.SERVER_TIMING_SAMPLE_RATE
+        if sample_rate > 0 and random.random() < sample_rate:
+            request._server_timing = (start_timing(), perf_counter())
+
+    def process_response(self, request: Any, response: Any) -> Any:
+        state = getattr(request, "_server_timing", None)
+        if state is None:
+            return response
+        del request._server_timing
+
+        token, started = state
+        timings = stop_timing(token)
+        timings["total"] = (perf_counter() - started) * 1000
+        response["Server-Timing"] = format_server_timing(timings)
+        logger.info(
+            "%s %s timings: %s",
+            request.method,
+            request.path,
+            response["Server-Timing"],
+            extra={
+                "method": request.method,
+                "path": request.path,
+                "status_code": response.status_code,
+                "server_timing": timings,
+            },
+        )
+        return response
+
+    async def __acall__(self, request: Any) -> Any:
+        self.process_request(request)
+        response = await self.get_response(request)
+        return self.process_response(request, response)
@@ -1,11 +1,21 @@
+from collections import OrderedDict
+from functools import lru_cache
 from typing import (
     Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
 )
 
 from rest_framework import serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
 from django.conf import settings
 from django.utils.functional import classproperty
 
+from src.core.timing import timed
+
 
 class GetRequestSerializerMixin:
     def get_request(self):
@@ -25,8 +35,95 @@ class GetViewSerializerMixin:
         return self.get_view()
 
 
+class ServerTimingSerializerMixin:
+    def to_representation(self, instance: Any):
+        with timed("serialize"):
+            return super().to_representation(instance)
+
+
+def is_context_free(field: serializers.Field) -> bool:
+    """
+    Whether ``field`` renders the same under any serializer context. File
+    fields build absolute URLs from ``context["request"]``, and field classes
+    outside ``rest_framework.fields`` may read ``self.context`` or
+    ``self.parent``.
+    """
+    if isinstance(field, serializers.FileField):
+        return False
+    if type(field).__module__ != serializers.Field.__module__:
+        return False
+    child = getattr(field, "child", None)
+    return child is None or is_context_free(child)
+
+
+class RepresentationPlan:
+    """
+    The readable fields of a serializer class, built and bound once.
+
+    ``Serializer.fields`` deep-copies every declared field per instance, and
+    ``ModelSerializer`` also redoes its model introspection. A plan does that
+    once per class and then only reads attributes off the instance. Fields
+    are bound without a context, so classes with a custom
+    ``to_representation`` or with a field whose output may depend on the
+    serializer it is bound to are not compiled and keep going through DRF.
+    Only DRF's own plain fields are trusted not to: nested, relational and
+    file fields, and any field class defined elsewhere, are not.
+    """
+
+    def __init__(self, serializer_class: type) -> None:
+        self.steps: List[Tuple[str, Optional[serializers.Field], Optional[str]]] = []
+        # Only SerializerMethodField steps read the serializer instance.
+        self.uses_serializer = False
+        self.compiled = (
+            serializer_class.to_representation
+            is serializers.Serializer.to_representation
+        )
+        if not self.compiled:
+            return
+        for field in serializer_class(context={})._readable_fields:
+            if isinstance(field, serializers.SerializerMethodField):
+                self.steps.append((field.field_name, None, field.method_name))
+                self.uses_serializer = True
+            elif is_context_free(field):
+                self.steps.append((field.field_name, field, None))
+            else:
+                self.compiled = False
+                self.steps = []
+                return
+
+    def to_representation(
+        self, serializer: Optional[serializers.Serializer], instance: Any
+    ) -> Dict[str, Any]:
+        # Same as Serializer.to_representation over the precompiled fields.
+        ret = OrderedDict()
+        for field_name, field, method_name in self.steps:
+            if method_name is not None:
+                ret[field_name] = getattr(serializer, method_name)(instance)
+                continue
+            try:
+                attribute = field.get_attribute(instance)
+            except SkipField:
+                continue
+            check_for_none = (
+                attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+            )
+            if check_for_none is None:
+                ret[field_name] = None
+            else:
+                ret[field_name] = field.to_representation(attribute)
+        return ret
+
+
+@lru_cache(maxsize=None)
+def get_representation_plan(serializer_class: type) -> RepresentationPlan:
+    return RepresentationPlan(serializer_class)
+
+
 class ViewProxySerializerMixin(GetRequestSerializerMixin):
     _view_serializer_instance = None
+    _view_serializer_args: Tuple[Any, ...] = ()
+    _view_serializer_kwargs: Dict[str, Any] = {}
+    _view_serializer_binding: Optional[Tuple[str, serializers.Serializer]] = None
     _as_action: bool = False
 
     view_serializer = None
@@ -37,7 +134,9 @@ class ViewProxySerializerMixin(GetRequestSerializerMixin):
 
         super().__init__(*args, **kwargs)
         if self.is_proxy:
-            self._view_serializer_instance = self.view_serializer(*args, **kwargs)
+            # Built on first use: most requests only need its field plan.
+            self._view_serializer_args = args
+            self._view_serializer_kwargs = kwargs
         elif settings.FORCE_PROXY_SERIALIZER:
             raise
 
@@ -45,6 +144,17 @@ class ViewProxySerializerMixin(GetRequestSerializerMixin):
     def is_proxy(cls) -> bool:
         return cls.view_serializer is not None
 
+    @property
+    def view_serializer_instance(self) -> Optional[serializers.Serializer]:
+        if self._view_serializer_instance is None and self.is_proxy:
+            instance = self.view_serializer(
+                *self._view_serializer_args, **self._view_serializer_kwargs
+            )
+            if self._view_serializer_binding is not None:
+                instance.bind(*self._view_serializer_binding)
+            self._view_serializer_instance = instance
+        return self._view_serializer_instance
+
     @classmethod
     def many_init(cls, *args, **kwargs):  # noqa: ANN001,ANN002
         if cls.many_through_view_serializer and cls.is_proxy:
@@ -54,11 +164,13 @@ class ViewProxySerializerMixin(GetRequestSerializerMixin):
     def bind(self, field_name: str, parent: serializers.Serializer) -> None:
         result = super().bind(field_name, parent)
         if self.is_proxy:
-            self._view_serializer_instance.bind(
+            self._view_serializer_binding = (
                 field_name,
-                parent
-                if not getattr(parent, "is_proxy", False)
-                else parent._view_serializer_instance,
+                (
+                    parent
+                    if not getattr(parent, "is_proxy", False)
+                    else parent.view_serializer_instance
+                ),
             )
         return result
 
@@ -68,5 +180,14 @@ class ViewProxySerializerMixin(GetRequestSerializerMixin):
             return super().to_representation(instance)
 
         if not self._as_action and self.is_proxy and instance:
-            return self._view_serializer_instance.to_representation(instance)
+            with timed("serialize"):
+                plan = get_representation_plan(self.view_serializer)
+                if plan.compiled and not plan.uses_serializer:
+                    return plan.to_representation(None, instance)
+                # Built once per proxy: its method fields read this request's
+                # context, so it can't be shared between proxies.
+                view_serializer = self.view_serializer_instance
+                if plan.compiled:
+                    return plan.to_representation(view_serializer, instance)
+                return view_serializer.to_representation(instance)
         return super().to_representation(instance)
@@ -0,0 +1,36 @@
+from typing import Any, Optional
+
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils import json
+
+from src.core.renderers import JSONRenderer, orjson, use_orjson
+
+
+class JSONParser(parsers.JSONParser):
+    """
+    Drop-in for DRF's JSONParser that reads the body in one go and decodes
+    it with orjson when JSON_BACKEND is "orjson", or with ``json.loads``.
+    """
+
+    renderer_class = JSONRenderer
+
+    def parse(
+        self,
+        stream: Any,
+        media_type: Optional[str] = None,
+        parser_context: Optional[dict] = None,
+    ) -> Any:
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        body = stream.read()
+
+        try:
+            # orjson rejects NaN and Infinity, as strict mode requires.
+            if use_orjson() and self.strict and encoding.lower() in ("utf-8", "utf8"):
+                return orjson.loads(body)
+            parse_constant = json.strict_constant if self.strict else None
+            return json.loads(body.decode(encoding), parse_constant=parse_constant)
+        except ValueError as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
@@ -0,0 +1,26 @@
+from typing import Any
+
+from rest_framework.permissions import BasePermission
+
+
+class APIKeyScopePermission(BasePermission):
+    """
+    Require the view's ``required_scopes`` on requests authenticated with an
+    API key. Views without ``required_scopes`` are closed to API keys.
+    Requests authenticated any other way are not restricted.
+
+    Part of DEFAULT_PERMISSION_CLASSES: views that set ``permission_classes``
+    must keep it, e.g. through ``api_settings.DEFAULT_PERMISSION_CLASSES``.
+    """
+
+    def has_permission(self, request: Any, view: Any) -> bool:
+        # request.user is lazy, and resolving it is what sets request.api_key.
+        if not request.user.is_authenticated:
+            return True
+        api_key = getattr(request, "api_key", None)
+        if api_key is None:
+            return True
+        required_scopes = getattr(view, "required_scopes", ())
+        if not required_scopes:
+            return False
+        return set(required_scopes).issubset(api_key.scopes)
@@ -0,0 +1,70 @@
+from typing import Any, Optional
+
+from django.conf import settings
+from rest_framework import renderers
+from rest_framework.compat import SHORT_SEPARATORS, LONG_SEPARATORS
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def use_orjson() -> bool:
+    return orjson is not None and settings.JSON_BACKEND == "orjson"
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """
+    Drop-in for DRF's JSONRenderer that encodes with orjson when
+    JSON_BACKEND is "orjson" and it is installed, and otherwise reuses a
+    single stdlib encoder instead of building one per response.
+
+    Types orjson does not know, and datetimes, whose format must match
+    DRF's, are handed to DRF's encoder. Indented output (browsable API,
+    ``; indent=`` media types) always goes through DRF.
+    """
+
+    orjson_options = (
+        orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+    )
+
+    @classmethod
+    def get_encoder(cls) -> Any:
+        # Renderers are instantiated per request; the encoder is stateless.
+        encoder = cls.__dict__.get("_encoder")
+        if encoder is None:
+            encoder = cls._encoder = cls.encoder_class(
+                ensure_ascii=cls.ensure_ascii,
+                allow_nan=not cls.strict,
+                separators=SHORT_SEPARATORS if cls.compact else LONG_SEPARATORS,
+            )
+        return encoder
+
+    def render(
+        self,
+        data: Any,
+        accepted_media_type: Optional[str] = None,
+        renderer_context: Optional[dict] = None,
+    ) -> bytes:
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        encoder = self.get_encoder()
+        if use_orjson() and self.compact and not self.ensure_ascii:
+            try:
+                ret = orjson.dumps(
+                    data, default=encoder.default, option=self.orjson_options
+                )
+            except orjson.JSONEncodeError:
+                # e.g. integers beyond 64 bits, which the stdlib handles.
+                pass
+            else:
+                return ret.replace("\u2028".encode(), b"\\u2028").replace(
+                    "\u2029".encode(), b"\\u2029"
+                )
+
+        ret = encoder.encode(data)
+        return ret.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029").encode()
@@ -0,0 +1,332 @@
+"""
+Token generations shared by the workers of a host through a memory-mapped
+file, so a revocation check is a read of local memory instead of a cache
+round trip.
+
+The file is an open addressing hash table of ``user id -> minimum valid
+token generation``. Every worker maps the same file, so the table is held
+once in the page cache however many workers read it. ``manage.py
+revocation_snapshot`` keeps it in sync with the database, and a bump made
+on this host is written into it at once. Revocations made on other hosts
+show up with the next sync, i.e. within REVOCATION_SNAPSHOT_INTERVAL.
+
+Writers serialize on a lock file and bump a sequence number around every
+change (a seqlock), so readers never lock: they retry or fall back to the
+cache when a read overlaps a write. Readers also fall back when the file
+is missing, or when it is older than REVOCATION_SNAPSHOT_MAX_AGE because
+its writer stopped.
+"""
+
+import fcntl
+import logging
+import math
+import mmap
+import os
+import struct
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, Optional, Tuple, Union
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"RVS1"
+# magic, flags, seq, capacity, count, synced_at
+HEADER = struct.Struct("<4sIQQQd")
+FLAGS = struct.Struct("<I")
+FLAGS_OFFSET = 4
+SEQ = struct.Struct("<Q")
+SEQ_OFFSET = 8
+COUNT = struct.Struct("<Q")
+COUNT_OFFSET = 24
+SYNCED_AT = struct.Struct("<d")
+SYNCED_AT_OFFSET = 32
+SLOTS_OFFSET = 64
+# user id (0 marks an empty slot), token generation
+SLOT = struct.Struct("<QI")
+
+# Set on a file that was replaced by a rebuild, so readers map the new one.
+RETIRED = 1
+MAX_LOAD = 0.7
+MIN_CAPACITY = 1024
+FIBONACCI = 0x9E3779B97F4A7C15
+MASK64 = 0xFFFFFFFFFFFFFFFF
+READ_RETRIES = 3
+REOPEN_INTERVAL = 1.0
+# Bumps are stamped before their transaction commits, so each sync reads
+# back this far to catch those that committed after the previous one.
+SYNC_OVERLAP = timedelta(seconds=30)
+
+
+class SnapshotFull(Exception):
+    pass
+
+
+class SnapshotTable:
+    """Hash table over a mapped snapshot file."""
+
+    def __init__(self, buffer: mmap.mmap) -> None:
+        magic, __, __, capacity, __, __ = HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError("Not a revocation snapshot.")
+        self.buffer = buffer
+        self.capacity = capacity
+        self.mask = capacity - 1
+        self.shift = 64 - (capacity.bit_length() - 1)
+
+    @classmethod
+    def create(cls, path: str, capacity: int) -> "SnapshotTable":
+        with open(path, "w+b") as f:
+            f.truncate(SLOTS_OFFSET + capacity * SLOT.size)
+            buffer = mmap.mmap(f.fileno(), 0)
+        HEADER.pack_into(buffer, 0, MAGIC, 0, 0, capacity, 0, 0.0)
+        return cls(buffer)
+
+    @classmethod
+    def open(cls, path: str, writable: bool = False) -> "SnapshotTable":
+        with open(path, "r+b" if writable else "rb") as f:
+            access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+            return cls(mmap.mmap(f.fileno(), 0, access=access))
+
+    @property
+    def flags(self) -> int:
+        return FLAGS.unpack_from(self.buffer, FLAGS_OFFSET)[0]
+
+    @flags.setter
+    def flags(self, value: int) -> None:
+        FLAGS.pack_into(self.buffer, FLAGS_OFFSET, value)
+
+    @property
+    def seq(self) -> int:
+        return SEQ.unpack_from(self.buffer, SEQ_OFFSET)[0]
+
+    @seq.setter
+    def seq(self, value: int) -> None:
+        SEQ.pack_into(self.buffer, SEQ_OFFSET, value)
+
+    @property
+    def count(self) -> int:
+        return COUNT.unpack_from(self.buffer, COUNT_OFFSET)[0]
+
+    @count.setter
+    def count(self, value: int) -> None:
+        COUNT.pack_into(self.buffer, COUNT_OFFSET, value)
+
+    @property
+    def synced_at(self) -> float:
+        return SYNCED_AT.unpack_from(self.buffer, SYNCED_AT_OFFSET)[0]
+
+    @synced_at.setter
+    def synced_at(self, value: float) -> None:
+        SYNCED_AT.pack_into(self.buffer, SYNCED_AT_OFFSET, value)
+
+    def _find(self, user_id: int) -> Tuple[int, int, int]:
+        """Return the offset, user id and generation of ``user_id``'s slot."""
+        index = ((user_id * FIBONACCI) & MASK64) >> self.shift
+        for __ in range(self.capacity):
+            offset = SLOTS_OFFSET + index * SLOT.size
+            key, generation = SLOT.unpack_from(self.buffer, offset)
+            if key == user_id or key == 0:
+                return offset, key, generation
+            index = (index + 1) & self.mask
+        return -1, 0, 0
+
+    def lookup(self, user_id: int) -> Optional[int]:
+        __, key, generation = self._find(user_id)
+        return generation if key else None
+
+    def put(self, user_id: int, generation: int) -> None:
+        """Store ``generation`` unless a higher one is stored already."""
+        offset, key, current = self._find(user_id)
+        if key:
+            if generation > current:
+                SLOT.pack_into(self.buffer, offset, user_id, generation)
+            return
+        count = self.count
+        if offset < 0 or count + 1 > self.capacity * MAX_LOAD:
+            raise SnapshotFull()
+        SLOT.pack_into(self.buffer, offset, user_id, generation)
+        self.count = count + 1
+
+    def close(self) -> None:
+        self.buffer.close()
+
+
+def get_capacity(count: int) -> int:
+    """Smallest power of two holding twice ``count`` users under MAX_LOAD."""
+    return max(1 << math.ceil(math.log2(2 * count / MAX_LOAD + 1)), MIN_CAPACITY)
+
+
+def to_user_id(value: Union[int, str]) -> Optional[int]:
+    try:
+        user_id = int(value)
+    except (TypeError, ValueError):
+        return None
+    return user_id if 0 < user_id <= MASK64 else None
+
+
+class RevocationSnapshot:
+    """Read side; each process maps REVOCATION_SNAPSHOT_PATH on first use."""
+
+    def __init__(self) -> None:
+        self.path: Optional[str] = None
+        self._table: Optional[SnapshotTable] = None
+        self._next_open = 0.0
+
+    def _open(self, path: str, force: bool = False) -> Optional[SnapshotTable]:
+        now = time.monotonic()
+        if path == self.path and not force and now < self._next_open:
+            return self._table
+        self.path = path
+        self._next_open = now + REOPEN_INTERVAL
+        try:
+            self._table = SnapshotTable.open(path)
+        except (OSError, ValueError):
+            self._table = None
+        return self._table
+
+    def get(self, user_id: Union[int, str]) -> Optional[int]:
+        """
+        Return the token generation of ``user_id``, or None when the snapshot
+        cannot answer and the caller has to ask the cache.
+        """
+        path = settings.REVOCATION_SNAPSHOT_PATH
+        user_id = to_user_id(user_id)
+        if not path or user_id is None:
+            return None
+        table = self._table if path == self.path else None
+        table = table or self._open(path)
+        max_age = settings.REVOCATION_SNAPSHOT_MAX_AGE.total_seconds()
+        for __ in range(READ_RETRIES):
+            if table is None:
+                return None
+            seq = table.seq
+            if table.flags & RETIRED:
+                table = self._open(path, force=True)
+                continue
+            if seq & 1:
+                continue
+            if time.time() - table.synced_at > max_age:
+                return None
+            generation = table.lookup(user_id)
+            if table.seq == seq:
+                return generation
+        return None
+
+
+class SnapshotWriter:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.table: Optional[SnapshotTable] = None
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        with open(self.path + ".lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    @contextmanager
+    def writing(self, table: SnapshotTable) -> Iterator[None]:
+        """Hold the writer lock; readers of ``table`` retry meanwhile."""
+        with self.lock():
+            table.seq += 1
+            try:
+                yield
+            finally:
+                table.seq += 1
+
+    def rebuild(
+        self, rows: Iterable[Tuple[int, int]], count: int, synced_at: float
+    ) -> None:
+        """Write a new file from ``rows`` and swap it in for the current one."""
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        table = SnapshotTable.create(temporary, get_capacity(count))
+        try:
+            for user_id, generation in rows:
+                table.put(user_id, generation)
+        except BaseException:
+            table.close()
+            os.unlink(temporary)
+            raise
+        table.synced_at = synced_at
+        with self.lock():
+            try:
+                previous = self.table or SnapshotTable.open(self.path, writable=True)
+            except (OSError, ValueError):
+                previous = None
+            os.replace(temporary, self.path)
+            if previous is not None:
+                previous.flags |= RETIRED
+                previous.close()
+        self.table = table
+
+    def update(
+        self, rows: Iterable[Tuple[int, int]], synced_at: Optional[float] = None
+    ) -> None:
+        table = self.table or SnapshotTable.open(self.path, writable=True)
+        try:
+            with self.writing(table):
+                for user_id, generation in rows:
+                    table.put(user_id, generation)
+                if synced_at is not None:
+                    table.synced_at = synced_at
+        finally:
+            if table is not self.table:
+                table.close()
+
+
+revocation_snapshot = RevocationSnapshot()
+
+
+def record_revocation(user_id: Union[int, str], generation: int) -> None:
+    """Write a bump into this host's snapshot now instead of at the next sync."""
+    path = settings.REVOCATION_SNAPSHOT_PATH
+    user_id = to_user_id(user_id)
+    if not path or user_id is None:
+        return
+    try:
+        SnapshotWriter(path).update([(user_id, generation)])
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, SnapshotFull):
+        # Users missing from the table are looked up in the cache, and the
+        # next sync repairs the rest.
+        logger.warning("Could not record revocation of %s", user_id, exc_info=True)
+
+
+def get_bumps(since: datetime) -> Iterable[Tuple[int, int]]:
+    return (
+        User.objects.order_by()
+        .filter(tokens_revoked_at__gte=since - SYNC_OVERLAP)
+        .values_list("pk", "token_generation")
+    )
+
+def sync_snapshot(writer: SnapshotWriter, since: Optional[datetime] = None) -> datetime:
+    """
+    Rebuild the snapshot from every user, or with ``since`` only apply the
+    bumps made after it. Returns the ``since`` of the next sync.
+    """
+    started = timezone.now()
+    users = User.objects.order_by()
+    if since is not None and writer.table is not None:
+        try:
+            writer.update(get_bumps(since), started.timestamp())
+            return started
+        except SnapshotFull:
+            logger.info("Revocation snapshot is full, rebuilding it")
+    writer.rebuild(
+        users.values_list("pk", "token_generation").iterator(chunk_size=10000),
+        users.count(),
+        started.timestamp(),
+    )
+    # Bumps committed while the rows were read were recorded into the file
+    # that the rebuild replaced.
+    writer.update(get_bumps(started))
+    return started
+
@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import random
+import time
+from collections.abc import Mapping
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions, status
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """
+    Sliding window counter: the count of the previous fixed window, weighted
+    by how much of it still overlaps the sliding window, plus the count of
+    the current one. Both live in the cache as integers. A request claims
+    its slot with ``incr`` before the limit is checked and gives it back when
+    rejected, so concurrent requests each see a distinct count and a burst
+    cannot slip through on a stale read the way ``SimpleRateThrottle``
+    allows.
+    """
+
+    def allow_request(self, request: Any, view: Any) -> bool:
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window, elapsed = divmod(self.now, self.duration)
+        current_key = f"{self.key}:{int(window)}"
+        previous_key = f"{self.key}:{int(window) - 1}"
+        self.remaining_duration = self.duration - elapsed
+
+        self.cache.add(current_key, 0, self.duration * 2)
+        try:
+            current = self.cache.incr(current_key)
+        except ValueError:
+            # Expired between add and incr.
+            current = 1
+            self.cache.set(current_key, current, self.duration * 2)
+        previous = self.cache.get(previous_key, 0)
+        estimate = previous * (self.remaining_duration / self.duration) + current
+        if estimate > self.num_requests:
+            try:
+                self.cache.decr(current_key)
+            except ValueError:
+                pass
+            return self.throttle_failure()
+        return True
+
+    def wait(self) -> Optional[float]:
+        return self.remaining_duration
+
+
+class LoginUsernameRateThrottle(SlidingWindowRateThrottle):
+    scope = "login_username"
+
+    def get_cache_key(self, request: Any, view: Any) -> Optional[str]:
+        if not isinstance(request.data, Mapping):
+            return None
+        username = request.data.get("username")
+        if not username or not isinstance(username, str):
+            return None
+        ident = hashlib.sha256(username.lower().encode("utf-8")).hexdigest()
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+
+class LoginIPRateThrottle(SlidingWindowRateThrottle):
+    scope = "login_ip"
+
+    def get_cache_key(self, request: Any, view: Any) -> Optional[str]:
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": self.get_ident(request),
+        }
+
+
+class PasswordHashCapacityExceeded(exceptions.APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _("Máy chủ đang bận, vui lòng thử lại sau.")
+    default_code = "password_hash_capacity_exceeded"
+
+
+PASSWORD_HASH_SLOT_CACHE_KEY = "password-hash-slot:%s"
+
+
+def acquire_password_hash_slot() -> Optional[str]:
+    """Claim a free slot and return its key, or None when all are taken."""
+    slots = settings.PASSWORD_HASH_MAX_CONCURRENCY
+    # Lease expiry frees the slots of workers that died while hashing.
+    lease = settings.PASSWORD_HASH_TIMEOUT.total_seconds()
+    start = random.randrange(slots)
+    for offset in range(slots):
+        key = PASSWORD_HASH_SLOT_CACHE_KEY % ((start + offset) % slots,)
+        if cache.add(key, 1, lease):
+            return key
+    return None
+
+
+async def aacquire_password_hash_slot() -> Optional[str]:
+    slots = settings.PASSWORD_HASH_MAX_CONCURRENCY
+    lease = settings.PASSWORD_HASH_TIMEOUT.total_seconds()
+    start = random.randrange(slots)
+    for offset in range(slots):
+        key = PASSWORD_HASH_SLOT_CACHE_KEY % ((start + offset) % slots,)
+        if await cache.aadd(key, 1, lease):
+            return key
+    return None
+
+
+@contextmanager
+def password_hash_slot() -> Iterator[None]:
+    """
+    Hold one of the PASSWORD_HASH_MAX_CONCURRENCY hashing slots shared by
+    all workers, failing fast with a 503 instead of queueing behind the CPU.
+    """
+    deadline = time.monotonic() + settings.PASSWORD_HASH_QUEUE_TIMEOUT.total_seconds()
+    key = acquire_password_hash_slot()
+    while key is None:
+        if time.monotonic() >= deadline:
+            raise PasswordHashCapacityExceeded()
+        time.sleep(settings.PASSWORD_HASH_QUEUE_INTERVAL.total_seconds())
+        key = acquire_password_hash_slot()
+    try:
+        yield
+    finally:
+        cache.delete(key)
+
+
+@asynccontextmanager
+async def apassword_hash_slot() -> AsyncIterator[None]:
+    deadline = time.monotonic() + settings.PASSWORD_HASH_QUEUE_TIMEOUT.total_seconds()
+    key = await aacquire_password_hash_slot()
+    while key is None:
+        if time.monotonic() >= deadline:
+            raise PasswordHashCapacityExceeded()
+        await asyncio.sleep(settings.PASSWORD_HASH_QUEUE_INTERVAL.total_seconds())
+        key = await aacquire_password_hash_slot()
+    try:
+        yield
+    finally:
+        await cache.adelete(key)
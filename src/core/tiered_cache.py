@@ -0,0 +1,386 @@
+"""
+A cache backend with a small per-process LRU (L1) in front of another
+configured cache (L2), for hot read-mostly keys such as the auth lookups::
+
+    CACHES["auth"] = {
+        "BACKEND": "src.core.tiered_cache.TieredCache",
+        "LOCATION": "default",  # the L2 alias
+        "OPTIONS": {"MAX_ENTRIES": 4096, "SYNC_INTERVAL": 1},
+    }
+
+Reads are served from L1 when possible and filled from L2 otherwise. Every
+write goes to L2 and bumps the version stamp of the key's bucket, also kept
+in L2. Each process re-reads the stamps of all buckets with one
+``get_many`` at most every SYNC_INTERVAL seconds and drops the L1 entries of
+buckets that changed, so a write made by another process is seen within
+SYNC_INTERVAL. L1 entries also never live longer than L1_TIMEOUT.
+
+``MAX_ENTRIES: 0`` turns L1 off and makes the backend a plain proxy of L2.
+"""
+
+import pickle
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.connection import ConnectionProxy
+from django.utils.functional import cached_property
+
+from src.core.metrics import record_cache_lookups
+
+MISSING = object()
+
+VERSION_KEY = "tiered-cache:%s:version:%d"
+EPOCH_KEY = "tiered-cache:%s:epoch"
+
+# L1 entry: pickled value, expiry (monotonic), bucket, bucket version
+Entry = Tuple[bytes, float, int, int]
+
+
+class LocalTier:
+    """The L1 of one process, shared by the per-thread backend instances."""
+
+    def __init__(
+        self, name: str, max_entries: int, buckets: int, sync_interval: float
+    ) -> None:
+        self.name = name
+        self.max_entries = max_entries
+        self.buckets = buckets
+        self.sync_interval = sync_interval
+        self.entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self.versions = [0] * buckets
+        self.epoch: Optional[str] = None
+        self.next_sync = 0.0
+        self.l1_hits = 0
+        self.l1_misses = 0
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.lock = threading.Lock()
+
+    def get_bucket(self, key: str) -> int:
+        return zlib.crc32(key.encode()) % self.buckets
+
+    @property
+    def version_keys(self) -> List[str]:
+        return [VERSION_KEY % (self.name, bucket) for bucket in range(self.buckets)]
+
+    @property
+    def epoch_key(self) -> str:
+        return EPOCH_KEY % (self.name,)
+
+    def sync_due(self) -> bool:
+        return time.monotonic() >= self.next_sync
+
+    def apply_versions(self, epoch: str, stamps: Dict[str, int]) -> None:
+        versions = [stamps.get(key, 0) for key in self.version_keys]
+        with self.lock:
+            if epoch != self.epoch:
+                # L2 was cleared, or this is the first sync.
+                self.entries.clear()
+            elif versions != self.versions:
+                for key, entry in list(self.entries.items()):
+                    if entry[3] != versions[entry[2]]:
+                        del self.entries[key]
+            self.epoch = epoch
+            self.versions = versions
+            self.next_sync = time.monotonic() + self.sync_interval
+
+    def get(self, key: str) -> Any:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.l1_hits += 1
+                value = entry[0]
+                record_cache_lookups(f"{self.name}_l1", 1, 0)
+            else:
+                if entry is not None:
+                    del self.entries[key]
+                self.l1_misses += 1
+                record_cache_lookups(f"{self.name}_l1", 0, 1)
+                return MISSING
+        return pickle.loads(value)
+
+    def stamp(self, key: str) -> Tuple[int, int]:
+        """
+        Return the bucket of ``key`` and its version, to be read before the
+        value is fetched from L2 so that a concurrent write is not masked.
+        """
+        bucket = self.get_bucket(key)
+        return bucket, self.versions[bucket]
+
+    def put(self, key: str, value: Any, timeout: float, stamp: Tuple[int, int]) -> None:
+        if timeout <= 0:
+            self.pop(key)
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (pickled, time.monotonic() + timeout, *stamp)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def record_l2(self, hits: int, misses: int) -> None:
+        with self.lock:
+            self.l2_hits += hits
+            self.l2_misses += misses
+        record_cache_lookups(f"{self.name}_l2", hits, misses)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.epoch = None
+            self.next_sync = 0.0
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        l1_total = self.l1_hits + self.l1_misses
+        l2_total = self.l2_hits + self.l2_misses
+        return {
+            "size": len(self.entries),
+            "l1_hits": self.l1_hits,
+            "l1_misses": self.l1_misses,
+            "l1_hit_ratio": self.l1_hits / l1_total if l1_total else 0.0,
+            "l2_hits": self.l2_hits,
+            "l2_misses": self.l2_misses,
+            "l2_hit_ratio": self.l2_hits / l2_total if l2_total else 0.0,
+        }
+
+
+_tiers: Dict[Tuple[str, int, int, float], LocalTier] = {}
+_tiers_lock = threading.Lock()
+
+
+def get_tier(
+    name: str, max_entries: int, buckets: int, sync_interval: float
+) -> LocalTier:
+    config = (name, max_entries, buckets, sync_interval)
+    with _tiers_lock:
+        tier = _tiers.get(config)
+        if tier is None:
+            tier = _tiers[config] = LocalTier(*config)
+        return tier
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location: str, params: Dict[str, Any]) -> None:
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self.l2_alias = location or "default"
+        self.l1_timeout = float(options.get("L1_TIMEOUT", 60))
+        self.tier: Optional[LocalTier] = None
+        if self._max_entries > 0:
+            # Django builds a backend per thread; the L1 is per process.
+            self.tier = get_tier(
+                f"{self.l2_alias}:{self.key_prefix}",
+                self._max_entries,
+                int(options.get("VERSION_BUCKETS", 64)),
+                float(options.get("SYNC_INTERVAL", 1)),
+            )
+
+    @cached_property
+    def l2(self) -> BaseCache:
+        return caches[self.l2_alias]
+
+    def get_l1_timeout(self, timeout: Any) -> float:
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return self.l1_timeout
+        return min(timeout - time.time(), self.l1_timeout)
+
+    def sync_if_due(self) -> None:
+        if self.tier.sync_due():
+            self.sync()
+
+    def sync(self) -> None:
+        tier = self.tier
+        keys = tier.version_keys
+        stamps = self.l2.get_many([*keys, tier.epoch_key])
+        epoch = stamps.pop(tier.epoch_key, None)
+        if epoch is None:
+            epoch = uuid.uuid4().hex
+            if not self.l2.add(tier.epoch_key, epoch, None):
+                epoch = self.l2.get(tier.epoch_key, epoch)
+        tier.apply_versions(epoch, stamps)
+
+    async def async_sync(self) -> None:
+        tier = self.tier
+        keys = tier.version_keys
+        stamps = await self.l2.aget_many([*keys, tier.epoch_key])
+        epoch = stamps.pop(tier.epoch_key, None)
+        if epoch is None:
+            epoch = uuid.uuid4().hex
+            if not await self.l2.aadd(tier.epoch_key, epoch, None):
+                epoch = await self.l2.aget(tier.epoch_key, epoch)
+        tier.apply_versions(epoch, stamps)
+
+    def bump(self, keys: Iterable[str]) -> None:
+        """Invalidate ``keys`` in the L1 of every process."""
+        tier = self.tier
+        for bucket in {tier.get_bucket(key) for key in keys}:
+            version_key = VERSION_KEY % (tier.name, bucket)
+            try:
+                self.l2.incr(version_key)
+            except ValueError:
+                if not self.l2.add(version_key, 1, None):
+                    self.l2.incr(version_key)
+
+    def written(self, l1_key: str, value: Any = MISSING, timeout: Any = None) -> None:
+        # Synced first, or the first sync would drop what is written here.
+        self.sync_if_due()
+        self.bump([l1_key])
+        if value is MISSING:
+            self.tier.pop(l1_key)
+        else:
+            # Stamped with the version from before the bump, so the entry is
+            # dropped and refetched at the next sync in case another process
+            # wrote the key concurrently.
+            stamp = self.tier.stamp(l1_key)
+            self.tier.put(l1_key, value, self.get_l1_timeout(timeout), stamp)
+
+    def get(self, key: Any, default: Any = None, version: Any = None) -> Any:
+        if self.tier is None:
+            return self.l2.get(key, default, version)
+        l1_key = self.make_key(key, version)
+        self.validate_key(l1_key)
+        self.sync_if_due()
+        value = self.tier.get(l1_key)
+        if value is not MISSING:
+            return value
+        stamp = self.tier.stamp(l1_key)
+        value = self.l2.get(key, MISSING, version)
+        if value is MISSING:
+            self.tier.record_l2(0, 1)
+            return default
+        self.tier.record_l2(1, 0)
+        self.tier.put(l1_key, value, self.l1_timeout, stamp)
+        return value
+
+    async def aget(self, key: Any, default: Any = None, version: Any = None) -> Any:
+        if self.tier is None:
+            return await self.l2.aget(key, default, version)
+        l1_key = self.make_key(key, version)
+        self.validate_key(l1_key)
+        if self.tier.sync_due():
+            await self.async_sync()
+        value = self.tier.get(l1_key)
+        if value is not MISSING:
+            return value
+        stamp = self.tier.stamp(l1_key)
+        value = await self.l2.aget(key, MISSING, version)
+        if value is MISSING:
+            self.tier.record_l2(0, 1)
+            return default
+        self.tier.record_l2(1, 0)
+        self.tier.put(l1_key, value, self.l1_timeout, stamp)
+        return value
+
+    def get_many(self, keys: Iterable[Any], version: Any = None) -> Dict[Any, Any]:
+        """Serve what L1 holds and fill it with the rest in one L2 round trip."""
+        if self.tier is None:
+            return self.l2.get_many(keys, version)
+        self.sync_if_due()
+        found = {}
+        missing: Dict[Any, str] = {}
+        for key in keys:
+            l1_key = self.make_key(key, version)
+            self.validate_key(l1_key)
+            value = self.tier.get(l1_key)
+            if value is MISSING:
+                missing[key] = l1_key
+            else:
+                found[key] = value
+        if missing:
+            stamps = {key: self.tier.stamp(l1_key) for key, l1_key in missing.items()}
+            loaded = self.l2.get_many(missing, version)
+            self.tier.record_l2(len(loaded), len(missing) - len(loaded))
+            for key, value in loaded.items():
+                self.tier.put(missing[key], value, self.l1_timeout, stamps[key])
+            found.update(loaded)
+        return found
+
+    def set(
+        self, key: Any, value: Any, timeout: Any = DEFAULT_TIMEOUT, version: Any = None
+    ) -> None:
+        self.l2.set(key, value, timeout, version)
+        if self.tier is not None:
+            self.written(self.make_key(key, version), value, timeout)
+
+    def add(
+        self, key: Any, value: Any, timeout: Any = DEFAULT_TIMEOUT, version: Any = None
+    ) -> bool:
+        added = self.l2.add(key, value, timeout, version)
+        if added and self.tier is not None:
+            self.written(self.make_key(key, version), value, timeout)
+        return added
+
+    def touch(
+        self, key: Any, timeout: Any = DEFAULT_TIMEOUT, version: Any = None
+    ) -> bool:
+        return self.l2.touch(key, timeout, version)
+
+    def delete(self, key: Any, version: Any = None) -> bool:
+        deleted = self.l2.delete(key, version)
+        if self.tier is not None:
+            self.written(self.make_key(key, version))
+        return deleted
+
+    def incr(self, key: Any, delta: int = 1, version: Any = None) -> int:
+        value = self.l2.incr(key, delta, version)
+        if self.tier is not None:
+            self.written(self.make_key(key, version))
+        return value
+
+    def set_many(
+        self, data: Dict[Any, Any], timeout: Any = DEFAULT_TIMEOUT, version: Any = None
+    ) -> List[Any]:
+        failed = self.l2.set_many(data, timeout, version)
+        if self.tier is not None and data:
+            l1_keys = {key: self.make_key(key, version) for key in data}
+            self.sync_if_due()
+            self.bump(l1_keys.values())
+            l1_timeout = self.get_l1_timeout(timeout)
+            for key, value in data.items():
+                if key in failed:
+                    self.tier.pop(l1_keys[key])
+                else:
+                    stamp = self.tier.stamp(l1_keys[key])
+                    self.tier.put(l1_keys[key], value, l1_timeout, stamp)
+        return failed
+
+    def delete_many(self, keys: Iterable[Any], version: Any = None) -> None:
+        keys = list(keys)
+        self.l2.delete_many(keys, version)
+        if self.tier is not None and keys:
+            l1_keys = [self.make_key(key, version) for key in keys]
+            self.bump(l1_keys)
+            for l1_key in l1_keys:
+                self.tier.pop(l1_key)
+
+    def has_key(self, key: Any, version: Any = None) -> bool:
+        return self.get(key, MISSING, version) is not MISSING
+
+    def clear(self) -> None:
+        self.l2.clear()
+        if self.tier is not None:
+            self.tier.clear()
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return self.tier.stats if self.tier is not None else {}
+
+
+AUTH_CACHE_ALIAS = "auth"
+
+# Lookups on the authentication path: token generations, user snapshots,
+# sessions and API keys. Locks and counters stay on the default cache.
+auth_cache = ConnectionProxy(caches, AUTH_CACHE_ALIAS)
@@ -0,0 +1,42 @@
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from time import perf_counter
+from typing import Dict, Iterator, Optional
+
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "server_timings", default=None
+)
+
+
+def start_timing() -> Token:
+    return _timings.set({})
+
+
+def stop_timing(token: Token) -> Dict[str, float]:
+    timings = _timings.get() or {}
+    _timings.reset(token)
+    return timings
+
+
+def is_timing() -> bool:
+    return _timings.get() is not None
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """Add the duration of the block, in milliseconds, to the current request."""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0.0) + (perf_counter() - started) * 1000
+
+
+def format_server_timing(timings: Dict[str, float]) -> str:
+    return ", ".join(
+        f"{phase};dur={duration:.3f}" for phase, duration in timings.items()
+    )
@@ -0,0 +1,204 @@
+import asyncio
+import time
+from functools import partial
+from typing import Any, Dict, Iterable, Optional, Union
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from src.core.db.routers import replica_reads
+from src.core.metrics import record_cache_lookups
+from src.core.revocation_snapshot import record_revocation, revocation_snapshot
+from src.core.tiered_cache import auth_cache
+
+User = get_user_model()
+
+TOKEN_GENERATION_CACHE_KEY = "token-generation:%s"
+TOKEN_GENERATION_LOCK_KEY = "token-generation-lock:%s"
+
+
+def get_cache_key(user_id: Union[int, str]) -> str:
+    return TOKEN_GENERATION_CACHE_KEY % (user_id,)
+
+
+def load_token_generation(user_id: Union[int, str]) -> Optional[int]:
+    with replica_reads([user_id]):
+        return (
+            User.objects.filter(pk=user_id)
+            .values_list("token_generation", flat=True)
+            .first()
+        )
+
+
+def get_snapshot_generation(
+    user_id: Union[int, str], token_generation: Optional[int] = None
+) -> Optional[int]:
+    """
+    Return the generation of ``user_id`` from the revocation snapshot, or
+    None when the cache has to answer instead.
+
+    The snapshot holds the minimum valid generation and misses bumps made on
+    other hosts until the next sync. It can reject an older token, but a
+    token newer than it may have been issued after such a bump.
+    """
+    generation = revocation_snapshot.get(user_id)
+    if (
+        generation is not None
+        and isinstance(token_generation, int)
+        and generation < token_generation
+    ):
+        return None
+    return generation
+
+
+def get_token_generation(
+    user_id: Union[int, str], token_generation: Optional[int] = None
+) -> Optional[int]:
+    generation = get_snapshot_generation(user_id, token_generation)
+    if generation is not None:
+        record_cache_lookups("token_generation", 1, 0)
+        return generation
+
+    key = get_cache_key(user_id)
+    generation = auth_cache.get(key)
+    if generation is not None:
+        record_cache_lookups("token_generation", 1, 0)
+        return generation
+    record_cache_lookups("token_generation", 0, 1)
+
+    # Only one caller per cold key reloads from the database, the others
+    # wait for it to fill the cache before falling back themselves.
+    lock_key = TOKEN_GENERATION_LOCK_KEY % (user_id,)
+    lock_timeout = settings.TOKEN_GENERATION_LOCK_TIMEOUT.total_seconds()
+    for __ in range(settings.TOKEN_GENERATION_LOCK_RETRIES):
+        if cache.add(lock_key, 1, lock_timeout):
+            try:
+                return _fill_token_generation(user_id)
+            finally:
+                cache.delete(lock_key)
+        time.sleep(settings.TOKEN_GENERATION_LOCK_INTERVAL.total_seconds())
+        generation = auth_cache.get(key)
+        if generation is not None:
+            return generation
+    return load_token_generation(user_id)
+
+
+def get_token_generations(
+    user_ids: Iterable[Union[int, str]],
+    token_generations: Optional[Dict[Union[int, str], int]] = None,
+) -> Dict[Union[int, str], int]:
+    """
+    Like ``get_token_generation`` for many users. ``token_generations`` maps
+    users to the newest generation among the tokens to be checked.
+    """
+    generations = {}
+    keys = {}
+    token_generations = token_generations or {}
+    for user_id in user_ids:
+        generation = get_snapshot_generation(
+            user_id, token_generations.get(user_id)
+        )
+        if generation is None:
+            keys[get_cache_key(user_id)] = user_id
+        else:
+            generations[user_id] = generation
+    generations.update(
+        (keys[key], generation) for key, generation in auth_cache.get_many(keys).items()
+    )
+    missing = [user_id for user_id in keys.values() if user_id not in generations]
+    record_cache_lookups("token_generation", len(generations), len(missing))
+    if missing:
+        timeout = settings.TOKEN_GENERATION_CACHE_TTL.total_seconds()
+        with replica_reads(missing):
+            loaded = dict(
+                User.objects.filter(pk__in=missing).values_list(
+                    "pk", "token_generation"
+                )
+            )
+        for user_id in missing:
+            generation = loaded.get(user_id)
+            if generation is not None:
+                auth_cache.add(get_cache_key(user_id), generation, timeout)
+                generations[user_id] = generation
+    return generations
+
+
+async def aget_token_generation(
+    user_id: Union[int, str], token_generation: Optional[int] = None
+) -> Optional[int]:
+    generation = get_snapshot_generation(user_id, token_generation)
+    if generation is not None:
+        record_cache_lookups("token_generation", 1, 0)
+        return generation
+
+    key = get_cache_key(user_id)
+    generation = await auth_cache.aget(key)
+    if generation is not None:
+        record_cache_lookups("token_generation", 1, 0)
+        return generation
+    record_cache_lookups("token_generation", 0, 1)
+
+    lock_key = TOKEN_GENERATION_LOCK_KEY % (user_id,)
+    lock_timeout = settings.TOKEN_GENERATION_LOCK_TIMEOUT.total_seconds()
+    for __ in range(settings.TOKEN_GENERATION_LOCK_RETRIES):
+        if await cache.aadd(lock_key, 1, lock_timeout):
+            try:
+                return await _afill_token_generation(user_id)
+            finally:
+                await cache.adelete(lock_key)
+        await asyncio.sleep(settings.TOKEN_GENERATION_LOCK_INTERVAL.total_seconds())
+        generation = await auth_cache.aget(key)
+        if generation is not None:
+            return generation
+    return await sync_to_async(load_token_generation)(user_id)
+
+
+def _fill_token_generation(user_id: Union[int, str]) -> Optional[int]:
+    generation = load_token_generation(user_id)
+    if generation is not None:
+        # ``add`` never overwrites a value written by a concurrent bump.
+        auth_cache.add(
+            get_cache_key(user_id),
+            generation,
+            settings.TOKEN_GENERATION_CACHE_TTL.total_seconds(),
+        )
+    return generation
+
+
+async def _afill_token_generation(user_id: Union[int, str]) -> Optional[int]:
+    generation = await sync_to_async(load_token_generation)(user_id)
+    if generation is not None:
+        await auth_cache.aadd(
+            get_cache_key(user_id),
+            generation,
+            settings.TOKEN_GENERATION_CACHE_TTL.total_seconds(),
+        )
+    return generation
+
+
+def bump_token_generation(user: Any) -> int:
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(
+            token_generation=F("token_generation") + 1,
+            tokens_revoked_at=timezone.now(),
+        )
+        user.refresh_from_db(fields=["token_generation"])
+        # Written while the row lock is held so concurrent bumps reach the
+        # cache in the same order as the database.
+        auth_cache.set(
+            get_cache_key(user.pk),
+            user.token_generation,
+            settings.TOKEN_GENERATION_CACHE_TTL.total_seconds(),
+        )
+        # The snapshot never lowers a generation, so a bump that is rolled
+        # back must not reach it. Its order does not matter, for the same
+        # reason.
+        transaction.on_commit(
+            partial(record_revocation, user.pk, user.token_generation)
+        )
+    return user.token_generation
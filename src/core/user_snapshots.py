@@ -0,0 +1,166 @@
+import uuid
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import router, transaction
+
+from src.core.db.routers import replica_reads
+from src.core.metrics import record_cache_lookups
+from src.core.tiered_cache import auth_cache
+
+User = get_user_model()
+
+# Snapshots are cached under the user's current version, which every
+# invalidation replaces. A load that raced a save fills the key of the old
+# version, which nothing reads any more, so it cannot undo the invalidation.
+USER_SNAPSHOT_CACHE_KEY = "user-snapshot:%s:%s"
+USER_SNAPSHOT_VERSION_CACHE_KEY = "user-snapshot-version:%s"
+USER_SNAPSHOT_FIELD_NAMES = {
+    "id",
+    "username",
+    "first_name",
+    "last_name",
+    "email",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+    "token_generation",
+}
+# Kept in model field order, which Model.from_db expects for partial rows.
+USER_SNAPSHOT_FIELDS = tuple(
+    field.attname
+    for field in User._meta.concrete_fields
+    if field.attname in USER_SNAPSHOT_FIELD_NAMES
+)
+
+Snapshot = Tuple[Any, ...]
+
+
+def get_cache_key(user_id: Union[int, str], version: str) -> str:
+    return USER_SNAPSHOT_CACHE_KEY % (user_id, version)
+
+
+def get_version_cache_key(user_id: Union[int, str]) -> str:
+    return USER_SNAPSHOT_VERSION_CACHE_KEY % (user_id,)
+
+
+def get_snapshot_version(user_id: Union[int, str]) -> str:
+    key = get_version_cache_key(user_id)
+    version = auth_cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not auth_cache.add(
+            key, version, settings.USER_SNAPSHOT_CACHE_TTL.total_seconds()
+        ):
+            version = auth_cache.get(key, version)
+    return version
+
+
+async def aget_snapshot_version(user_id: Union[int, str]) -> str:
+    key = get_version_cache_key(user_id)
+    version = await auth_cache.aget(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not await auth_cache.aadd(
+            key, version, settings.USER_SNAPSHOT_CACHE_TTL.total_seconds()
+        ):
+            version = await auth_cache.aget(key, version)
+    return version
+
+
+def load_user_snapshot(user_id: Union[int, str]) -> Optional[Snapshot]:
+    with replica_reads([user_id]):
+        return (
+            User.objects.filter(pk=user_id).values_list(*USER_SNAPSHOT_FIELDS).first()
+        )
+
+
+def user_from_snapshot(snapshot: Snapshot) -> User:
+    """
+    Build a user holding only the snapshot fields. Every other field, such as
+    ``password``, is deferred and loaded from the database on first access.
+    """
+    return User.from_db(router.db_for_read(User), USER_SNAPSHOT_FIELDS, snapshot)
+
+
+def get_user_snapshot(user_id: Union[int, str]) -> Optional[User]:
+    key = get_cache_key(user_id, get_snapshot_version(user_id))
+    snapshot = auth_cache.get(key)
+    record_cache_lookups("user_snapshot", snapshot is not None, snapshot is None)
+    if snapshot is None:
+        snapshot = load_user_snapshot(user_id)
+        if snapshot is None:
+            return None
+        auth_cache.add(key, snapshot, settings.USER_SNAPSHOT_CACHE_TTL.total_seconds())
+    return user_from_snapshot(snapshot)
+
+
+async def aget_user_snapshot(user_id: Union[int, str]) -> Optional[User]:
+    key = get_cache_key(user_id, await aget_snapshot_version(user_id))
+    snapshot = await auth_cache.aget(key)
+    record_cache_lookups("user_snapshot", snapshot is not None, snapshot is None)
+    if snapshot is None:
+        snapshot = await sync_to_async(load_user_snapshot)(user_id)
+        if snapshot is None:
+            return None
+        await auth_cache.aadd(
+            key, snapshot, settings.USER_SNAPSHOT_CACHE_TTL.total_seconds()
+        )
+    return user_from_snapshot(snapshot)
+
+
+def get_user_snapshots(
+    user_ids: Iterable[Union[int, str]],
+) -> Dict[Union[int, str], User]:
+    user_ids = set(user_ids)
+    timeout = settings.USER_SNAPSHOT_CACHE_TTL.total_seconds()
+    version_keys = {get_version_cache_key(user_id): user_id for user_id in user_ids}
+    versions = {
+        version_keys[key]: version
+        for key, version in auth_cache.get_many(version_keys).items()
+    }
+    for user_id in user_ids - versions.keys():
+        versions[user_id] = get_snapshot_version(user_id)
+    keys = {get_cache_key(user_id, versions[user_id]): user_id for user_id in user_ids}
+    snapshots = {
+        keys[key]: snapshot for key, snapshot in auth_cache.get_many(keys).items()
+    }
+    missing = [user_id for user_id in keys.values() if user_id not in snapshots]
+    record_cache_lookups("user_snapshot", len(snapshots), len(missing))
+    if missing:
+        with replica_reads(missing):
+            loaded = {
+                snapshot[0]: snapshot
+                for snapshot in User.objects.filter(pk__in=missing).values_list(
+                    *USER_SNAPSHOT_FIELDS
+                )
+            }
+        for user_id, snapshot in loaded.items():
+            auth_cache.add(get_cache_key(user_id, versions[user_id]), snapshot, timeout)
+        snapshots.update(loaded)
+    return {
+        user_id: user_from_snapshot(snapshot) for user_id, snapshot in snapshots.items()
+    }
+
+
+def invalidate_user_snapshot(user_id: Union[int, str]) -> None:
+    """
+    Move a user to a new snapshot version, and again once the surrounding
+    transaction commits, so loads that read the row before the commit fill a
+    version that is already stale. Called from the ``User`` save and delete
+    signals; writes through ``QuerySet.update`` must call it directly.
+    """
+
+    def bump_version() -> None:
+        auth_cache.set(
+            get_version_cache_key(user_id),
+            uuid.uuid4().hex,
+            settings.USER_SNAPSHOT_CACHE_TTL.total_seconds(),
+        )
+
+    bump_version()
+    using = router.db_for_write(User)
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(bump_version, using=using)
@@ -0,0 +1,30 @@
+import hmac
+from typing import Any
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+from src.core.metrics import collect_metrics
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def has_metrics_token(request: Any) -> bool:
+    token = settings.METRICS_TOKEN
+    if not token:
+        return True
+    auth = request.META.get("HTTP_AUTHORIZATION", "").split()
+    return (
+        len(auth) == 2
+        and auth[0] == "Bearer"
+        and hmac.compare_digest(auth[1].encode(), token.encode())
+    )
+
+
+@require_GET
+def metrics(request: Any) -> HttpResponse:
+    """Serve the metrics in the Prometheus text exposition format."""
+    if not has_metrics_token(request):
+        return HttpResponse(status=401)
+    return HttpResponse(collect_metrics(), content_type=METRICS_CONTENT_TYPE)
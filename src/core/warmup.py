@@ -0,0 +1,156 @@
+"""
+Prime a worker before it serves traffic, so the first requests after a
+deploy do not pay for lazily built state.
+
+Call ``warmup()`` once per worker process, e.g. from gunicorn::
+
+    # gunicorn.conf.py
+    from src.core.warmup import post_fork
+
+or run ``manage.py warmup`` to fill shared caches and see what each step
+costs.
+"""
+
+import inspect
+import logging
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import get_resolver, reverse
+from rest_framework import serializers
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _step(timings: Dict[str, float], name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        # A failed step only leaves its state cold; the worker can still serve.
+        logger.exception("Warmup step %s failed", name)
+    finally:
+        timings[name] = (time.perf_counter() - started) * 1000
+
+
+def warm_urls() -> None:
+    resolver = get_resolver()
+    resolver.url_patterns
+    # Builds the resolver's reverse and namespace dicts.
+    reverse("login")
+
+
+def warm_serializers() -> None:
+    from src.api.serializers import login
+    from src.core.mixins.serializers import (
+        ViewProxySerializerMixin,
+        get_representation_plan,
+    )
+
+    request = RequestFactory().get("/")
+    for serializer_class in vars(login).values():
+        if (
+            not inspect.isclass(serializer_class)
+            or not issubclass(serializer_class, serializers.Serializer)
+            or serializer_class.__module__ != login.__name__
+        ):
+            continue
+        serializer_class(context={"request": request}).fields
+        if (
+            issubclass(serializer_class, ViewProxySerializerMixin)
+            and serializer_class.is_proxy
+        ):
+            get_representation_plan(serializer_class.view_serializer)
+
+
+def warm_jwt() -> None:
+    from src.core.jwt import jwt_base_payload, jwt_codec
+
+    jwt_codec.decode(jwt_codec.encode(jwt_base_payload(timedelta(minutes=1))))
+
+
+def warm_renderers() -> None:
+    from src.core.parsers import JSONParser  # noqa: F401
+    from src.core.renderers import JSONRenderer
+
+    JSONRenderer().render({"warmup": True})
+
+
+def warm_connections(count: int) -> None:
+    """
+    Open ``count`` connections per database and close them again, which
+    with the pooled backends leaves them idle in the pool.
+    """
+    for alias in connections:
+        opened = []
+        try:
+            for __ in range(count):
+                connection = connections.create_connection(alias)
+                connection.ensure_connection()
+                opened.append(connection)
+        finally:
+            for connection in opened:
+                connection.close()
+
+
+def preload_users(limit: int) -> List[Any]:
+    """Fill the auth caches for the ``limit`` most recently logged in users."""
+    from src.core.token_generation import get_token_generations
+    from src.core.user_snapshots import get_user_snapshots
+
+    user_ids = list(
+        User.objects.filter(is_active=True, last_login__isnull=False)
+        .order_by("-last_login")
+        .values_list("pk", flat=True)[:limit]
+    )
+    if user_ids:
+        get_token_generations(user_ids)
+        get_user_snapshots(user_ids)
+    return user_ids
+
+
+def warmup(
+    connections_count: Optional[int] = None, users: Optional[int] = None
+) -> Dict[str, float]:
+    """Run every warmup step and return its duration in milliseconds."""
+    if connections_count is None:
+        connections_count = settings.WARMUP_DB_CONNECTIONS
+    if users is None:
+        users = settings.WARMUP_PRELOAD_USERS
+
+    timings: Dict[str, float] = {}
+    with _step(timings, "urls"):
+        warm_urls()
+    with _step(timings, "serializers"):
+        warm_serializers()
+    with _step(timings, "jwt"):
+        warm_jwt()
+    with _step(timings, "renderers"):
+        warm_renderers()
+    if connections_count > 0:
+        with _step(timings, "db-connections"):
+            warm_connections(connections_count)
+    if users > 0:
+        with _step(timings, "auth-caches"):
+            preload_users(users)
+
+    logger.info(
+        "Worker warmed up in %.1f ms",
+        sum(timings.values()),
+        extra={"warmup": timings},
+    )
+    return timings
+
+
+def post_fork(server: Any, worker: Any) -> None:
+    """gunicorn ``post_fork`` hook."""
+    warmup()
@@ -1,22 +1,32 @@
 from datetime import timedelta
 import os
-import socket  # only if you haven't already imported this
 import warnings
 import ast
 
 import dj_database_url
 import django_cache_url
-from django.core.management.utils import get_random_secret_key
 from django.utils.translation import gettext_lazy as _
 
-__, __, ips = socket.gethostbyname_ex(socket.gethostname())
+from src.core.hosts import HostAddressResolver, HostList
 
-INTERNAL_IPS = [ip[:-1] + "1" for ip in ips] + [
-    "127.0.0.1",
-    "10.0.2.2",
-    "0.0.0.0",
-    "localhost",
-]
+# This host's addresses are looked up in the background from CoreConfig.ready(),
+# so a slow resolver cannot hold up importing the settings. Until the lookup
+# finishes, a host missing from the lists below waits for it, for at most
+# HOST_RESOLUTION_TIMEOUT seconds after it started.
+HOST_ADDRESS_RESOLVER = HostAddressResolver(
+    float(os.environ.get("HOST_RESOLUTION_TIMEOUT", 1))
+)
+
+
+def get_gateway_ips(ips):
+    return [ip[:-1] + "1" for ip in ips]
+
+
+INTERNAL_IPS = HostList(
+    ["127.0.0.1", "10.0.2.2", "0.0.0.0", "localhost"],
+    HOST_ADDRESS_RESOLVER,
+    get_gateway_ips,
+)
 
 AUTH_USER_MODEL = "account.User"
 
@@ -48,24 +58,33 @@ PROJECT_ROOT = os.path.normpath(os.path.join(os.path.dirname(__file__), ".."))
 SECRET_KEY = os.environ.get("SECRET_KEY")
 
 if not SECRET_KEY and DEBUG:
+    # Imported here: django.core.management pulls in most of Django.
+    from django.core.management.utils import get_random_secret_key
+
     warnings.warn("SECRET_KEY not configured, using a random temporary key.")
     SECRET_KEY = get_random_secret_key()
 
-ALLOWED_HOSTS = get_list(
-    os.environ.get("ALLOWED_HOSTS", ",".join(INTERNAL_IPS) + ",localhost")
-)
+if "ALLOWED_HOSTS" in os.environ:
+    ALLOWED_HOSTS = get_list(os.environ["ALLOWED_HOSTS"])
+else:
+    ALLOWED_HOSTS = HostList(
+        [*INTERNAL_IPS.hosts, "localhost"], HOST_ADDRESS_RESOLVER, get_gateway_ips
+    )
 
 
 INSTALLED_APPS = [
     "django.contrib.auth",
     "django.contrib.contenttypes",
     "django.contrib.staticfiles",
+    "src.core.apps.CoreConfig",
     "src.account.apps.AccountConfig",
     "rest_framework",
     "corsheaders",
 ]
 
 MIDDLEWARE = [
+    "src.core.middlewares.MetricsMiddleware",
+    "src.core.middlewares.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -78,6 +97,7 @@ BASE_URL = "https://example.com"
 AUTHENTICATION_BACKENDS = [
     "src.core.auth_backends.ModelBackend",
     "src.core.auth_backends.JSONWebTokenBackend",
+    "src.core.auth_backends.APIKeyBackend",
 ]
 
 TEMPLATES = [
@@ -104,6 +124,17 @@ ASGI_APPLICATION = "src.asgi.application"
 DB_MAX_CONNECTION = 100
 CONN_MAX_AGE = 0
 STATEMENT_TIMEOUT = 90000
+# Connections are closed after each request (CONN_MAX_AGE = 0), which with
+# the pooled backends below returns them to a per-process pool of at most
+# DB_MAX_CONNECTION connections instead of disconnecting.
+DB_POOL = get_bool_from_env("DB_POOL", True)
+DB_POOL_TIMEOUT = timedelta(seconds=10)
+DB_POOL_HEALTH_CHECK_INTERVAL = timedelta(seconds=30)
+POOLED_DB_ENGINES = {
+    "django.db.backends.sqlite3": "src.core.db.backends.sqlite3",
+    "django.db.backends.postgresql": "src.core.db.backends.postgresql",
+    "django.db.backends.postgresql_psycopg2": "src.core.db.backends.postgresql",
+}
 
 DATABASES = {
     "default": {
@@ -111,16 +142,89 @@ DATABASES = {
             conn_max_age=CONN_MAX_AGE,
             default=f"sqlite:////{os.path.join(PROJECT_ROOT,'db.sqlite3')}",
         ),
+        "STATEMENT_TIMEOUT": STATEMENT_TIMEOUT,
+        "POOL": {
+            "MAX_SIZE": DB_MAX_CONNECTION,
+            "TIMEOUT": DB_POOL_TIMEOUT.total_seconds(),
+            "HEALTH_CHECK_INTERVAL": DB_POOL_HEALTH_CHECK_INTERVAL.total_seconds(),
+        },
     }
 }
+# Comma separated URLs of read replicas of the default database. Token
+# authentication reads users from them, except for users written to within
+# REPLICA_STICKINESS, which should exceed the usual replication lag.
+DATABASE_REPLICAS = []
+for index, url in enumerate(
+    filter(None, get_list(os.environ.get("DATABASE_REPLICA_URLS", "")))
+):
+    alias = f"replica_{index}"
+    DATABASES[alias] = {
+        **dj_database_url.parse(url, conn_max_age=CONN_MAX_AGE),
+        "STATEMENT_TIMEOUT": DATABASES["default"]["STATEMENT_TIMEOUT"],
+        "POOL": DATABASES["default"]["POOL"],
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ["src.core.db.routers.ReplicaRouter"]
+REPLICA_STICKINESS = timedelta(seconds=5)
+
+if DB_POOL:
+    for database in DATABASES.values():
+        database["ENGINE"] = POOLED_DB_ENGINES.get(
+            database["ENGINE"], database["ENGINE"]
+        )
 
 # from rest_framework.parsers import MultiPartParser, FormParser
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "src.core.api_authentication.APIAuthentication",
     ],
+    # Requests made with an API key need the view's required_scopes.
+    "DEFAULT_PERMISSION_CLASSES": [
+        "src.core.permissions.APIKeyScopePermission",
+    ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "src.core.renderers.JSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "src.core.parsers.JSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+    # Counted in the default cache, so the limits hold across all workers.
+    "DEFAULT_THROTTLE_RATES": {
+        "login_username": os.environ.get("LOGIN_USERNAME_THROTTLE_RATE", "10/min"),
+        "login_ip": os.environ.get("LOGIN_IP_THROTTLE_RATE", "60/min"),
+    },
+    # Reverse proxies in front of the app whose X-Forwarded-For entries are
+    # trusted to identify clients for throttling. With 0 the client is
+    # REMOTE_ADDR, so a spoofed header cannot dodge the per-IP login limit.
+    "NUM_PROXIES": int(os.environ.get("NUM_PROXIES", 0)),
 }
 
+# "orjson" encodes and decodes JSON bodies with orjson when it is installed,
+# "json" always uses the standard library.
+JSON_BACKEND = os.environ.get("JSON_BACKEND", "orjson")
+
+# Password hashes allowed to run at once across all workers sharing the
+# default cache; more login attempts are answered with 503 after waiting
+# PASSWORD_HASH_QUEUE_TIMEOUT, polling every PASSWORD_HASH_QUEUE_INTERVAL.
+PASSWORD_HASH_MAX_CONCURRENCY = int(
+    os.environ.get("PASSWORD_HASH_MAX_CONCURRENCY", os.cpu_count() or 1)
+)
+PASSWORD_HASH_QUEUE_TIMEOUT = timedelta(milliseconds=100)
+PASSWORD_HASH_QUEUE_INTERVAL = timedelta(milliseconds=10)
+# Hash passwords in a pool of this many worker processes instead of the
+# request thread; 0 keeps hashing in-process. At most PASSWORD_HASH_POOL_QUEUE
+# hashes wait for a free worker, and a hash taking longer than
+# PASSWORD_HASH_TIMEOUT is answered with 503.
+PASSWORD_HASH_POOL_SIZE = int(os.environ.get("PASSWORD_HASH_POOL_SIZE", 0))
+PASSWORD_HASH_POOL_QUEUE = int(
+    os.environ.get("PASSWORD_HASH_POOL_QUEUE", PASSWORD_HASH_POOL_SIZE * 2)
+)
+PASSWORD_HASH_TIMEOUT = timedelta(seconds=5)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -167,7 +271,23 @@ if REDIS_URL:
     CACHE_URL = os.environ.setdefault("CACHE_URL", REDIS_URL)
     CACHEOPS_REDIS = os.environ.setdefault("CACHEOPS_REDIS", REDIS_URL)
 
-CACHES = {"default": django_cache_url.config()}
+# The default cache holds token generations, refresh token families and
+# throttling counters, so every worker must share it (see core.E001). The
+# local memory cache used without CACHE_URL is only fit for a single worker.
+CACHES = {
+    "default": django_cache_url.config(),
+    # Authentication lookups, optionally behind a per-process LRU of
+    # AUTH_CACHE_L1_SIZE entries. Writes from other workers reach it within
+    # AUTH_CACHE_L1_SYNC_INTERVAL seconds.
+    "auth": {
+        "BACKEND": "src.core.tiered_cache.TieredCache",
+        "LOCATION": "default",
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("AUTH_CACHE_L1_SIZE", 0)),
+            "SYNC_INTERVAL": float(os.environ.get("AUTH_CACHE_L1_SYNC_INTERVAL", 1)),
+        },
+    },
+}
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/3.2/howto/static-files/
@@ -187,6 +307,20 @@ CORS_ALLOW_ALL_ORIGINS = True
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 
 
+# Cold start budget of a worker, from the first import to a loaded URLconf,
+# enforced by ``manage.py startup_profile``.
+STARTUP_TIME_BUDGET = timedelta(
+    milliseconds=int(os.environ.get("STARTUP_TIME_BUDGET_MS", 1500))
+)
+
+# Database connections opened per database, and recently active users loaded
+# into the auth caches, by ``src.core.warmup.warmup`` when a worker starts.
+WARMUP_DB_CONNECTIONS = int(os.environ.get("WARMUP_DB_CONNECTIONS", 1))
+WARMUP_PRELOAD_USERS = int(os.environ.get("WARMUP_PRELOAD_USERS", 0))
+
+# Share of requests (0.0 - 1.0) that get a Server-Timing header and log record
+SERVER_TIMING_SAMPLE_RATE = float(os.environ.get("SERVER_TIMING_SAMPLE_RATE", 0))
+
 # logging
 LOGGING = {
     "version": 1,
@@ -251,3 +385,64 @@ LOGGING = {
 
 JWT_TTL_ACCESS = timedelta(seconds=3600 * 24)
 JWT_TTL_REFRESH = timedelta(seconds=3600 * 24 * 7)
+ACCEPT_JWT_ON_URL_QUERY_PARAM = False
+# Embed name, email and is_active in access tokens so api/me/ renders them
+# without loading the user. Saving a user as inactive revokes their tokens;
+# deactivations through QuerySet.update must call revoke_tokens themselves.
+JWT_EMBED_PROFILE_CLAIMS = get_bool_from_env("JWT_EMBED_PROFILE_CLAIMS", False)
+JWT_VERIFIED_TOKEN_CACHE_SIZE = 4096
+JWT_VERIFIED_TOKEN_CACHE_TTL = timedelta(minutes=5)
+JWT_VERIFY_BATCH_MAX_SIZE = 100
+# "src.core.jwt_codecs.HS256Codec" skips PyJWT's per-call algorithm setup.
+JWT_CODEC = os.environ.get("JWT_CODEC", "src.core.jwt_codecs.PyJWTCodec")
+
+# Bumps overwrite the shared cache entry, so revocations reach every worker
+# within AUTH_CACHE_L1_SYNC_INTERVAL; the TTL only expires idle entries.
+TOKEN_GENERATION_CACHE_TTL = timedelta(hours=1)
+TOKEN_GENERATION_LOCK_TIMEOUT = timedelta(seconds=5)
+TOKEN_GENERATION_LOCK_INTERVAL = timedelta(milliseconds=20)
+TOKEN_GENERATION_LOCK_RETRIES = 10
+
+# Share token generations between the workers of a host through a memory-mapped
+# file (e.g. under /dev/shm) kept in sync by `manage.py revocation_snapshot`.
+# Revocations from other hosts reach it within REVOCATION_SNAPSHOT_INTERVAL;
+# workers go back to the cache if it is missing or older than
+# REVOCATION_SNAPSHOT_MAX_AGE.
+REVOCATION_SNAPSHOT_PATH = os.environ.get("REVOCATION_SNAPSHOT_PATH") or None
+REVOCATION_SNAPSHOT_INTERVAL = timedelta(seconds=1)
+REVOCATION_SNAPSHOT_REBUILD_INTERVAL = timedelta(minutes=10)
+REVOCATION_SNAPSHOT_MAX_AGE = timedelta(seconds=5)
+
+USER_SNAPSHOT_CACHE_TTL = timedelta(minutes=15)
+
+# Every login starts a UserSession whose jti is carried by its tokens. With
+# JWT_SINGLE_SESSION a login also revokes every older token of the user;
+# otherwise devices stay signed in side by side, up to SESSION_MAX_PER_USER,
+# and are revoked one by one through api/sessions/.
+JWT_SINGLE_SESSION = get_bool_from_env("JWT_SINGLE_SESSION", True)
+SESSION_MAX_PER_USER = 20
+SESSION_CACHE_TTL = timedelta(minutes=5)
+
+# Buffer last_login in memory and write it with one bulk UPDATE every
+# LAST_LOGIN_FLUSH_INTERVAL, once LAST_LOGIN_FLUSH_SIZE users are pending, or
+# at process exit. A crashed worker loses at most one interval of updates.
+LAST_LOGIN_WRITE_BEHIND = get_bool_from_env("LAST_LOGIN_WRITE_BEHIND", False)
+LAST_LOGIN_FLUSH_INTERVAL = timedelta(seconds=5)
+LAST_LOGIN_FLUSH_SIZE = 500
+
+# API keys are looked up by digest from the cache; revoking or editing a key
+# replaces its entry with a tombstone for API_KEY_TOMBSTONE_TTL, during which
+# lookups go to the database. Keep it above the replica lag. last_used_at is
+# written at most once per API_KEY_LAST_USED_INTERVAL per key.
+API_KEY_CACHE_TTL = timedelta(minutes=5)
+API_KEY_TOMBSTONE_TTL = timedelta(seconds=5)
+API_KEY_LAST_USED_INTERVAL = timedelta(minutes=5)
+
+# Prometheus metrics served at /metrics, behind `Authorization: Bearer
+# <METRICS_TOKEN>` when that is set. With several worker processes, point
+# METRICS_MULTIPROCESS_DIR at a directory they share (emptied on restart):
+# each worker writes its totals there every METRICS_FLUSH_INTERVAL and
+# /metrics adds them up.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN") or None
+METRICS_MULTIPROCESS_DIR = os.environ.get("METRICS_MULTIPROCESS_DIR") or None
+METRICS_FLUSH_INTERVAL = timedelta(seconds=5)
@@ -1,3 +1,8 @@
 from django.urls import include, path
 
-urlpatterns = [path("api/", include("src.api.urls"))]
+from src.core.views import metrics
+
+urlpatterns = [
+    path("api/", include("src.api.urls")),
+    path("metrics", metrics, name="metrics"),
+]
@@ -1,8 +1,101 @@
+import io
+import json
+import os
+from decimal import Decimal
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, transaction
+from asgiref.sync import async_to_sync, sync_to_async
+from django.http.request import validate_host
+from django.test import RequestFactory, override_settings
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import renderers, serializers
+from rest_framework.exceptions import ParseError
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_login_failed
+from django.contrib.auth.hashers import make_password
+import jwt
+from jwt import ExpiredSignatureError, InvalidSignatureError, PyJWTError
 
-from src.core.jwt import create_access_token
+from src.account.api_keys import load_api_key
+from src.account.last_login import LastLoginBuffer
+from src.account.models import APIKey, UserSession
+from src.account.services import create_api_key, login
+from src.account.sessions import (
+    load_session,
+    revoke_session,
+    sweep_expired_sessions,
+)
+from src.api.serializers.login import (
+    LoginActionSerializer,
+    LoginViewSerializer,
+    MeViewSerializer,
+)
+from src.core.auth_backends import JSONWebTokenBackend, ModelBackend
+from src.core.checks import check_shared_cache
+from src.core.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from src.core.db.pool import ConnectionPool
+from src.core.db.routers import ReplicaRouter, replica_reads
+from src.core.hashing import PasswordHashPool, _verify
+from src.core.hosts import HostAddressResolver, HostList
+from src.core.jwt import (
+    REFRESH_TOKEN_FAMILY_CACHE_KEY,
+    REFRESH_TOKEN_USED_CACHE_KEY,
+    create_access_token,
+    create_refresh_token,
+    create_token,
+    get_user_from_access_token,
+    jwt_base_payload,
+    jwt_decode,
+    verified_token_cache,
+)
+from src.core.jwt_codecs import HS256Codec, PyJWTCodec
+from src.core.metrics import Counter, Histogram, MetricsRegistry
+from src.core.middlewares import aauthenticate
+from src.core.mixins.serializers import (
+    ViewProxySerializerMixin,
+    get_representation_plan,
+)
+from src.core.parsers import JSONParser
+from src.core.renderers import JSONRenderer
+from src.core.revocation_snapshot import (
+    RETIRED,
+    SnapshotFull,
+    SnapshotTable,
+    SnapshotWriter,
+    revocation_snapshot,
+)
+from src.core.tiered_cache import LocalTier, TieredCache
+from src.core.throttling import (
+    PASSWORD_HASH_SLOT_CACHE_KEY,
+    LoginIPRateThrottle,
+    LoginUsernameRateThrottle,
+    PasswordHashCapacityExceeded,
+)
+from src.core.token_generation import (
+    TOKEN_GENERATION_LOCK_KEY,
+    bump_token_generation,
+    get_cache_key,
+    get_token_generation,
+)
+from src.core.user_snapshots import (
+    get_cache_key as get_user_snapshot_cache_key,
+    get_snapshot_version,
+    get_user_snapshot,
+    load_user_snapshot,
+)
+from src.core.warmup import warmup
 
 User = get_user_model()
 
@@ -10,6 +103,7 @@ User = get_user_model()
 class TestApiInterview(APITestCase):
     def setUp(self) -> None:
         super().setUp()
+        cache.clear()
         self.authenticated_user = User.objects.create_superuser(
             email="test@gmail.com",
             username="testinterview",
@@ -71,3 +165,1676 @@ class TestApiInterview(APITestCase):
             + " "
             + self.authenticated_user.first_name,
         )
+
+
+class TestVerifiedTokenCache(APITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        verified_token_cache.clear()
+        self.user = User.objects.create_user(
+            username="cacheuser", password="12345678", email="cache@gmail.com"
+        )
+
+    def test_repeated_decode_hits_cache(self):
+        token = create_access_token(self.user)
+
+        jwt_decode(token)
+        payload = jwt_decode(token)
+
+        self.assertEqual(payload["user_id"], self.user.pk)
+        self.assertEqual(verified_token_cache.hits, 1)
+        self.assertEqual(verified_token_cache.misses, 1)
+
+    def test_tampered_token_is_not_served_from_cache(self):
+        token = create_access_token(self.user)
+        jwt_decode(token)
+        header, __, signature = token.split(".")
+        forged = create_access_token(self.user, {"user_id": 0}).split(".")[1]
+
+        with self.assertRaises(PyJWTError):
+            jwt_decode(".".join([header, forged, signature]))
+
+    def test_login_invalidates_cached_tokens(self):
+        token = create_access_token(self.user)
+        jwt_decode(token)
+
+        login(self.user)
+
+        self.assertEqual(verified_token_cache.stats["size"], 0)
+        with self.assertRaises(PyJWTError):
+            get_user_from_access_token(token)
+
+    def test_entry_does_not_outlive_exp(self):
+        token = create_access_token(self.user)
+        payload = jwt_decode(token)
+        verified_token_cache.set(token, {**payload, "exp": 0})
+
+        self.assertIsNone(verified_token_cache.get(token))
+
+
+class TestTokenGeneration(APITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="generationuser", password="12345678"
+        )
+
+    def test_generation_is_served_from_cache(self):
+        get_token_generation(self.user.pk)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_token_generation(self.user.pk), 0)
+
+    def test_login_writes_generation_through(self):
+        login(self.user)
+
+        self.assertEqual(cache.get(get_cache_key(self.user.pk)), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_token_generation(self.user.pk), 1)
+
+    @override_settings(TOKEN_GENERATION_LOCK_RETRIES=2)
+    def test_cold_key_falls_back_to_database_when_locked(self):
+        cache.add(TOKEN_GENERATION_LOCK_KEY % (self.user.pk,), 1)
+
+        self.assertEqual(get_token_generation(self.user.pk), 0)
+        self.assertIsNone(cache.get(get_cache_key(self.user.pk)))
+
+
+class TestAsyncAuthentication(APITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="asyncuser",
+            password="12345678",
+            email="async@gmail.com",
+            last_name="async",
+            first_name="user",
+        )
+
+    def test_aauthenticate_resolves_user(self):
+        token = create_access_token(self.user)
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION="JWT " + token)
+
+        user = async_to_sync(JSONWebTokenBackend().aauthenticate)(request)
+
+        self.assertEqual(user, self.user)
+
+    def test_aauthenticate_rejects_revoked_token(self):
+        token = create_access_token(self.user)
+        login(self.user)
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION="JWT " + token)
+
+        user = async_to_sync(JSONWebTokenBackend().aauthenticate)(request)
+
+        self.assertIsNone(user)
+
+    async def test_me_api_over_asgi(self):
+        token = create_access_token(self.user)
+
+        resp = await self.async_client.get(reverse("me"), AUTHORIZATION="JWT " + token)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["email"], self.user.email)
+
+    async def test_me_api_over_asgi_awaits_aauthenticate(self):
+        token = create_access_token(self.user)
+
+        with mock.patch.object(
+            JSONWebTokenBackend, "authenticate", side_effect=AssertionError
+        ):
+            resp = await self.async_client.get(
+                reverse("me"), AUTHORIZATION="JWT " + token
+            )
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["email"], self.user.email)
+
+    def test_aauthenticate_sends_login_failed(self):
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION="JWT invalid")
+        receiver = mock.Mock()
+        user_login_failed.connect(receiver)
+        self.addCleanup(user_login_failed.disconnect, receiver)
+
+        user = async_to_sync(aauthenticate)(request)
+
+        self.assertIsNone(user)
+        self.assertEqual(receiver.call_count, 1)
+
+
+class TestBatchVerifyTokenApi(APITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username="batchuser", password="12345678")
+        self.other_user = User.objects.create_user(
+            username="otherbatchuser", password="12345678"
+        )
+
+    def test_batch_verdicts_in_order(self):
+        revoked_token = create_access_token(self.user)
+        login(self.user)
+        valid_token = create_access_token(self.user)
+        other_token = create_access_token(self.other_user)
+        expired_token = create_token(
+            {"user_id": self.user.pk, "type": "access"}, timedelta(seconds=-1)
+        )
+        cache.clear()
+
+        with self.assertNumQueries(2):
+            resp = self.client.post(
+                reverse("verify-token-batch"),
+                {
+                    "tokens": [
+                        valid_token,
+                        revoked_token,
+                        expired_token,
+                        "not-a-token",
+                        other_token,
+                    ]
+                },
+                format="json",
+            )
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(
+            resp.json()["results"],
+            [
+                {"verdict": "valid", "user_id": self.user.pk},
+                {"verdict": "revoked", "user_id": self.user.pk},
+                {"verdict": "expired", "user_id": None},
+                {"verdict": "malformed", "user_id": None},
+                {"verdict": "valid", "user_id": self.other_user.pk},
+            ],
+        )
+
+    def test_inactive_user_is_revoked(self):
+        token = create_access_token(self.user)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+        resp = self.client.post(
+            reverse("verify-token-batch"), {"tokens": [token]}, format="json"
+        )
+
+        self.assertEqual(resp.json()["results"][0]["verdict"], "revoked")
+
+    def test_batch_size_is_bounded(self):
+        resp = self.client.post(
+            reverse("verify-token-batch"),
+            {"tokens": ["token"] * (settings.JWT_VERIFY_BATCH_MAX_SIZE + 1)},
+            format="json",
+        )
+
+        self.assertEqual(resp.status_code, 400)
+
+
+class TestHS256Codec(APITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.codec = HS256Codec(settings.SECRET_KEY)
+        self.pyjwt_codec = PyJWTCodec(settings.SECRET_KEY)
+        self.payload = jwt_base_payload(timedelta(minutes=5))
+        self.payload.update({"user_id": 1, "type": "access", "token_generation": 0})
+
+    def test_interoperates_with_pyjwt(self):
+        token = self.codec.encode(self.payload)
+
+        self.assertEqual(token, self.pyjwt_codec.encode(self.payload))
+        self.assertEqual(self.pyjwt_codec.decode(token)["user_id"], 1)
+        self.assertEqual(
+            self.codec.decode(self.pyjwt_codec.encode(self.payload))["user_id"], 1
+        )
+
+    def test_rejects_invalid_signature(self):
+        token = HS256Codec("another-secret").encode(self.payload)
+
+        with self.assertRaises(InvalidSignatureError):
+            self.codec.decode(token)
+
+    def test_rejects_expired_token(self):
+        token = self.codec.encode(
+            {**self.payload, **jwt_base_payload(timedelta(seconds=-5))}
+        )
+
+        with self.assertRaises(ExpiredSignatureError):
+            self.codec.decode(token)
+
+    def test_rejects_other_algorithms(self):
+        token = jwt.encode(self.payload, settings.SECRET_KEY, "HS512")
+
+        with self.assertRaises(PyJWTError):
+            self.codec.decode(token)
+
+    def test_rejects_malformed_token(self):
+        for token in ["", "abc", "a.b", "a.b.c"]:
+            with self.assertRaises(PyJWTError):
+                self.codec.decode(token)
+
+
+class TestServerTiming(APITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        verified_token_cache.clear()
+        self.user = User.objects.create_user(username="timinguser", password="12345678")
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1.0)
+    def test_me_api_reports_phases(self):
+        token = create_access_token(self.user)
+
+        with self.assertLogs("src.core.middlewares", "INFO") as logs:
+            resp = self.client.get(reverse("me"), HTTP_AUTHORIZATION="JWT " + token)
+
+        self.assertEqual(resp.status_code, 200)
+        phases = [
+            metric.split(";")[0].strip() for metric in resp["Server-Timing"].split(",")
+        ]
+        for phase in [
+            "token-parse",
+            "jwt-verify",
+            "revocation",
+            "user-fetch",
+            "authenticate",
+            "serialize",
+            "total",
+        ]:
+            self.assertIn(phase, phases)
+        self.assertIn("user-fetch", logs.records[0].server_timing)
+
+    def test_disabled_by_default(self):
+        token = create_access_token(self.user)
+
+        resp = self.client.get(reverse("me"), HTTP_AUTHORIZATION="JWT " + token)
+
+        self.assertNotIn("Server-Timing", resp)
+
+
+class TestUserSnapshot(APITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="snapshotuser",
+            password="12345678",
+            email="snapshot@gmail.com",
+            first_name="user",
+            last_name="snapshot",
+        )
+
+    def test_me_api_served_from_snapshot(self):
+        token = create_access_token(self.user)
+        self.client.get(reverse("me"), HTTP_AUTHORIZATION="JWT " + token)
+
+        with self.assertNumQueries(0):
+            resp = self.client.get(reverse("me"), HTTP_AUTHORIZATION="JWT " + token)
+
+        self.assertEqual(resp.json()["name"], "snapshot user")
+
+    def test_snapshot_defers_password(self):
+        user = get_user_snapshot(self.user.pk)
+
+        self.assertIn("password", user.get_deferred_fields())
+        self.assertEqual(user.email, self.user.email)
+        self.assertTrue(user.check_password("12345678"))
+
+    def test_save_invalidates_snapshot(self):
+        get_user_snapshot(self.user.pk)
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertFalse(get_user_snapshot(self.user.pk).is_active)
+
+    def test_load_racing_save_is_not_cached(self):
+        stale = load_user_snapshot(self.user.pk)
+
+        def load_during_save(user_id):
+            self.user.is_active = False
+            self.user.save()
+            return stale
+
+        with mock.patch(
+            "src.core.user_snapshots.load_user_snapshot", side_effect=load_during_save
+        ):
+            get_user_snapshot(self.user.pk)
+
+        self.assertFalse(get_user_snapshot(self.user.pk).is_active)
+
+    def test_login_refreshes_token_generation(self):
+        get_user_snapshot(self.user.pk)
+        login(self.user)
+
+        self.assertEqual(get_user_snapshot(self.user.pk).token_generation, 1)
+
+
+@override_settings(JWT_EMBED_PROFILE_CLAIMS=True)
+class TestProfileClaims(APITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="claimsuser",
+            password="12345678",
+            email="claims@gmail.com",
+            first_name="user",
+            last_name="claims",
+        )
+        login(self.user)
+        self.token = create_access_token(self.user)
+        get_token_generation(self.user.pk)
+
+    def test_me_api_renders_claims_without_lookups(self):
+        snapshot_key = get_user_snapshot_cache_key(
+            self.user.pk, get_snapshot_version(self.user.pk)
+        )
+        cache.delete(snapshot_key)
+
+        with self.assertNumQueries(0):
+            resp = self.client.get(
+                reverse("me"), HTTP_AUTHORIZATION="JWT " + self.token
+            )
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(
+            resp.json(),
+            {"name": "claims user", "email": "claims@gmail.com", "is_active": True},
+        )
+        self.assertIsNone(cache.get(snapshot_key))
+        self.assertIn("ETag", resp)
+
+    async def test_me_api_over_asgi_renders_claims(self):
+        snapshot_key = get_user_snapshot_cache_key(
+            self.user.pk, await sync_to_async(get_snapshot_version)(self.user.pk)
+        )
+        await cache.adelete(snapshot_key)
+
+        resp = await self.async_client.get(
+            reverse("me"), AUTHORIZATION="JWT " + self.token
+        )
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertIsNone(await cache.aget(snapshot_key))
+
+    def test_other_views_get_the_full_user(self):
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION="JWT " + self.token)
+        get_user_snapshot(self.user.pk)
+
+        with self.assertNumQueries(0):
+            user = JSONWebTokenBackend().authenticate(request)
+            self.assertEqual(user.username, "claimsuser")
+            self.assertFalse(user.is_staff)
+
+    def test_me_api_not_modified(self):
+        resp = self.client.get(reverse("me"), HTTP_AUTHORIZATION="JWT " + self.token)
+
+        resp = self.client.get(
+            reverse("me"),
+            HTTP_AUTHORIZATION="JWT " + self.token,
+            HTTP_IF_NONE_MATCH=resp["ETag"],
+        )
+
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.content, b"")
+
+    def test_revoked_token_is_still_rejected(self):
+        login(self.user)
+
+        resp = self.client.get(reverse("me"), HTTP_AUTHORIZATION="JWT " + self.token)
+
+        self.assertEqual(resp.status_code, 403)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(reverse("me"), HTTP_AUTHORIZATION="JWT " + self.token)
+        self.user.is_active = False
+        self.user.save()
+
+        resp = self.client.get(reverse("me"), HTTP_AUTHORIZATION="JWT " + self.token)
+
+        self.assertEqual(resp.status_code, 403)
+
+    def test_saving_active_user_keeps_tokens(self):
+        self.user.first_name = "renamed"
+        self.user.save()
+
+        resp = self.client.get(reverse("me"), HTTP_AUTHORIZATION="JWT " + self.token)
+
+        self.assertEqual(resp.status_code, 200)
+
+
+class TestRefreshTokenApi(APITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="refreshuser", password="12345678"
+        )
+        resp = self.client.post(
+            reverse("login"), {"username": "refreshuser", "password": "12345678"}
+        )
+        self.tokens = resp.json()
+
+    def refresh(self, tokens):
+        return self.client.post(
+            reverse("token-refresh"),
+            {
+                "refresh_token": tokens["refresh_token"],
+                "csrf_token": tokens["csrf_token"],
+            },
+        )
+
+    def test_refresh_issues_new_tokens(self):
+        resp = self.refresh(self.tokens)
+
+        self.assertEqual(resp.status_code, 200)
+        tokens = resp.json()
+        self.assertNotEqual(tokens["refresh_token"], self.tokens["refresh_token"])
+        self.assertEqual(get_user_from_access_token(tokens["token"]), self.user)
+        self.assertEqual(self.refresh(tokens).status_code, 200)
+
+    def test_refresh_requires_matching_csrf_token(self):
+        resp = self.refresh({**self.tokens, "csrf_token": "wrong"})
+
+        self.assertEqual(resp.status_code, 401)
+
+    def test_access_token_is_not_a_refresh_token(self):
+        resp = self.refresh({**self.tokens, "refresh_token": self.tokens["token"]})
+
+        self.assertEqual(resp.status_code, 401)
+
+    def test_reused_refresh_token_revokes_family(self):
+        tokens = self.refresh(self.tokens).json()
+
+        resp = self.refresh(self.tokens)
+
+        self.assertEqual(resp.status_code, 401)
+        self.assertEqual(self.refresh(tokens).status_code, 401)
+        with self.assertRaises(PyJWTError):
+            get_user_from_access_token(tokens["token"])
+
+    def test_refresh_token_without_session(self):
+        self.user.refresh_from_db()
+        tokens = {"csrf_token": "csrf"}
+        tokens["refresh_token"] = create_refresh_token(self.user, tokens)
+
+        resp = self.refresh(tokens)
+
+        self.assertEqual(resp.status_code, 200)
+        tokens = resp.json()
+        self.assertNotIn("jti", jwt_decode(tokens["refresh_token"]))
+        self.assertEqual(get_user_from_access_token(tokens["token"]), self.user)
+        self.assertEqual(self.refresh(tokens).status_code, 200)
+
+    def test_token_consumed_concurrently_is_a_reuse(self):
+        payload = jwt_decode(self.tokens["refresh_token"])
+        # Another worker consumed it but has not stored the new seq yet.
+        cache.add(REFRESH_TOKEN_USED_CACHE_KEY % (payload["fam"], 0), 1)
+
+        self.assertEqual(self.refresh(self.tokens).status_code, 401)
+        with self.assertRaises(PyJWTError):
+            get_user_from_access_token(self.tokens["token"])
+
+    def test_unknown_family_is_refused_without_revoking(self):
+        payload = jwt_decode(self.tokens["refresh_token"])
+        cache.delete(REFRESH_TOKEN_FAMILY_CACHE_KEY % (payload["fam"],))
+
+        self.assertEqual(self.refresh(self.tokens).status_code, 401)
+        self.assertEqual(get_user_from_access_token(self.tokens["token"]), self.user)
+
+
+class TestLoginThrottling(APITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="throttleuser", password="12345678"
+        )
+
+    def login(self, username="throttleuser", password="wrong-password"):
+        return self.client.post(
+            reverse("login"), {"username": username, "password": password}
+        )
+
+    @mock.patch.object(
+        LoginUsernameRateThrottle, "THROTTLE_RATES", {"login_username": "2/min"}
+    )
+    def test_username_is_throttled_before_hashing(self):
+        self.assertEqual(self.login().status_code, 401)
+        self.assertEqual(self.login().status_code, 401)
+
+        with mock.patch("src.core.auth_backends.check_password") as check_password:
+            resp = self.login(password="12345678")
+
+        self.assertEqual(resp.status_code, 429)
+        self.assertIn("Retry-After", resp)
+        check_password.assert_not_called()
+        self.assertEqual(self.login(username="otheruser").status_code, 401)
+
+    @mock.patch.object(LoginIPRateThrottle, "THROTTLE_RATES", {"login_ip": "1/min"})
+    def test_ip_is_throttled(self):
+        self.assertEqual(self.login().status_code, 401)
+
+        self.assertEqual(self.login(username="otheruser").status_code, 429)
+        resp = self.client.post(
+            reverse("login"),
+            {"username": "otheruser", "password": "wrong-password"},
+            HTTP_X_FORWARDED_FOR="10.0.0.1",
+        )
+        self.assertEqual(resp.status_code, 429)
+
+    @mock.patch.object(
+        LoginUsernameRateThrottle, "THROTTLE_RATES", {"login_username": "5/min"}
+    )
+    def test_concurrent_requests_cannot_exceed_the_limit(self):
+        request = mock.Mock(data={"username": "throttleuser"})
+        barrier = threading.Barrier(20)
+        allowed = []
+
+        def slow_read(read):
+            # Widen the window between reading the counts and acting on them.
+            def wrapper(*args, **kwargs):
+                value = read(*args, **kwargs)
+                time.sleep(0.01)
+                return value
+
+            return wrapper
+
+        def attempt():
+            throttle = LoginUsernameRateThrottle()
+            barrier.wait()
+            allowed.append(throttle.allow_request(request, None))
+
+        with mock.patch.object(
+            LocMemCache, "get", slow_read(LocMemCache.get)
+        ), mock.patch.object(LocMemCache, "get_many", slow_read(LocMemCache.get_many)):
+
+            threads = [threading.Thread(target=attempt) for __ in range(20)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(allowed.count(True), 5)
+
+    def test_non_object_body_is_not_a_server_error(self):
+        resp = self.client.post(reverse("login"), ["throttleuser"], format="json")
+        self.assertEqual(resp.status_code, 401)
+
+    @override_settings(PASSWORD_HASH_MAX_CONCURRENCY=1)
+    def test_hash_capacity_exceeded(self):
+        # Held by another worker.
+        cache.add(PASSWORD_HASH_SLOT_CACHE_KEY % (0,), 1)
+
+        resp = self.login(password="12345678")
+
+        self.assertEqual(resp.status_code, 503)
+        cache.delete(PASSWORD_HASH_SLOT_CACHE_KEY % (0,))
+        self.assertEqual(self.login(password="12345678").status_code, 200)
+        self.assertIsNone(cache.get(PASSWORD_HASH_SLOT_CACHE_KEY % (0,)))
+
+
+class TestPasswordHashPool(APITestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.pool = PasswordHashPool(1, 0, 5, 30)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.pool.shutdown()
+        super().tearDownClass()
+
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username="pooluser", password="12345678")
+        patcher = mock.patch("src.core.hashing.get_password_hash_pool")
+        patcher.start().return_value = self.pool
+        self.addCleanup(patcher.stop)
+
+    def test_login_hashes_in_pool(self):
+        submitted = self.pool.stats["submitted"]
+
+        resp = self.client.post(
+            reverse("login"), {"username": "pooluser", "password": "12345678"}
+        )
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.pool.stats["submitted"], submitted + 1)
+        self.assertEqual(self.pool.stats["in_flight"], 0)
+
+    def test_async_authenticate(self):
+        request = RequestFactory().post("/")
+        authenticate = async_to_sync(ModelBackend().aauthenticate)
+
+        self.assertEqual(
+            authenticate(request, username="pooluser", password="12345678"),
+            self.user,
+        )
+        self.assertIsNone(authenticate(request, username="pooluser", password="wrong"))
+        self.assertIsNone(authenticate(request, username="nobody", password="wrong"))
+
+    @override_settings(PASSWORD_HASH_MAX_CONCURRENCY=1)
+    def test_async_authenticate_takes_a_hash_slot(self):
+        cache.add(PASSWORD_HASH_SLOT_CACHE_KEY % (0,), 1)
+        request = RequestFactory().post("/")
+        authenticate = async_to_sync(ModelBackend().aauthenticate)
+        submitted = self.pool.stats["submitted"]
+
+        with mock.patch(
+            "src.core.auth_backends.get_password_hash_pool", return_value=self.pool
+        ), self.assertRaises(PasswordHashCapacityExceeded):
+            authenticate(request, username="pooluser", password="12345678")
+        self.assertEqual(self.pool.stats["submitted"], submitted)
+
+    def test_capacity_exceeded(self):
+        pool = PasswordHashPool(1, 0, 0.01, 30)
+        pool._slots.acquire()
+
+        with self.assertRaises(PasswordHashCapacityExceeded):
+            pool.run(_verify, "", "", "")
+
+        self.assertEqual(pool.stats["rejected"], 1)
+        self.assertEqual(pool.stats["submitted"], 0)
+
+
+class TestLastLoginWriteBehind(APITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.users = [
+            User.objects.create_user(username=f"lastlogin{i}", password="12345678")
+            for i in range(3)
+        ]
+
+    def test_flush_writes_latest_login_per_user(self):
+        buffer = LastLoginBuffer(0, 100)
+        now = timezone.now()
+        buffer.add(self.users[0].pk, now - timedelta(minutes=1))
+        buffer.add(self.users[0].pk, now)
+        buffer.add(self.users[1].pk, now - timedelta(minutes=2))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(buffer.flush(), 2)
+
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(User.objects.get(pk=self.users[0].pk).last_login, now)
+        self.assertEqual(
+            User.objects.get(pk=self.users[1].pk).last_login,
+            now - timedelta(minutes=2),
+        )
+        self.assertIsNone(User.objects.get(pk=self.users[2].pk).last_login)
+
+    def test_flush_at_size_threshold(self):
+        buffer = LastLoginBuffer(0, 2)
+        buffer.add(self.users[0].pk, timezone.now())
+        self.assertEqual(len(buffer), 1)
+
+        buffer.add(self.users[1].pk, timezone.now())
+
+        self.assertEqual(len(buffer), 0)
+        self.assertIsNotNone(User.objects.get(pk=self.users[1].pk).last_login)
+
+    def test_full_buffer_wakes_flush_thread(self):
+        buffer = LastLoginBuffer(60, 2)
+        self.addCleanup(buffer.stop)
+        flushed = threading.Event()
+        flush_threads = []
+
+        def flush():
+            flush_threads.append(threading.current_thread())
+            flushed.set()
+            return 0
+
+        with mock.patch.object(buffer, "flush", side_effect=flush):
+            buffer.add(self.users[0].pk, timezone.now())
+            buffer.add(self.users[1].pk, timezone.now())
+            self.assertTrue(flushed.wait(5))
+
+        self.assertIsNot(flush_threads[0], threading.current_thread())
+
+    def test_forked_child_restarts_flush_thread(self):
+        buffer = LastLoginBuffer(60, 2)
+        self.addCleanup(buffer.stop)
+        buffer.add(self.users[0].pk, timezone.now())
+        parent_thread = buffer._thread
+        # Stands in for the parent's thread, which a real child doesn't have.
+        self.addCleanup(buffer._stopped.set)
+        self.addCleanup(buffer._wake.set)
+        # Forked while another thread was adding.
+        buffer._lock.acquire()
+
+        buffer._reset()
+        buffer.add(self.users[1].pk, timezone.now())
+
+        self.assertEqual(len(buffer), 1)
+        self.assertIsNot(buffer._thread, parent_thread)
+        self.assertTrue(buffer._thread.is_alive())
+
+    @override_settings(LAST_LOGIN_WRITE_BEHIND=True)
+    def test_login_defers_last_login(self):
+        buffer = LastLoginBuffer(0, 100)
+        with mock.patch("src.account.services.last_login_buffer", buffer):
+            resp = self.client.post(
+                reverse("login"), {"username": "lastlogin0", "password": "12345678"}
+            )
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertIsNone(User.objects.get(pk=self.users[0].pk).last_login)
+        buffer.flush()
+        self.assertIsNotNone(User.objects.get(pk=self.users[0].pk).last_login)
+
+
+class TestConnectionPool(APITestCase):
+    def test_reuses_returned_connections(self):
+        pool = ConnectionPool(2, 0.01, 30)
+        first = pool.get(object, mock.Mock())
+        pool.put(first)
+
+        self.assertIs(pool.get(object, mock.Mock()), first)
+        self.assertIsNot(pool.get(object, mock.Mock()), first)
+        self.assertEqual(pool.size, 2)
+
+        with self.assertRaises(OperationalError):
+            pool.get(object, mock.Mock())
+
+    def test_health_check_after_idle(self):
+        pool = ConnectionPool(1, 0.01, 0)
+        stale = pool.get(mock.Mock, mock.Mock())
+        pool.put(stale)
+
+        fresh = pool.get(mock.Mock, mock.Mock(return_value=False))
+
+        self.assertIsNot(fresh, stale)
+        stale.close.assert_called_once_with()
+        self.assertEqual(pool.size, 1)
+
+    def test_close_returns_connection_to_pool(self):
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = SQLiteDatabaseWrapper(
+                {**connection.settings_dict, "NAME": os.path.join(directory, "db")},
+                "pool-test",
+            )
+            pool = wrapper.get_pool()
+            try:
+                wrapper.ensure_connection()
+                raw_connection = wrapper.connection
+                wrapper.close()
+                self.assertEqual(pool.idle, 1)
+
+                wrapper.ensure_connection()
+                self.assertIs(wrapper.connection, raw_connection)
+                self.assertEqual(pool.size, 1)
+                wrapper.close()
+            finally:
+                pool.close()
+
+    def test_sqlite_statement_timeout(self):
+        connection.ensure_connection()
+        connection.connection.enable_statement_timeout(50)
+        self.addCleanup(
+            connection.connection.enable_statement_timeout,
+            connection.get_statement_timeout(),
+        )
+
+        with self.assertRaises(OperationalError), transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) "
+                    "SELECT count(*) FROM c"
+                )
+
+
+@override_settings(DATABASE_REPLICAS=["replica_0"])
+class TestReplicaRouter(APITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username="replicauser", password="1")
+        self.router = ReplicaRouter()
+        # Creating the user made it sticky.
+        cache.clear()
+
+    def test_auth_reads_go_to_replica(self):
+        self.assertEqual(self.router.db_for_read(User), "default")
+        with replica_reads([self.user.pk]):
+            self.assertEqual(self.router.db_for_read(User), "replica_0")
+            self.assertEqual(self.router.db_for_write(User), "default")
+
+    def test_login_sticks_user_to_primary(self):
+        login(self.user)
+
+        with replica_reads([self.user.pk]):
+            self.assertEqual(self.router.db_for_read(User), "default")
+        with replica_reads([self.user.pk + 1]):
+            self.assertEqual(self.router.db_for_read(User), "replica_0")
+
+    def test_replicas_are_not_migrated(self):
+        self.assertTrue(self.router.allow_migrate("default", "account"))
+        self.assertFalse(self.router.allow_migrate("replica_0", "account"))
+
+
+class TestRepresentationPlan(APITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="planuser", password="1", email="plan@example.com"
+        )
+
+    def test_plan_matches_drf(self):
+        class UserSerializer(serializers.ModelSerializer):
+            name = serializers.SerializerMethodField()
+
+            def get_name(self, obj):
+                return obj.username.upper()
+
+            class Meta:
+                model = User
+                fields = ("id", "username", "email", "last_login", "name")
+
+        plan = get_representation_plan(UserSerializer)
+
+        self.assertTrue(plan.compiled)
+        self.assertEqual(
+            plan.to_representation(UserSerializer(), self.user),
+            UserSerializer().to_representation(self.user),
+        )
+
+    def test_custom_to_representation_is_not_compiled(self):
+        self.assertFalse(get_representation_plan(MeViewSerializer).compiled)
+        self.assertTrue(get_representation_plan(LoginViewSerializer).compiled)
+
+    def test_context_dependent_fields_are_not_compiled(self):
+        class ContextField(serializers.CharField):
+            def to_representation(self, value):
+                return self.context["prefix"] + value
+
+        class FileSerializer(serializers.Serializer):
+            avatar = serializers.FileField()
+
+        class ContextSerializer(serializers.Serializer):
+            username = ContextField()
+
+        class ListSerializer(serializers.Serializer):
+            avatars = serializers.ListField(child=serializers.ImageField())
+
+        for serializer_class in (FileSerializer, ContextSerializer, ListSerializer):
+            with self.subTest(serializer=serializer_class.__name__):
+                plan = get_representation_plan(serializer_class)
+                self.assertFalse(plan.compiled)
+
+    def test_view_serializer_built_lazily(self):
+        request = RequestFactory().post("/")
+        serializer = LoginActionSerializer(data={}, context={"request": request})
+        self.assertIsNone(serializer._view_serializer_instance)
+
+        data = serializer.to_representation(self.user)
+
+        self.assertEqual(set(data), {"token", "refresh_token", "csrf_token"})
+        self.assertIsInstance(serializer._view_serializer_instance, LoginViewSerializer)
+
+    def test_view_serializer_built_once_per_proxy(self):
+        class PlainViewSerializer(serializers.ModelSerializer):
+            class Meta:
+                model = User
+                fields = ("id", "username")
+
+        class PlainProxySerializer(ViewProxySerializerMixin, serializers.Serializer):
+            view_serializer = PlainViewSerializer
+
+        request = RequestFactory().post("/")
+        serializer = LoginActionSerializer(data={}, context={"request": request})
+        with mock.patch.object(
+            LoginViewSerializer,
+            "__init__",
+            autospec=True,
+            side_effect=LoginViewSerializer.__init__,
+        ) as init:
+            serializer.to_representation(self.user)
+            serializer.to_representation(self.user)
+        self.assertEqual(init.call_count, 1)
+
+        serializer = PlainProxySerializer(context={"request": request})
+        self.assertEqual(
+            serializer.to_representation(self.user),
+            {"id": self.user.pk, "username": "planuser"},
+        )
+        self.assertIsNone(serializer._view_serializer_instance)
+
+
+class TestJSONCodec(APITestCase):
+    data = {
+        "message": _("xác minh thất bại"),
+        "created": datetime(2022, 8, 3, 12, 0, 0, 123456, tzinfo=dt_timezone.utc),
+        "amount": Decimal("1.50"),
+        "tokens": ["a\u2028b", None, 1, 2.5, True],
+        1: "int key",
+    }
+
+    def test_renderer_matches_drf(self):
+        expected = renderers.JSONRenderer().render(self.data)
+        for backend in ("orjson", "json"):
+            with self.subTest(backend=backend), override_settings(
+                JSON_BACKEND=backend
+            ):
+                self.assertEqual(JSONRenderer().render(self.data), expected)
+
+    def test_renderer_indent(self):
+        self.assertEqual(
+            JSONRenderer().render({"a": 1}, "application/json; indent=2"),
+            b'{\n  "a": 1\n}',
+        )
+
+    def test_parser(self):
+        body = '{"username": "người dùng", "n": [1, 2.5]}'.encode()
+        for backend in ("orjson", "json"):
+            with self.subTest(backend=backend), override_settings(
+                JSON_BACKEND=backend
+            ):
+                self.assertEqual(
+                    JSONParser().parse(io.BytesIO(body)),
+                    {"username": "người dùng", "n": [1, 2.5]},
+                )
+                with self.assertRaises(ParseError):
+                    JSONParser().parse(io.BytesIO(b'{"n": NaN}'))
+
+
+class TestStartup(APITestCase):
+    def test_host_list_resolves_lazily(self):
+        resolver = HostAddressResolver(1)
+        with mock.patch(
+            "socket.gethostbyname_ex", return_value=("host", [], ["10.0.0.5"])
+        ) as gethostbyname_ex:
+            hosts = HostList(["localhost"], resolver, lambda ips: ips)
+            gethostbyname_ex.assert_not_called()
+
+            self.assertIn("10.0.0.5", hosts)
+            self.assertEqual(hosts, ["10.0.0.5", "localhost"])
+        gethostbyname_ex.assert_called_once()
+
+    def test_slow_resolver_does_not_block(self):
+        resolved = threading.Event()
+
+        def gethostbyname_ex(name):
+            resolved.wait(5)
+            return name, [], ["10.0.0.5"]
+
+        resolver = HostAddressResolver(0.01)
+        with mock.patch("socket.gethostbyname_ex", gethostbyname_ex):
+            hosts = HostList(["localhost"], resolver)
+            self.assertEqual(list(hosts), ["localhost"])
+
+            resolved.set()
+            resolver._thread.join(5)
+            self.assertEqual(list(hosts), ["10.0.0.5", "localhost"])
+
+    def test_only_missed_hosts_wait_for_lookup(self):
+        resolved = threading.Event()
+
+        def gethostbyname_ex(name):
+            resolved.wait(5)
+            return name, [], ["10.0.0.5"]
+
+        resolver = HostAddressResolver(5)
+        with mock.patch("socket.gethostbyname_ex", gethostbyname_ex):
+            resolver.start()
+            hosts = HostList(["localhost"], resolver)
+
+            started = time.monotonic()
+            self.assertTrue(validate_host("localhost", hosts))
+            self.assertLess(time.monotonic() - started, 1)
+
+            threading.Timer(0.05, resolved.set).start()
+            self.assertTrue(validate_host("10.0.0.5", hosts))
+
+    @override_settings(DEBUG=False)
+    def test_default_cache_must_be_shared(self):
+        errors = check_shared_cache(None)
+        self.assertEqual([error.id for error in errors], ["core.E001"])
+
+        with override_settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+                    "LOCATION": "cache",
+                }
+            }
+        ):
+            self.assertEqual(check_shared_cache(None), [])
+
+    def test_startup_profile_budget(self):
+        out = io.StringIO()
+        call_command("startup_profile", repeat=1, limit=3, budget=60000, stdout=out)
+        self.assertIn("src.wsgi ready in", out.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command("startup_profile", repeat=1, budget=0, stdout=io.StringIO())
+
+
+class TestWarmup(APITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username="warmuser", password="1")
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=["last_login"])
+        cache.clear()
+
+    def test_warmup_preloads_auth_caches(self):
+        with self.assertLogs("src.core.warmup", "INFO"):
+            timings = warmup(connections_count=0, users=10)
+
+        self.assertEqual(
+            set(timings), {"urls", "serializers", "jwt", "renderers", "auth-caches"}
+        )
+        self.assertEqual(
+            cache.get(get_cache_key(self.user.pk)), self.user.token_generation
+        )
+        snapshot_key = get_user_snapshot_cache_key(
+            self.user.pk, get_snapshot_version(self.user.pk)
+        )
+        self.assertIsNotNone(cache.get(snapshot_key))
+
+    def test_failed_step_is_logged(self):
+        with mock.patch(
+            "src.core.warmup.warm_jwt", side_effect=RuntimeError
+        ), self.assertLogs("src.core.warmup", "ERROR"):
+            timings = warmup(connections_count=0, users=0)
+        self.assertIn("jwt", timings)
+
+
+class TestImportUsers(APITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        User.objects.create_user(username="existing", password="1")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def import_users(self, path, **options):
+        out = io.StringIO()
+        call_command("import_users", path, stdout=out, **options)
+        return out.getvalue()
+
+    def test_import_csv(self):
+        password_hash = make_password("hashed-password")
+        path = self.write(
+            "users.csv",
+            "username,password,password_hash,email,is_active\n"
+            "alice,alice-password,,alice@EXAMPLE.com,\n"
+            f"bob,,{password_hash},,false\n"
+            "carol,,,,\n"
+            "existing,other,,,\n",
+        )
+
+        output = self.import_users(path, workers=1, batch_size=2)
+
+        self.assertIn("Imported 3 users (1 already existed)", output)
+        alice = User.objects.get(username="alice")
+        self.assertTrue(alice.check_password("alice-password"))
+        self.assertEqual(alice.email, "alice@example.com")
+        bob = User.objects.get(username="bob")
+        self.assertTrue(bob.check_password("hashed-password"))
+        self.assertFalse(bob.is_active)
+        self.assertFalse(User.objects.get(username="carol").has_usable_password())
+        self.assertTrue(User.objects.get(username="existing").check_password("1"))
+
+    def test_duplicate_usernames_are_counted_once(self):
+        path = self.write(
+            "users.csv",
+            "username,password_hash\n"
+            "alice,!\nbob,!\n"
+            "alice,!\ncarol,!\n"
+            "dave,!\ndave,!\n",
+        )
+
+        output = self.import_users(path, workers=0, batch_size=2)
+
+        self.assertIn("Imported 4 users (2 already existed)", output)
+        self.assertEqual(User.objects.filter(username="alice").count(), 1)
+
+    def test_resume_jsonl(self):
+        path = self.write(
+            "users.jsonl",
+            "\n".join(
+                json.dumps({"username": f"user{i}", "password_hash": "!"})
+                for i in range(5)
+            ),
+        )
+        with open(path + ".progress", "w") as f:
+            json.dump({"path": os.path.abspath(path), "processed": 3}, f)
+
+        output = self.import_users(path, workers=0, resume=True)
+
+        self.assertIn("Resuming after 3 records", output)
+        usernames = User.objects.filter(username__startswith="user").values_list(
+            "username", flat=True
+        )
+        self.assertEqual(set(usernames), {"user3", "user4"})
+        with open(path + ".progress") as f:
+            self.assertEqual(json.load(f)["processed"], 5)
+
+    def test_invalid_password_hash(self):
+        path = self.write("users.csv", "username,password_hash\ndave,not-a-hash\n")
+        with self.assertRaises(CommandError):
+            self.import_users(path, workers=0)
+
+
+class TestAPIKey(APITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username="machine", password="1")
+        self.api_key, self.key = create_api_key(
+            self.user, "exporter", scopes=["profile:read"]
+        )
+
+    def get_me(self, key=None):
+        return self.client.get(
+            reverse("me"), HTTP_AUTHORIZATION="Api-Key " + (key or self.key)
+        )
+
+    def test_me_api(self):
+        resp = self.get_me()
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["email"], self.user.email)
+        self.api_key.refresh_from_db()
+        self.assertIsNotNone(self.api_key.last_used_at)
+        self.assertNotEqual(self.api_key.digest, self.key)
+
+    def test_lookup_is_cached(self):
+        self.get_me()
+        # Key, user snapshot and last_used_at all come from the cache.
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_me().status_code, 200)
+
+    def test_rejected_keys(self):
+        self.assertEqual(self.get_me("unknown").status_code, 403)
+        with self.assertNumQueries(0):
+            self.get_me("unknown")
+
+        self.api_key.expires_at = timezone.now() - timedelta(seconds=1)
+        self.api_key.save()
+        self.assertEqual(self.get_me().status_code, 403)
+
+        self.api_key.expires_at = None
+        self.api_key.is_active = False
+        self.api_key.save()
+        self.assertEqual(self.get_me().status_code, 403)
+
+    def test_load_racing_deactivation_is_not_cached(self):
+        stale = load_api_key(self.api_key.digest)
+
+        def load_during_save(digest):
+            self.api_key.is_active = False
+            self.api_key.save()
+            return stale
+
+        with mock.patch(
+            "src.account.api_keys.load_api_key", side_effect=load_during_save
+        ):
+            self.get_me()
+
+        self.assertEqual(self.get_me().status_code, 403)
+
+    def test_missing_scope(self):
+        _, key = create_api_key(self.user, "no scopes")
+        self.assertEqual(self.get_me(key).status_code, 403)
+
+    def test_view_without_scopes_rejects_api_keys(self):
+        token = create_access_token(self.user)
+        data = {"tokens": [token]}
+
+        resp = self.client.post(
+            reverse("verify-token-batch"),
+            data,
+            format="json",
+            HTTP_AUTHORIZATION="Api-Key " + self.key,
+        )
+        self.assertEqual(resp.status_code, 403)
+
+        resp = self.client.post(reverse("verify-token-batch"), data, format="json")
+        self.assertEqual(resp.status_code, 200)
+
+    def test_create_api_key_command(self):
+        out = io.StringIO()
+        call_command(
+            "create_api_key",
+            "machine",
+            name="cli",
+            scopes=["profile:read"],
+            expires_in_days=1,
+            stdout=out,
+            stderr=io.StringIO(),
+        )
+        self.assertEqual(self.get_me(out.getvalue().strip()).status_code, 200)
+        self.assertIsNotNone(APIKey.objects.get(name="cli").expires_at)
+
+
+@override_settings(JWT_SINGLE_SESSION=False)
+class TestSessions(APITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        verified_token_cache.clear()
+        self.user = User.objects.create_user(username="sessionuser", password="1")
+
+    def login(self, user_agent="phone"):
+        resp = self.client.post(
+            reverse("login"),
+            {"username": "sessionuser", "password": "1"},
+            HTTP_USER_AGENT=user_agent,
+        )
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def get(self, url, token):
+        return self.client.get(url, HTTP_AUTHORIZATION="JWT " + token)
+
+    def test_list_and_revoke(self):
+        phone = self.login("phone")["token"]
+        laptop = self.login("laptop")["token"]
+
+        resp = self.get(reverse("sessions"), laptop)
+        self.assertEqual(resp.status_code, 200)
+        sessions = {session["user_agent"]: session for session in resp.json()}
+        self.assertEqual(set(sessions), {"phone", "laptop"})
+        self.assertTrue(sessions["laptop"]["is_current"])
+        self.assertFalse(sessions["phone"]["is_current"])
+
+        resp = self.client.delete(
+            reverse("session-detail", args=[sessions["phone"]["jti"]]),
+            HTTP_AUTHORIZATION="JWT " + laptop,
+        )
+        self.assertEqual(resp.status_code, 204)
+        self.assertEqual(self.get(reverse("me"), phone).status_code, 403)
+        self.assertEqual(self.get(reverse("me"), laptop).status_code, 200)
+        resp = self.client.post(
+            reverse("verify-token-batch"), {"tokens": [phone, laptop]}, format="json"
+        )
+        self.assertEqual(
+            [result["verdict"] for result in resp.json()["results"]],
+            ["revoked", "valid"],
+        )
+
+    def test_cannot_revoke_other_users_session(self):
+        token = self.login()["token"]
+        other = User.objects.create_user(username="other", password="1")
+        session = UserSession.objects.create(
+            user=other, jti="0" * 32, expires_at=timezone.now() + timedelta(days=1)
+        )
+        resp = self.client.delete(
+            reverse("session-detail", args=[session.jti]),
+            HTTP_AUTHORIZATION="JWT " + token,
+        )
+        self.assertEqual(resp.status_code, 404)
+        self.assertTrue(UserSession.objects.filter(pk=session.pk).exists())
+
+    def test_load_racing_revocation_is_not_cached(self):
+        token = self.login()["token"]
+        session = UserSession.objects.get()
+        cache.clear()
+        stale = load_session(session.jti)
+
+        def load_during_revoke(jti):
+            revoke_session(self.user, jti)
+            return stale
+
+        with mock.patch(
+            "src.account.sessions.load_session", side_effect=load_during_revoke
+        ):
+            get_user_from_access_token(token)
+
+        with self.assertRaises(PyJWTError):
+            get_user_from_access_token(token)
+
+    def test_session_check_is_cached(self):
+        token = self.login()["token"]
+        get_user_from_access_token(token)
+        with self.assertNumQueries(0):
+            get_user_from_access_token(token)
+
+    def test_refresh_extends_session(self):
+        tokens = self.login()
+        session = UserSession.objects.get()
+        UserSession.objects.update(expires_at=timezone.now() + timedelta(minutes=1))
+
+        resp = self.client.post(
+            reverse("token-refresh"),
+            {
+                "refresh_token": tokens["refresh_token"],
+                "csrf_token": tokens["csrf_token"],
+            },
+        )
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(jwt_decode(resp.json()["token"])["jti"], session.jti)
+        session.refresh_from_db()
+        self.assertGreater(session.expires_at, timezone.now() + timedelta(days=1))
+
+    @override_settings(JWT_SINGLE_SESSION=True)
+    def test_single_session_login_ends_older_sessions(self):
+        old = self.login()["token"]
+        self.login()
+        self.assertEqual(UserSession.objects.count(), 1)
+        self.assertEqual(self.get(reverse("me"), old).status_code, 403)
+
+    def test_sweep_expired_sessions(self):
+        now = timezone.now()
+        UserSession.objects.bulk_create(
+            UserSession(
+                user=self.user,
+                jti=f"{i:032x}",
+                expires_at=now + timedelta(minutes=2 * i - 9),
+            )
+            for i in range(10)
+        )
+
+        self.assertEqual(sweep_expired_sessions(2, now=now), 5)
+        self.assertEqual(UserSession.objects.count(), 5)
+        out = io.StringIO()
+        call_command("sweep_sessions", stdout=out)
+        self.assertIn("Deleted 0 expired sessions", out.getvalue())
+
+
+class TestRevocationSnapshot(APITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "revocations")
+        self.user = User.objects.create_user(username="snapshotuser", password="1")
+        settings_override = override_settings(REVOCATION_SNAPSHOT_PATH=self.path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_table(self):
+        table = SnapshotTable.create(self.path, 4)
+        table.put(1, 3)
+        table.put(5, 1)
+        table.put(1, 2)
+        self.assertEqual(table.lookup(1), 3)
+        self.assertEqual(table.lookup(5), 1)
+        self.assertIsNone(table.lookup(9))
+        with self.assertRaises(SnapshotFull):
+            table.put(9, 1)
+
+    def test_generation_is_read_from_snapshot(self):
+        call_command("revocation_snapshot", once=True, stdout=io.StringIO())
+        cache.clear()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_token_generation(self.user.pk), 0)
+        self.assertIsNone(cache.get(get_cache_key(self.user.pk)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            login(self.user)
+        cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_token_generation(self.user.pk), 1)
+
+    def test_token_newer_than_snapshot_is_checked_in_cache(self):
+        call_command("revocation_snapshot", once=True, stdout=io.StringIO())
+        # A bump made on another host, which this snapshot has not synced.
+        User.objects.filter(pk=self.user.pk).update(token_generation=1)
+        self.user.refresh_from_db()
+        cache.clear()
+        token = create_access_token(self.user)
+
+        self.assertEqual(get_user_from_access_token(token), self.user)
+        resp = self.client.post(
+            reverse("verify-token-batch"), {"tokens": [token]}, format="json"
+        )
+        self.assertEqual(resp.json()["results"][0]["verdict"], "valid")
+
+    def test_rolled_back_bump_is_not_recorded(self):
+        call_command("revocation_snapshot", once=True, stdout=io.StringIO())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    bump_token_generation(self.user)
+                    raise OperationalError()
+            except OperationalError:
+                pass
+
+        self.assertEqual(revocation_snapshot.get(self.user.pk), 0)
+
+    def test_bump_during_rebuild_is_kept(self):
+        call_command("revocation_snapshot", once=True, stdout=io.StringIO())
+        rebuild = SnapshotWriter.rebuild
+
+        def rebuild_racing_bump(writer, rows, count, synced_at):
+            rows = list(rows)
+            # Committed after the rows were read: recorded into the old file.
+            with self.captureOnCommitCallbacks(execute=True):
+                bump_token_generation(self.user)
+            rebuild(writer, rows, count, synced_at)
+
+        with mock.patch.object(SnapshotWriter, "rebuild", rebuild_racing_bump):
+            call_command("revocation_snapshot", once=True, stdout=io.StringIO())
+
+        self.assertEqual(revocation_snapshot.get(self.user.pk), 1)
+
+    def test_stale_or_retired_snapshot(self):
+        writer = SnapshotWriter(self.path)
+        writer.rebuild([(self.user.pk, 7)], 1, time.time() - 60)
+        self.assertIsNone(revocation_snapshot.get(self.user.pk))
+
+        # The reader keeps the old mapping until the rebuild retires it.
+        previous = SnapshotTable.open(self.path)
+        writer.rebuild([(self.user.pk, 8)], 1, time.time())
+        self.assertTrue(previous.flags & RETIRED)
+        self.assertEqual(revocation_snapshot.get(self.user.pk), 8)
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "tiered-l2",
+        },
+        "auth": {
+            "BACKEND": "src.core.tiered_cache.TieredCache",
+            "LOCATION": "default",
+            "OPTIONS": {"MAX_ENTRIES": 100, "SYNC_INTERVAL": 60},
+        },
+    }
+)
+class TestTieredCache(APITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.cache = caches["auth"]
+        self.cache.clear()
+
+    def other_worker(self):
+        # Same L2 and version stamps, its own L1.
+        other = TieredCache("default", settings.CACHES["auth"])
+        other.tier = LocalTier(self.cache.tier.name, 100, 64, 60)
+        return other
+
+    def test_hits_are_served_from_l1(self):
+        self.cache.set("key", {"value": 1})
+        hits = self.cache.stats["l1_hits"]
+        with mock.patch.object(self.cache.l2, "get") as l2_get:
+            value = self.cache.get("key")
+            value["value"] = 2
+            self.assertEqual(self.cache.get("key"), {"value": 1})
+        l2_get.assert_not_called()
+        self.assertEqual(self.cache.stats["l1_hits"], hits + 2)
+
+    def test_writes_of_other_workers_invalidate_l1(self):
+        self.cache.set("key", 1)
+        self.cache.get("key")
+        other = self.other_worker()
+        other.set("key", 2)
+
+        # Bounded staleness: seen once this worker syncs its stamps.
+        self.assertEqual(self.cache.get("key"), 1)
+        self.cache.tier.next_sync = 0
+        self.assertEqual(self.cache.get("key"), 2)
+
+        other.delete("key")
+        self.cache.tier.next_sync = 0
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_bumps_of_other_workers_reach_l1_within_sync_interval(self):
+        user = User.objects.create_user(username="staleuser", password="12345678")
+        self.assertEqual(get_token_generation(user.pk), 0)
+        with mock.patch("src.core.token_generation.auth_cache", self.other_worker()):
+            bump_token_generation(user)
+
+        # Stale until this worker syncs, not for TOKEN_GENERATION_CACHE_TTL.
+        self.assertEqual(get_token_generation(user.pk), 0)
+        self.cache.tier.next_sync = 0
+        self.assertEqual(get_token_generation(user.pk), 1)
+
+    def test_get_many_fills_l1_in_bulk(self):
+        self.cache.l2.set_many({"a": 1, "b": 2})
+        self.cache.get("a")
+        before = self.cache.stats
+        with mock.patch.object(
+            self.cache.l2, "get_many", wraps=self.cache.l2.get_many
+        ) as l2_get_many:
+            self.assertEqual(self.cache.get_many(["a", "b", "c"]), {"a": 1, "b": 2})
+        l2_get_many.assert_called_once_with({"b": mock.ANY, "c": mock.ANY}, None)
+        self.assertEqual(self.cache.get_many(["a", "b"]), {"a": 1, "b": 2})
+        stats = self.cache.stats
+        self.assertEqual(stats["l2_hits"] - before["l2_hits"], 1)
+        self.assertEqual(stats["l2_misses"] - before["l2_misses"], 1)
+
+    def test_clearing_l2_drops_l1(self):
+        self.cache.set("key", 1)
+        self.cache.l2.clear()
+        self.cache.tier.next_sync = 0
+        self.assertIsNone(self.cache.get("key"))
+
+
+class TestMetrics(APITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="metrics@gmail.com", username="metrics", password="12345678"
+        )
+
+    def get_metrics(self, **extra):
+        resp = self.client.get(reverse("metrics"), **extra)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp["Content-Type"].startswith("text/plain; version=0.0.4"))
+        samples = {}
+        for line in resp.content.decode().splitlines():
+            if not line.startswith("#"):
+                name, __, value = line.rpartition(" ")
+                samples[name] = float(value)
+        return samples
+
+    def test_exposes_auth_and_request_metrics(self):
+        before = self.get_metrics()
+        resp = self.client.post(
+            reverse("login"), {"username": "metrics", "password": "12345678"}
+        )
+        self.assertEqual(resp.status_code, 200)
+        token = resp.json()["token"]
+        self.client.get(reverse("me"), HTTP_AUTHORIZATION="JWT " + token)
+        self.client.get(reverse("me"), HTTP_AUTHORIZATION="JWT " + token)
+        expired_token = create_token(
+            {"user_id": self.user.pk, "type": "access"}, timedelta(seconds=-1)
+        )
+        self.client.get(reverse("me"), HTTP_AUTHORIZATION="JWT " + expired_token)
+        after = self.get_metrics()
+
+        def delta(sample):
+            return after[sample] - before.get(sample, 0.0)
+
+        requests = 'http_request_duration_seconds_count{view="%s",method="%s",status="%s"}'
+        self.assertEqual(delta(requests % ("login", "POST", 200)), 1)
+        self.assertEqual(delta(requests % ("me", "GET", 200)), 2)
+        self.assertEqual(delta('auth_backend_seconds_count{backend="model"}'), 1)
+        self.assertEqual(delta('auth_backend_seconds_count{backend="jwt"}'), 3)
+        self.assertGreaterEqual(delta("jwt_decode_seconds_count"), 3)
+        self.assertEqual(delta('auth_token_verdicts_total{verdict="expired"}'), 1)
+        self.assertGreater(
+            delta('auth_cache_requests_total{cache="verified_token",result="hit"}'), 0
+        )
+        self.assertIn('auth_cache_hit_ratio{cache="user_snapshot"}', after)
+
+    def test_histogram_exposition(self):
+        registry = MetricsRegistry()
+        latency = Histogram(
+            "latency_seconds", "Latency.", ("view",), (0.1, 1.0), registry
+        )
+        for value in (0.05, 0.5, 0.5, 5.0):
+            latency.observe(value, ('say "hi"',))
+        lines = registry.expose(registry.collect()).splitlines()
+        self.assertEqual(
+            lines,
+            [
+                "# HELP latency_seconds Latency.",
+                "# TYPE latency_seconds histogram",
+                'latency_seconds_bucket{view="say \\"hi\\"",le="0.1"} 1.0',
+                'latency_seconds_bucket{view="say \\"hi\\"",le="1.0"} 3.0',
+                'latency_seconds_bucket{view="say \\"hi\\"",le="+Inf"} 4.0',
+                'latency_seconds_sum{view="say \\"hi\\""} 6.05',
+                'latency_seconds_count{view="say \\"hi\\""} 4.0',
+            ],
+        )
+
+    def test_threads_record_into_their_own_shards(self):
+        registry = MetricsRegistry()
+        requests = Counter("requests_total", "Requests.", registry=registry)
+
+        def work():
+            for __ in range(1000):
+                requests.inc()
+
+        threads = [threading.Thread(target=work) for __ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        requests.inc()
+        # Shards of finished threads are kept in the totals.
+        self.assertEqual(registry.collect()[("requests_total", ())], 4001)
+        self.assertEqual(registry.collect()[("requests_total", ())], 4001)
+
+    def test_multiprocess_totals_add_up_every_worker(self):
+        registry = MetricsRegistry()
+        requests = Counter("requests_total", "Requests.", ("view",), registry)
+        latency = Histogram("latency_seconds", "Latency.", (), (1.0,), registry)
+        requests.inc(("me",), 2)
+        latency.observe(0.5)
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "other-worker.json"), "w") as f:
+                json.dump(
+                    [
+                        ["requests_total", ["me"], 3.0],
+                        ["latency_seconds", [], [0.0, 1.0, 2.0, 1.0]],
+                    ],
+                    f,
+                )
+            totals = registry.collect_all(directory)
+            self.assertTrue(
+                os.path.exists(
+                    os.path.join(directory, f"{registry.process_id}.json")
+                )
+            )
+        self.assertEqual(totals[("requests_total", ("me",))], 5.0)
+        self.assertEqual(totals[("latency_seconds", ())], [1.0, 1.0, 2.5, 2.0])
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_token_is_required(self):
+        resp = self.client.get(reverse("metrics"))
+        self.assertEqual(resp.status_code, 401)
+        resp = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer wrong")
+        self.assertEqual(resp.status_code, 401)
+        samples = self.get_metrics(HTTP_AUTHORIZATION="Bearer secret")
+        self.assertIn("jwt_decode_seconds_count", samples)